@@ -0,0 +1,117 @@
+from collections import defaultdict
+
+import arquivo
+
+"""
+agregados.py
+
+Totais pré-agregados para o dashboard, mantidos por triggers em reservas:
+- reservas_mensal: por mês de início (YYYY-MM), número de reservas e faturação.
+- faturacao_clientes: faturação total por cliente (índice por total para o top 5).
+- Contam todas as reservas não canceladas. Criar uma reserva soma, cancelar subtrai, e mudar datas,
+  valor ou cliente subtrai a contribuição antiga e soma a nova. Passar a 'Concluída' não muda nada.
+- Apagar reservas (limpar_reservas, arquivo por ano) não altera os totais: o histórico continua a contar.
+Assim os gráficos de 12 meses, a faturação do mês e o top 5 leem no máximo 12 linhas por índice.
+"""
+
+ESQUEMA = '''
+    CREATE TABLE IF NOT EXISTS reservas_mensal (
+        mes TEXT PRIMARY KEY,
+        reservas INTEGER NOT NULL,
+        faturacao REAL NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS faturacao_clientes (
+        cliente_id INTEGER PRIMARY KEY,
+        total REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_faturacao_clientes_total ON faturacao_clientes (total DESC);
+
+    CREATE TRIGGER IF NOT EXISTS agregados_reservas_inserir
+    AFTER INSERT ON reservas WHEN new.status IS NOT 'Cancelada' BEGIN
+        INSERT INTO reservas_mensal (mes, reservas, faturacao)
+        VALUES (substr(new.data_inicio, 1, 7), 1, new.valor_total)
+        ON CONFLICT (mes) DO UPDATE SET reservas = reservas + 1, faturacao = faturacao + excluded.faturacao;
+        INSERT INTO faturacao_clientes (cliente_id, total)
+        VALUES (new.cliente_id, new.valor_total)
+        ON CONFLICT (cliente_id) DO UPDATE SET total = total + excluded.total;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS agregados_reservas_atualizar
+    AFTER UPDATE OF status, data_inicio, valor_total, cliente_id ON reservas
+    WHEN (old.status IS 'Cancelada') != (new.status IS 'Cancelada')
+        OR old.data_inicio IS NOT new.data_inicio
+        OR old.valor_total IS NOT new.valor_total
+        OR old.cliente_id IS NOT new.cliente_id
+    BEGIN
+        UPDATE reservas_mensal SET reservas = reservas - 1, faturacao = faturacao - old.valor_total
+        WHERE mes = substr(old.data_inicio, 1, 7) AND old.status IS NOT 'Cancelada';
+        UPDATE faturacao_clientes SET total = total - old.valor_total
+        WHERE cliente_id = old.cliente_id AND old.status IS NOT 'Cancelada';
+
+        INSERT INTO reservas_mensal (mes, reservas, faturacao)
+        SELECT substr(new.data_inicio, 1, 7), 1, new.valor_total WHERE new.status IS NOT 'Cancelada'
+        ON CONFLICT (mes) DO UPDATE SET reservas = reservas + 1, faturacao = faturacao + excluded.faturacao;
+        INSERT INTO faturacao_clientes (cliente_id, total)
+        SELECT new.cliente_id, new.valor_total WHERE new.status IS NOT 'Cancelada'
+        ON CONFLICT (cliente_id) DO UPDATE SET total = total + excluded.total;
+    END;
+'''
+
+
+def criar_tabelas(conn):
+    """Cria as tabelas e os triggers; na primeira vez preenche-as a partir das reservas existentes."""
+    existia = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reservas_mensal'"
+    ).fetchone()
+    conn.executescript(ESQUEMA)
+    if not existia:
+        reconstruir(conn)
+
+
+def reconstruir(conn):
+    #volta a calcular tudo a partir das reservas (arquivo por ano e base principal): cada fonte é somada
+    #em memória com o seu ano ligado só durante a leitura, e os totais são gravados numa só transação
+    meses = defaultdict(lambda: [0, 0.0])
+    clientes = defaultdict(float)
+    for fonte in arquivo.fontes(conn, "reservas"):
+        for mes, reservas, faturacao in conn.execute(f'''
+            SELECT substr(data_inicio, 1, 7), COUNT(*), SUM(valor_total)
+            FROM {fonte} WHERE status IS NOT 'Cancelada'
+            GROUP BY 1
+        '''):
+            meses[mes][0] += reservas
+            meses[mes][1] += faturacao
+        for cliente_id, total in conn.execute(f'''
+            SELECT cliente_id, SUM(valor_total)
+            FROM {fonte} WHERE status IS NOT 'Cancelada'
+            GROUP BY cliente_id
+        '''):
+            clientes[cliente_id] += total
+    conn.execute("DELETE FROM reservas_mensal")
+    conn.execute("DELETE FROM faturacao_clientes")
+    conn.executemany("INSERT INTO reservas_mensal (mes, reservas, faturacao) VALUES (?, ?, ?)",
+                     [(mes, reservas, faturacao) for mes, (reservas, faturacao) in meses.items()])
+    conn.executemany("INSERT INTO faturacao_clientes (cliente_id, total) VALUES (?, ?)", clientes.items())
+    conn.commit()
+
+
+def por_mes(conn, primeiro, ultimo):
+    #{mes: (reservas, faturacao)} para os meses "YYYY-MM" entre primeiro e ultimo (pesquisa na chave primária)
+    return {
+        mes: (reservas, faturacao)
+        for mes, reservas, faturacao in conn.execute(
+            "SELECT mes, reservas, faturacao FROM reservas_mensal WHERE mes BETWEEN ? AND ?", (primeiro, ultimo)
+        )
+    }
+
+
+def top_clientes(conn, n=5):
+    #[(cliente_id, nome, total)] pelo índice de total
+    return conn.execute('''
+        SELECT f.cliente_id, c.nome, f.total
+        FROM faturacao_clientes f
+        LEFT JOIN clientes c ON c.id = f.cliente_id
+        ORDER BY f.total DESC
+        LIMIT ?
+    ''', (n,)).fetchall()
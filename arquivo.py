@@ -0,0 +1,165 @@
+import json
+import os
+import re
+from collections import defaultdict
+
+from base_dados import transacao_imediata
+
+"""
+arquivo.py
+
+Arquivo das reservas antigas (e respetivos pagamentos) em bases de dados SQLite por ano:
+- Os ficheiros ficam em <base>-arquivo/<ano>.db, ao lado da base de dados principal
+  (ex.: database/banco_de_dados-arquivo/2023.db); o ano é o de data_inicio.
+- A base principal fica só com as reservas "quentes", por isso cabe na cache de páginas do sistema.
+- Quem precisa do histórico (reconstrução dos agregados, exportações completas) percorre fontes(conn, tabela):
+  cada ano é ligado com ATTACH só enquanto é lido e desligado a seguir, e no fim vem a base principal.
+  O SQLite aceita no máximo 10 bases ligadas por conexão (SQLITE_MAX_ATTACHED), por isso nunca se
+  ligam todos os anos ao mesmo tempo. As rotas normais nunca leem o arquivo.
+"""
+
+COLUNAS_RESERVAS = "id, cliente_id, veiculo_id, data_inicio, data_fim, valor_total, status"
+COLUNAS_PAGAMENTOS = "id, reserva_id, numero_cartao, nome_cartao, validade, codigo_seg"
+#tabelas com arquivo e as colunas comuns à base principal e aos anos
+COLUNAS = {"reservas": COLUNAS_RESERVAS, "pagamentos": COLUNAS_PAGAMENTOS}
+
+#índice para mover os pagamentos de cada lote de reservas sem percorrer a tabela toda
+INDICES = '''
+    CREATE INDEX IF NOT EXISTS idx_pagamentos_reserva ON pagamentos (reserva_id);
+'''
+
+#WAL também no arquivo: o dashboard pode ler um ano enquanto o ciclo de reservas lhe junta linhas
+ESQUEMA_ANO = '''
+    PRAGMA {bd}.journal_mode=WAL;
+    CREATE TABLE IF NOT EXISTS {bd}.reservas (
+        id INTEGER PRIMARY KEY,
+        cliente_id INTEGER NOT NULL,
+        veiculo_id INTEGER NOT NULL,
+        data_inicio DATE NOT NULL,
+        data_fim DATE NOT NULL,
+        valor_total REAL NOT NULL,
+        status TEXT,
+        arquivada_em TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS {bd}.pagamentos (
+        id INTEGER PRIMARY KEY,
+        reserva_id INTEGER NOT NULL,
+        numero_cartao TEXT NOT NULL,
+        nome_cartao TEXT NOT NULL,
+        validade TEXT NOT NULL,
+        codigo_seg INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS {bd}.idx_pagamentos_reserva ON pagamentos (reserva_id);
+'''
+
+_FICHEIRO_ANO = re.compile(r"(\d{4})\.db")
+
+
+def pasta_arquivo(conn):
+    #<base principal sem extensão>-arquivo
+    caminho = next(linha[2] for linha in conn.execute("PRAGMA database_list") if linha[1] == "main")
+    return os.path.splitext(caminho)[0] + "-arquivo"
+
+
+def anos_arquivados(pasta):
+    if not os.path.isdir(pasta):
+        return []
+    return sorted(int(m.group(1)) for m in map(_FICHEIRO_ANO.fullmatch, os.listdir(pasta)) if m)
+
+
+def criar(conn):
+    """Índices de apoio ao arquivo na base principal."""
+    conn.executescript(INDICES)
+    conn.commit()
+
+
+def _ligada(conn, caminho):
+    #nome com que o ficheiro já está ligado à conexão, ou None
+    caminho = os.path.abspath(caminho)
+    for _, nome, ficheiro in conn.execute("PRAGMA database_list"):
+        if ficheiro and os.path.abspath(ficheiro) == caminho:
+            return nome
+    return None
+
+
+def fontes(conn, tabela):
+    """
+    Gera os nomes das tabelas onde estão as linhas de `tabela` ("reservas" ou "pagamentos"): primeiro
+    "arquivo.<tabela>" para cada ano do arquivo (por ordem), depois "main.<tabela>". Cada ano fica ligado só
+    até se pedir o nome seguinte, por isso o número de anos não esbarra no limite de bases ligadas.
+    Não pode ser usada a meio de uma transação (ATTACH/DETACH).
+    """
+    if tabela not in COLUNAS:
+        raise ValueError(f"Tabela sem arquivo: {tabela}")
+    pasta = pasta_arquivo(conn)
+    for ano in anos_arquivados(pasta):
+        caminho = os.path.join(pasta, f"{ano}.db")
+        nome = _ligada(conn, caminho)
+        if nome is not None:
+            yield f"{nome}.{tabela}"
+            continue
+        conn.execute("ATTACH DATABASE ? AS arquivo", (caminho,))
+        try:
+            yield f"arquivo.{tabela}"
+        finally:
+            conn.execute("DETACH DATABASE arquivo")
+    yield f"main.{tabela}"
+
+
+def _mover(conn, pasta, ano, ids):
+    """
+    Copia as reservas `ids` e os seus pagamentos para <pasta>/<ano>.db e apaga-as
+    da base principal. A cópia é idempotente (INSERT OR REPLACE): se o processo parar entre as duas
+    bases, a execução seguinte volta a mover as mesmas linhas sem as duplicar no arquivo.
+    """
+    #se o ano já estiver ligado (fontes), usa essa ligação: o mesmo ficheiro ligado duas vezes
+    #na mesma conexão bloqueava-se a si próprio
+    caminho = os.path.join(pasta, f"{ano}.db")
+    destino = _ligada(conn, caminho)
+    ligado = destino is not None
+    if not ligado:
+        destino = "destino"
+        conn.execute("ATTACH DATABASE ? AS destino", (caminho,))
+    try:
+        conn.executescript(ESQUEMA_ANO.format(bd=destino))
+        lista = json.dumps(ids)
+        with transacao_imediata(conn):
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {destino}.reservas ({COLUNAS_RESERVAS}, arquivada_em)
+                SELECT {COLUNAS_RESERVAS}, datetime('now') FROM main.reservas
+                WHERE id IN (SELECT value FROM json_each(?))
+            """, (lista,))
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {destino}.pagamentos ({COLUNAS_PAGAMENTOS})
+                SELECT {COLUNAS_PAGAMENTOS} FROM main.pagamentos
+                WHERE reserva_id IN (SELECT value FROM json_each(?))
+            """, (lista,))
+            conn.execute("DELETE FROM main.pagamentos WHERE reserva_id IN (SELECT value FROM json_each(?))", (lista,))
+            conn.execute("DELETE FROM main.reservas WHERE id IN (SELECT value FROM json_each(?))", (lista,))
+    finally:
+        if not ligado:
+            conn.execute("DETACH DATABASE destino")
+
+
+def arquivar(conn, limite, estados, tamanho_lote):
+    """
+    Move para o arquivo do respetivo ano as reservas com status em `estados` e data_fim anterior a
+    `limite` (ISO), com os seus pagamentos, em lotes de `tamanho_lote`. Devolve o número de reservas movidas.
+    """
+    pasta = pasta_arquivo(conn)
+    os.makedirs(pasta, exist_ok=True)
+    marcadores = ", ".join("?" * len(estados))
+    total = 0
+    while True:
+        linhas = conn.execute(f"""
+            SELECT id, substr(data_inicio, 1, 4) FROM main.reservas
+            WHERE status IN ({marcadores}) AND data_fim < ? LIMIT ?
+        """, (*estados, limite, tamanho_lote)).fetchall()
+        por_ano = defaultdict(list)
+        for reserva_id, ano in linhas:
+            por_ano[int(ano)].append(reserva_id)
+        for ano, ids in por_ano.items():
+            _mover(conn, pasta, ano, ids)
+        total += len(linhas)
+        if len(linhas) < tamanho_lote:
+            return total
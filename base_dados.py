@@ -0,0 +1,162 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from flask import current_app, g
+
+import instrumentacao
+
+"""
+base_dados.py
+
+Camada de acesso ao SQLite usada pelas rotas da aplicação:
+- Conexões configuradas uma única vez (WAL, synchronous=NORMAL, busy_timeout, mmap e cache).
+- Pool limitado de conexões reutilizadas entre pedidos.
+- Uma conexão por pedido guardada em flask.g e devolvida ao pool automaticamente no teardown.
+"""
+
+#Valores por omissão das pragmas (podem ser alterados em app.config)
+BUSY_TIMEOUT_MS = 5000              #tempo de espera por um lock antes de dar "database is locked"
+MMAP_SIZE = 256 * 1024 * 1024       #256 MB de leitura via mmap
+CACHE_SIZE_KB = 20000               #cache de páginas por conexão (~20 MB)
+TAMANHO_POOL = 8                    #número máximo de conexões abertas em simultâneo
+ESPERA_POOL = 10.0                  #segundos à espera de uma conexão livre
+
+
+def nova_conexao(caminho, busy_timeout_ms=BUSY_TIMEOUT_MS, mmap_size=MMAP_SIZE, cache_size_kb=CACHE_SIZE_KB,
+                 factory=sqlite3.Connection):
+    """
+    Abre uma conexão SQLite já afinada para acesso concorrente.
+    As pragmas são aplicadas só aqui, quando a conexão é criada, e não em cada pedido.
+    factory=instrumentacao.ConexaoMedida mede cada consulta (usado no pool dos pedidos).
+    """
+    conn = sqlite3.connect(caminho, timeout=busy_timeout_ms / 1000, check_same_thread=False, factory=factory)
+    conn.row_factory = sqlite3.Row
+    #WAL permite que os leitores (/carros) não fiquem bloqueados pelos escritores
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+    conn.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+    #valor negativo = tamanho em KiB em vez de número de páginas
+    conn.execute(f"PRAGMA cache_size=-{int(cache_size_kb)}")
+    return conn
+
+
+class PoolConexoes:
+    """
+    Pool limitado de conexões SQLite.
+    - No máximo `tamanho_max` conexões emprestadas ao mesmo tempo; os restantes pedidos esperam.
+    - As conexões livres são reutilizadas (LIFO, para manter a cache da conexão "quente").
+    - Depois de um fork (ex.: workers do gunicorn) o pool é reiniciado, pois conexões não podem cruzar processos.
+    """
+
+    def __init__(self, caminho, tamanho_max=TAMANHO_POOL, espera=ESPERA_POOL, **pragmas):
+        self.caminho = caminho
+        self.tamanho_max = tamanho_max
+        self.espera = espera
+        self.pragmas = pragmas
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self._pid = os.getpid()
+        self._livres = queue.LifoQueue()
+        self._vagas = threading.BoundedSemaphore(self.tamanho_max)
+
+    def obter(self):
+        #conexões herdadas do processo pai não são seguras: começa um pool novo
+        if os.getpid() != self._pid:
+            self._reiniciar()
+
+        if not self._vagas.acquire(timeout=self.espera):
+            raise sqlite3.OperationalError("Pool de conexões esgotado.")
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            try:
+                return nova_conexao(self.caminho, **self.pragmas)
+            except Exception:
+                self._vagas.release()
+                raise
+
+    def devolver(self, conn):
+        if os.getpid() != self._pid:
+            return
+        try:
+            #desfaz qualquer transação deixada aberta por um pedido que falhou
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+        else:
+            self._livres.put(conn)
+        finally:
+            self._vagas.release()
+
+    def fechar(self):
+        #fecha todas as conexões livres (as emprestadas são fechadas ao serem devolvidas)
+        while True:
+            try:
+                self._livres.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def init_app(app, caminho):
+    """
+    Regista o pool na aplicação e o hook de teardown que devolve a conexão de cada pedido.
+    """
+    app.config.setdefault("BD_CAMINHO", caminho)
+    app.config.setdefault("BD_TAMANHO_POOL", TAMANHO_POOL)
+    app.config.setdefault("BD_BUSY_TIMEOUT_MS", BUSY_TIMEOUT_MS)
+    app.config.setdefault("BD_MMAP_SIZE", MMAP_SIZE)
+    app.config.setdefault("BD_CACHE_SIZE_KB", CACHE_SIZE_KB)
+    app.config.setdefault("BD_MEDIR_SQL", True)     #latência e linhas de cada consulta em /metrics
+
+    app.extensions["pool_bd"] = PoolConexoes(
+        app.config["BD_CAMINHO"],
+        tamanho_max=app.config["BD_TAMANHO_POOL"],
+        busy_timeout_ms=app.config["BD_BUSY_TIMEOUT_MS"],
+        mmap_size=app.config["BD_MMAP_SIZE"],
+        cache_size_kb=app.config["BD_CACHE_SIZE_KB"],
+        factory=instrumentacao.ConexaoMedida if app.config["BD_MEDIR_SQL"] else sqlite3.Connection,
+    )
+    app.teardown_appcontext(devolver_bd)
+
+
+def obter_bd():
+    """
+    Devolve a conexão do pedido atual, pedindo-a ao pool apenas na primeira utilização.
+    """
+    if "bd" not in g:
+        g.bd = current_app.extensions["pool_bd"].obter()
+    return g.bd
+
+
+def devolver_bd(exc=None):
+    #chamado automaticamente no fim de cada pedido/app context
+    conn = g.pop("bd", None)
+    if conn is not None:
+        current_app.extensions["pool_bd"].devolver(conn)
+
+
+@contextmanager
+def transacao_imediata(conn):
+    """
+    Abre uma transação com BEGIN IMMEDIATE: o lock de escrita é obtido logo no início,
+    por isso as leituras feitas dentro do bloco não podem ser invalidadas por outro escritor
+    antes do commit. Faz commit no fim do bloco e rollback se houver exceção.
+    Lança sqlite3.ProgrammingError se a conexão já tiver uma transação aberta: o chamador tem de fazer
+    commit (ou rollback) antes, em vez de esse trabalho ser gravado aqui sem ele saber.
+    """
+    if conn.in_transaction:
+        raise sqlite3.ProgrammingError("Transação por terminar na conexão: commit ou rollback antes de BEGIN IMMEDIATE.")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+"""
+bench_carros.py
+
+Latência de /carros com 10k/100k/1M reservas: compara a consulta antiga (NOT IN + date(data_fim))
+com a nova (NOT EXISTS com comparação ISO sobre o índice (status, veiculo_id, data_fim)) e mede a rota completa,
+com e sem intervalo de datas (?data_inicio=&data_fim=).
+
+Uso:
+    python benchmarks/bench_carros.py                     (10k, 100k e 1M reservas)
+    python benchmarks/bench_carros.py --reservas 10000 100000
+"""
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SQL_ANTIGA = '''
+    SELECT v.*
+    FROM veiculos v
+    WHERE v.id NOT IN (
+        SELECT r.veiculo_id
+        FROM reservas r
+        WHERE date(r.data_fim) >= DATE('now')
+            AND r.status = 'Ativa'
+        )
+'''
+
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        "media_ms": round(statistics.mean(tempos), 3),
+        "p50_ms": round(tempos[len(tempos) // 2], 3),
+        "p95_ms": round(tempos[int(len(tempos) * 0.95) - 1], 3),
+    }
+
+
+def correr_um_tamanho(n_reservas, n_veiculos, repeticoes):
+    #corre num processo próprio: BD_CAMINHO tem de estar definido antes de importar a aplicação
+    sys.path.insert(0, RAIZ)
+    sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+    from datetime import date, timedelta
+    import project_web
+    import dados_sinteticos
+    from disponibilidade import SQL_SEM_RESERVA_ATIVA
+
+    project_web.criar_tabelas()
+    conn = project_web.conectar_bd()
+    dados_sinteticos.gerar(conn, n_clientes=max(100, n_reservas // 20), n_veiculos=n_veiculos, n_reservas=n_reservas)
+    conn.execute("ANALYZE")
+
+    hoje = date.today().isoformat()
+    fim_intervalo = (date.today() + timedelta(days=7)).isoformat()
+    sql_nova = f"SELECT v.* FROM veiculos v WHERE {SQL_SEM_RESERVA_ATIVA}"
+
+    cliente = project_web.app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao["usuario"] = "cliente1"
+
+    resultado = {
+        "reservas": n_reservas,
+        "veiculos": n_veiculos,
+        "sql_antiga": _medir(lambda: conn.execute(SQL_ANTIGA).fetchall(), repeticoes),
+        "sql_nova": _medir(lambda: conn.execute(sql_nova, (hoje,)).fetchall(), repeticoes),
+        "rota_carros": _medir(lambda: cliente.get("/carros"), repeticoes),
+        "rota_carros_intervalo": _medir(
+            lambda: cliente.get(f"/carros?data_inicio={hoje}&data_fim={fim_intervalo}"), repeticoes
+        ),
+    }
+    resultado["intervalo_por_veiculo_ms"] = round(resultado["rota_carros_intervalo"]["p50_ms"] / n_veiculos, 4)
+    conn.close()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência de /carros por tamanho do histórico de reservas.")
+    parser.add_argument("--reservas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--veiculos", type=int, default=500)
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        print(json.dumps(correr_um_tamanho(args.reservas[0], args.veiculos, args.repeticoes)))
+        return
+
+    for n in args.reservas:
+        with tempfile.TemporaryDirectory() as pasta:
+            env = dict(os.environ, BD_CAMINHO=os.path.join(pasta, "bench.db"))
+            saida = subprocess.run(
+                [sys.executable, __file__, "--filho", "--reservas", str(n),
+                 "--veiculos", str(args.veiculos), "--repeticoes", str(args.repeticoes)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(saida.strip().splitlines()[-1])
+            print(f"{n:>9} reservas | SQL antiga p50 {r['sql_antiga']['p50_ms']:>9} ms"
+                  f" | SQL nova p50 {r['sql_nova']['p50_ms']:>8} ms"
+                  f" | /carros p50 {r['rota_carros']['p50_ms']:>8} ms p95 {r['rota_carros']['p95_ms']:>8} ms"
+                  f" | /carros com datas p50 {r['rota_carros_intervalo']['p50_ms']:>8} ms"
+                  f" ({r['intervalo_por_veiculo_ms']} ms/veículo)")
+
+
+if __name__ == "__main__":
+    main()
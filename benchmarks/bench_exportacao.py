@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+"""
+bench_exportacao.py
+
+Compara a exportação antiga (pandas.read_sql_query + DataFrame.to_excel, tabela inteira em memória)
+com a exportação em streaming (exportacao.py) para xlsx, csv e parquet.
+Cada variante corre num processo próprio para medir o pico de memória (RSS máximo) isoladamente.
+
+Uso:
+    python benchmarks/bench_exportacao.py                  (1M reservas)
+    python benchmarks/bench_exportacao.py --linhas 100000
+"""
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VARIANTES = ["pandas_xlsx", "streaming_xlsx", "streaming_csv", "streaming_parquet"]
+
+
+def _preparar(caminho_bd, linhas):
+    sys.path.insert(0, RAIZ)
+    sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+    os.environ["BD_CAMINHO"] = caminho_bd
+    import project_web
+    import dados_sinteticos
+
+    project_web.criar_tabelas()
+    conn = project_web.conectar_bd()
+    dados_sinteticos.gerar(conn, n_clientes=1000, n_veiculos=200, n_reservas=linhas)
+    conn.close()
+
+
+def _correr_variante(variante, caminho_bd, pasta):
+    """Corre num processo filho; devolve tempo e RSS máximo."""
+    sys.path.insert(0, RAIZ)
+    import sqlite3
+
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(caminho_bd)
+    if variante == "pandas_xlsx":
+        import pandas as pd
+        df = pd.read_sql_query("SELECT * FROM reservas;", conn)
+        df.to_excel(os.path.join(pasta, "reservas_pandas.xlsx"), index=False, engine="openpyxl")
+        linhas = len(df)
+    else:
+        import exportacao
+        formato = variante.split("_", 1)[1]
+        linhas = exportacao.exportar_tabela(conn, "reservas", os.path.join(pasta, f"reservas.{formato}"), formato)
+    conn.close()
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "variante": variante,
+        "linhas": linhas,
+        "segundos": round(duracao, 2),
+        "linhas_por_segundo": round(linhas / duracao),
+        #ru_maxrss vem em KiB no Linux
+        "rss_max_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de exportação: pandas vs streaming.")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="número de reservas a exportar")
+    parser.add_argument("--variantes", nargs="+", default=VARIANTES, choices=VARIANTES)
+    parser.add_argument("--filho", nargs=3, metavar=("VARIANTE", "BD", "PASTA"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        print(json.dumps(_correr_variante(*args.filho)))
+        return
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_bd = os.path.join(pasta, "bench.db")
+        subprocess.run([sys.executable, "-c",
+                        f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r}); "
+                        f"import bench_exportacao; bench_exportacao._preparar({caminho_bd!r}, {args.linhas})"],
+                       check=True, capture_output=True)
+
+        print(f"{'variante':<20}{'linhas':>10}{'segundos':>10}{'linhas/s':>12}{'RSS máx (MB)':>14}")
+        for variante in args.variantes:
+            saida = subprocess.run([sys.executable, __file__, "--filho", variante, caminho_bd, pasta],
+                                   check=True, capture_output=True, text=True).stdout
+            r = json.loads(saida.strip().splitlines()[-1])
+            print(f"{r['variante']:<20}{r['linhas']:>10}{r['segundos']:>10}{r['linhas_por_segundo']:>12}{r['rss_max_mb']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+"""
+bench_importacao.py
+
+Importação em massa da frota (importacao.py) a partir de CSV (e opcionalmente XLSX):
+- frota nova numa base vazia, com triggers por linha e em modo em massa (triggers/índices recriados no fim);
+- reimportar o mesmo ficheiro (tudo inalterado) e com 10% dos preços mudados (upsert);
+- ficheiro pequeno numa frota grande (modo automático fica com os triggers).
+Mostra linhas/s e compara as importações grandes em CSV (modo automático) com o objetivo (--objetivo);
+termina com código 1 se alguma ficar abaixo.
+
+Uso:
+    python benchmarks/bench_importacao.py --veiculos 100000 [--xlsx] [--objetivo 20000]
+"""
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def escrever_ficheiro(caminho, linhas, cabecalho):
+    if caminho.endswith(".csv"):
+        with open(caminho, "w", newline="", encoding="utf-8") as ficheiro:
+            escritor = csv.writer(ficheiro)
+            escritor.writerow(cabecalho)
+            escritor.writerows(linhas)
+    else:
+        from openpyxl import Workbook
+        livro = Workbook(write_only=True)
+        folha = livro.create_sheet("Sheet1")
+        folha.append(cabecalho)
+        for linha in linhas:
+            folha.append(linha)
+        livro.save(caminho)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da importação em massa da frota.")
+    parser.add_argument("--veiculos", type=int, default=100_000)
+    parser.add_argument("--pequeno", type=int, default=1000, help="linhas do ficheiro pequeno")
+    parser.add_argument("--xlsx", action="store_true", help="mede também XLSX")
+    parser.add_argument("--objetivo", type=int, default=20_000, help="linhas/s mínimas nas importações grandes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ["BD_CAMINHO"] = os.path.join(pasta, "bench.db")
+        os.environ["CACHE_CAMINHO"] = os.path.join(pasta, "cache.db")
+        sys.path.insert(0, RAIZ)
+        sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+        import project_web
+        import dados_sinteticos
+        import importacao
+
+        cabecalho = ["id", *importacao.COLUNAS]
+        rng = random.Random(42)
+        frota = [(i + 1, *veiculo, dados_sinteticos.matricula(i)) for i, veiculo in enumerate(dados_sinteticos.gerar_veiculos(rng, args.veiculos))]
+        alterada = [linha[:8] + (round(linha[8] * 1.1, 2),) + linha[9:] if i % 10 == 0 else linha for i, linha in enumerate(frota)]
+        extensoes = [".csv"] + ([".xlsx"] if args.xlsx else [])
+        ficheiros = {}
+        for extensao in extensoes:
+            for nome, linhas in (("frota", frota), ("alterada", alterada)):
+                ficheiros[nome + extensao] = os.path.join(pasta, nome + extensao)
+                escrever_ficheiro(ficheiros[nome + extensao], linhas, cabecalho)
+        pequeno = [(None, *veiculo, f"NOVA-{i}") for i, veiculo in enumerate(dados_sinteticos.gerar_veiculos(rng, args.pequeno))]
+        ficheiros["pequeno.csv"] = os.path.join(pasta, "pequeno.csv")
+        escrever_ficheiro(ficheiros["pequeno.csv"], pequeno, cabecalho)
+
+        def base_vazia():
+            for sufixo in ("", "-wal", "-shm"):
+                if os.path.exists(os.environ["BD_CAMINHO"] + sufixo):
+                    os.remove(os.environ["BD_CAMINHO"] + sufixo)
+            project_web.criar_tabelas()
+            return project_web.conectar_bd()
+
+        casos = []
+
+        def medir(nome, conn, ficheiro, com_objetivo=True, **opcoes):
+            relatorio = importacao.importar(conn, ficheiros[ficheiro], **opcoes)
+            casos.append((nome, relatorio, com_objetivo))
+            modo = "em massa" if relatorio["em_massa"] else "triggers"
+            print(f"{nome:<34}{relatorio['lidas']:>9}{relatorio['inseridas']:>10}{relatorio['atualizadas']:>10}"
+                  f"{relatorio['segundos']:>9.2f}{relatorio['linhas_por_segundo']:>10}  {modo}")
+
+        print(f"{'caso':<34}{'lidas':>9}{'inseridas':>10}{'atualiz.':>10}{'s':>9}{'linhas/s':>10}")
+        for extensao in extensoes:
+            conn = base_vazia()
+            medir(f"base vazia, triggers ({extensao})", conn, "frota" + extensao, com_objetivo=False, em_massa=False)
+            conn.close()
+
+            conn = base_vazia()
+            medir(f"base vazia, automático ({extensao})", conn, "frota" + extensao)
+            medir(f"reimportar igual ({extensao})", conn, "frota" + extensao)
+            medir(f"reimportar 10% alterados ({extensao})", conn, "alterada" + extensao)
+            if extensao == ".csv":
+                medir("ficheiro pequeno, frota grande", conn, "pequeno.csv", com_objetivo=False)
+            #o índice FTS ficou completo depois do modo em massa
+            indexados = conn.execute("SELECT COUNT(*) FROM veiculos_fts WHERE veiculos_fts MATCH 'honda'").fetchone()[0]
+            honda = conn.execute("SELECT COUNT(*) FROM veiculos WHERE marca = 'Honda'").fetchone()[0]
+            assert indexados == honda, (indexados, honda)
+            conn.close()
+
+        #o objetivo é para CSV no modo automático; XLSX fica limitado pela leitura do openpyxl
+        abaixo = [nome for nome, relatorio, com_objetivo in casos
+                  if com_objetivo and "xlsx" not in nome and relatorio["linhas_por_segundo"] < args.objetivo]
+        print(f"\nObjetivo CSV: {args.objetivo} linhas/s -> " + ("OK" if not abaixo else "abaixo em: " + ", ".join(abaixo)))
+        sys.exit(1 if abaixo else 0)
+
+
+if __name__ == "__main__":
+    main()
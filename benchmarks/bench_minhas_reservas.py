@@ -0,0 +1,131 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+"""
+bench_minhas_reservas.py
+
+/minhas_reservas para um cliente com muitas reservas (10k+):
+- antigo: SELECT id FROM clientes + JOIN sem índice em reservas.cliente_id + strptime por linha para o total
+- keyset: a consulta paginada com o índice (cliente_id, data_inicio, id), ainda com strptime por linha
+- cobertura: reservas.SQL_DO_CLIENTE com o índice de cobertura e o valor_total guardado
+Mede a lista completa e a primeira página (como a rota) com cada índice.
+
+Uso:
+    python benchmarks/bench_minhas_reservas.py --reservas-cliente 10000 50000
+"""
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SQL_ANTIGO = '''
+    SELECT reservas.id, veiculos.marca, veiculos.modelo, reservas.data_inicio, reservas.data_fim,
+           veiculos.valor_diaria, reservas.status
+    FROM reservas
+    JOIN veiculos ON reservas.veiculo_id = veiculos.id
+    WHERE reservas.cliente_id = ?
+'''
+INDICE_ANTIGO = "CREATE INDEX idx_reservas_cliente_inicio ON reservas (cliente_id, data_inicio, id)"
+
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def _totais_python(linhas):
+    #o que a rota fazia por linha antes de usar valor_total
+    return [
+        ((datetime.strptime(fim, "%Y-%m-%d") - datetime.strptime(ini, "%Y-%m-%d")).days + 1) * diaria
+        for _, _, _, ini, fim, diaria, _ in linhas
+    ]
+
+
+def _reservas_cliente(n, cliente_id, n_veiculos, hoje):
+    rng = random.Random(7)
+    for _ in range(n):
+        inicio = hoje - timedelta(days=rng.randint(0, 3650))
+        dias = rng.randint(1, 14)
+        yield (cliente_id, rng.randint(1, n_veiculos), inicio.isoformat(),
+               (inicio + timedelta(days=dias - 1)).isoformat(), dias * 50.0, "Ativa")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de /minhas_reservas com muitas reservas por cliente.")
+    parser.add_argument("--reservas-cliente", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--reservas", type=int, default=500_000, help="reservas dos restantes clientes")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ["BD_CAMINHO"] = os.path.join(pasta, "bench.db")
+        sys.path.insert(0, RAIZ)
+        sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+        import project_web
+        import dados_sinteticos
+        import paginacao
+        import reservas
+
+        project_web.criar_tabelas()
+        conn = project_web.conectar_bd()
+        dados_sinteticos.gerar(conn, n_clientes=1000, n_veiculos=500, n_reservas=args.reservas)
+
+        #um cliente novo por tamanho, com todas as reservas dele
+        clientes = []
+        for n in args.reservas_cliente:
+            usuario = f"pesado{n}"
+            cliente_id = conn.execute(
+                "INSERT INTO clientes (nome, usuario, senha) VALUES (?, ?, 'x')", (usuario, usuario)
+            ).lastrowid
+            conn.executemany('''
+                INSERT INTO reservas (cliente_id, veiculo_id, data_inicio, data_fim, valor_total, status)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', _reservas_cliente(n, cliente_id, 500, date.today()))
+            clientes.append((n, usuario, cliente_id))
+        conn.commit()
+        total = conn.execute("SELECT COUNT(*) FROM reservas").fetchone()[0]
+        print(f"{total} reservas no total\n")
+
+        ordem, chaves = reservas.ORDEM_DO_CLIENTE
+
+        def antigo(usuario):
+            cliente_id = conn.execute("SELECT id FROM clientes WHERE usuario = ?", (usuario,)).fetchone()[0]
+            return _totais_python(conn.execute(SQL_ANTIGO, (cliente_id,)).fetchall())
+
+        def keyset(cliente_id):
+            pagina = paginacao.paginar(conn, SQL_ANTIGO, (cliente_id,), ["reservas.data_inicio", "reservas.id"],
+                                       ["data_inicio", "id"], descendente=True)
+            return _totais_python(pagina.linhas)
+
+        def cobertura_tudo(cliente_id):
+            return conn.execute(reservas.SQL_DO_CLIENTE, (cliente_id,)).fetchall()
+
+        def cobertura_pagina(cliente_id):
+            return paginacao.paginar(conn, reservas.SQL_DO_CLIENTE, (cliente_id,), ordem, chaves, descendente=True)
+
+        print(f"{'reservas':>9}{'antigo (sem índice)':>22}{'keyset (índice)':>18}{'cobertura tudo':>17}{'cobertura pág.':>17}  (ms, mediana)")
+        for n, usuario, cliente_id in clientes:
+            conn.execute("DROP INDEX IF EXISTS idx_reservas_cliente_cobertura")
+            t_antigo = _medir(lambda: antigo(usuario), args.repeticoes)
+            conn.execute(INDICE_ANTIGO)
+            t_keyset = _medir(lambda: keyset(cliente_id), args.repeticoes)
+            reservas.criar_indices(conn)
+            t_tudo = _medir(lambda: cobertura_tudo(cliente_id), args.repeticoes)
+            t_pagina = _medir(lambda: cobertura_pagina(cliente_id), args.repeticoes)
+            print(f"{n:>9}{t_antigo:>22.2f}{t_keyset:>18.2f}{t_tudo:>17.2f}{t_pagina:>17.2f}")
+
+        plano = conn.execute("EXPLAIN QUERY PLAN " + reservas.SQL_DO_CLIENTE, (1,)).fetchall()
+        print("\nplano:", "; ".join(linha[3] for linha in plano))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
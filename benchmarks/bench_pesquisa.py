@@ -0,0 +1,80 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+"""
+bench_pesquisa.py
+
+Pesquisa de veículos numa frota de 100k: seis LOWER(col) LIKE '%x%' (caminho antigo) contra o índice FTS5
+(pesquisa.py). Mede a consulta completa (todas as correspondências) e a primeira página (LIMIT 13, como /carros)
+para termos frequentes, raros e inexistentes.
+
+Uso:
+    python benchmarks/bench_pesquisa.py --veiculos 100000
+"""
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SQL_LIKE = '''
+    SELECT v.* FROM veiculos v
+    WHERE (LOWER(v.marca) LIKE ?
+        OR LOWER(v.modelo) LIKE ?
+        OR LOWER(v.categoria) LIKE ?
+        OR LOWER(v.tipo) LIKE ?
+        OR LOWER(v.transmissao) LIKE ?
+        OR LOWER(v.valor_diaria) LIKE ?)
+'''
+
+TERMOS = ["honda", "médio", "autom", "ninja 400", "inexistente"]
+
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de pesquisa: LIKE vs FTS5.")
+    parser.add_argument("--veiculos", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.environ["BD_CAMINHO"] = os.path.join(pasta, "bench.db")
+        sys.path.insert(0, RAIZ)
+        sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+        import project_web
+        import dados_sinteticos
+        import pesquisa
+
+        project_web.criar_tabelas()
+        conn = project_web.conectar_bd()
+        inicio = time.perf_counter()
+        dados_sinteticos.gerar(conn, n_clientes=100, n_veiculos=args.veiculos, n_reservas=1000)
+        print(f"{args.veiculos} veículos inseridos (com triggers FTS) em {time.perf_counter() - inicio:.1f} s\n")
+
+        sql_fts = f"SELECT v.* FROM veiculos v WHERE {pesquisa.SQL_CORRESPONDE}"
+        print(f"{'termo':<14}{'resultados':>11}{'LIKE tudo':>12}{'FTS tudo':>11}{'LIKE pág.':>12}{'FTS pág.':>11}  (ms, mediana)")
+        for termo in TERMOS:
+            like = (f"%{termo}%",) * 6
+            fts = (pesquisa.expressao_fts(termo),)
+            n = len(conn.execute(sql_fts, fts).fetchall())
+            linha = [
+                _medir(lambda: conn.execute(SQL_LIKE, like).fetchall(), args.repeticoes),
+                _medir(lambda: conn.execute(sql_fts, fts).fetchall(), args.repeticoes),
+                _medir(lambda: conn.execute(SQL_LIKE + " ORDER BY v.id LIMIT 13", like).fetchall(), args.repeticoes),
+                _medir(lambda: conn.execute(sql_fts + " ORDER BY v.id LIMIT 13", fts).fetchall(), args.repeticoes),
+            ]
+            print(f"{termo:<14}{n:>11}" + "".join(f"{t:>12.2f}" if i % 2 == 0 else f"{t:>11.2f}" for i, t in enumerate(linha)))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+"""
+bench_senhas.py
+
+Logins por segundo (verificação scrypt no pool de senhas.py) para vários custos N,
+com vários pedidos em simultâneo, como numa vaga de logins. Mostra também a latência
+mediana e p95 de cada verificação vista pelo pedido.
+
+Uso:
+    python benchmarks/bench_senhas.py --custos 4096 8192 16384 32768 --clientes 16
+"""
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de logins/s por custo scrypt.")
+    parser.add_argument("--custos", type=int, nargs="+", default=[2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15])
+    parser.add_argument("--clientes", type=int, default=16, help="pedidos de login em simultâneo")
+    parser.add_argument("--logins", type=int, default=64, help="logins por custo")
+    parser.add_argument("--trabalhadores", type=int, default=None, help="threads do pool (omissão: núcleos)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, RAIZ)
+    import senhas
+
+    print(f"{os.cpu_count()} núcleos, {args.clientes} pedidos em simultâneo\n")
+    print(f"{'N':>7}{'memória':>10}{'logins/s':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+    for n in args.custos:
+        senhas.configurar(n=n, trabalhadores=args.trabalhadores, max_em_espera=args.clientes)
+        guardado = senhas.gerar_hash("segredo")
+        latencias = []
+        trinco = threading.Lock()
+        restantes = [args.logins]
+
+        def cliente():
+            while True:
+                with trinco:
+                    if restantes[0] == 0:
+                        return
+                    restantes[0] -= 1
+                inicio = time.perf_counter()
+                assert senhas.verificar("segredo", guardado)
+                with trinco:
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+
+        threads = [threading.Thread(target=cliente) for _ in range(args.clientes)]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+
+        memoria = f"{128 * n * senhas.CUSTO_R // 2 ** 20} MiB"
+        print(f"{n:>7}{memoria:>10}{args.logins / duracao:>10.1f}"
+              f"{statistics.median(latencias):>10.1f}{_percentil(latencias, 0.95):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+import argparse
+import http.client
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+"""
+carga.py
+
+Testes de carga e de regressão por rota (/carros, /minhas_reservas, /reservar, /pagamento, /dashboard)
+sobre uma base de dados sintética (dados_sinteticos.py, escalas pequena/media/producao):
+- Driver "processo": cliente de testes do Flask no mesmo processo, sem rede (mede a aplicação).
+- Driver "http": vários processos cliente contra um servidor local (arrancado aqui, ou --url para um já a correr),
+  cada um com a sua sessão (login como um cliente sintético). --servidor escolhe o servidor arrancado:
+  "werkzeug" (o de desenvolvimento, com threads) ou "gunicorn" (servidor.py; workers/threads de SERVIDOR_WORKERS
+  e SERVIDOR_THREADS).
+- Todos os drivers correm a mesma mistura de cenários (PESOS); o fluxo de reserva faz GET e POST de /reservar
+  e de /pagamento, como um utilizador.
+- Mostra p50/p95/p99 e pedidos/s por rota. A primeira execução em cada máquina grava a baseline em JSON
+  (benchmarks/baselines/<driver>[-gunicorn]-<escala>.json, fora do git); as seguintes comparam-se com ela
+  e terminam com código 1 se o p95 de alguma rota passar de baseline * (1 + --tolerancia) + --margem-ms,
+  ou se o débito total descer mais do que --tolerancia. Por omissão 25% e 1 ms: na mesma máquina, com
+  a mesma carga, o ruído entre execuções fica abaixo disso.
+- Os tempos só se comparam na mesma máquina: a baseline guarda o CPU, o número de CPUs e a versão do Python,
+  e se forem outros a comparação é só informativa (não falha). --gravar-baseline substitui-a.
+
+Uso:
+    python benchmarks/carga.py                                  (processo, escala pequena, 20 s)
+    python benchmarks/carga.py --driver http --processos 4 --escala media
+    python benchmarks/carga.py --driver http --servidor gunicorn --processos 8
+    python benchmarks/carga.py --driver http --url http://127.0.0.1:8000 --bd database/producao.db
+    python benchmarks/carga.py --gravar-baseline
+"""
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_BASELINES = os.path.join(RAIZ, "benchmarks", "baselines")
+
+#peso de cada cenário na mistura (um cenário pode fazer vários pedidos)
+PESOS = {
+    "catalogo": 30,
+    "pesquisa": 10,
+    "datas": 10,
+    "facetas": 5,
+    "minhas_reservas": 20,
+    "reserva": 15,
+    "dashboard": 10,
+}
+TERMOS = ["honda", "bmw x5", "autom", "mota", "médio", "yaris"]
+CATEGORIAS = ["Carro Pequeno", "Carro Médio", "Carro SUV", "Carros Luxo", "Mota Média", "Mota Grande"]
+#clientes sintéticos usados nas sessões: os de id baixo são os que têm mais reservas (Zipf)
+CLIENTES = [1, 2, 3, 5, 10, 30, 100, 300]
+
+
+class ClienteTeste:
+    """Pedidos através do cliente de testes do Flask (cookies de sessão geridos por ele)."""
+
+    def __init__(self, app, cliente):
+        self.cliente = app.test_client()
+        with self.cliente.session_transaction() as sessao:
+            sessao["usuario"], sessao["cliente_id"], sessao["nome"] = cliente["usuario"], cliente["id"], cliente["nome"]
+
+    def pedir(self, metodo, caminho, dados=None):
+        resposta = self.cliente.open(caminho, method=metodo, data=dados)
+        resposta.get_data()
+        return resposta.status_code, resposta.headers.get("Location", "")
+
+
+class ClienteHttp:
+    """Pedidos HTTP com uma conexão reutilizada (se o servidor deixar) e o cookie de sessão."""
+
+    def __init__(self, url):
+        partes = urlsplit(url)
+        self.conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=60)
+        self.cookies = {}
+
+    def pedir(self, metodo, caminho, dados=None):
+        cabecalhos = {}
+        corpo = None
+        if self.cookies:
+            cabecalhos["Cookie"] = "; ".join(f"{nome}={valor}" for nome, valor in self.cookies.items())
+        if dados is not None:
+            corpo = urlencode(dados)
+            cabecalhos["Content-Type"] = "application/x-www-form-urlencoded"
+        for tentativa in range(2):
+            try:
+                self.conexao.request(metodo, caminho, body=corpo, headers=cabecalhos)
+                resposta = self.conexao.getresponse()
+                resposta.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                #o servidor fechou a conexão reutilizada: abre outra
+                self.conexao.close()
+                if tentativa:
+                    raise
+        for cookie in resposta.msg.get_all("Set-Cookie") or []:
+            nome, _, resto = cookie.partition("=")
+            valor = resto.split(";", 1)[0]
+            if valor and "expires=Thu, 01 Jan 1970" not in cookie:
+                self.cookies[nome] = valor
+            else:
+                self.cookies.pop(nome, None)
+        return resposta.status, resposta.getheader("Location", "")
+
+    def entrar(self, usuario, senha):
+        #login como cliente sintético; se a senha já não servir (base reutilizada), regista uma conta nova
+        estado, destino = self.pedir("POST", "/", {"usuario": usuario, "senha": senha})
+        if estado == 302 and "/carros" in destino:
+            return
+        novo = f"carga{os.getpid()}x{random.randrange(10**9)}"
+        self.pedir("POST", "/", {"nome": "Carga", "usuario": novo, "senha": "carga", "senha_confirmacao": "carga"})
+
+
+def cenario(nome, cliente, rng, hoje, n_veiculos, registar):
+    """Executa um cenário e regista cada pedido com registar(rota, ms, ok)."""
+
+    def pedir(rota, metodo, caminho, esperados, dados=None):
+        inicio = time.perf_counter()
+        estado, destino = cliente.pedir(metodo, caminho, dados)
+        registar(rota, (time.perf_counter() - inicio) * 1000, estado in esperados)
+        return estado, destino
+
+    if nome == "catalogo":
+        pedir("GET /carros", "GET", "/carros", (200,))
+    elif nome == "pesquisa":
+        pedir("GET /carros?pesquisa", "GET", "/carros?" + urlencode({"pesquisa": rng.choice(TERMOS)}), (200,))
+    elif nome == "datas":
+        inicio = hoje + timedelta(days=rng.randint(1, 60))
+        fim = inicio + timedelta(days=rng.randint(1, 7))
+        pedir("GET /carros?datas", "GET", f"/carros?data_inicio={inicio}&data_fim={fim}", (200,))
+    elif nome == "facetas":
+        pedir("GET /carros?facetas", "GET", "/carros?" + urlencode({"categoria": rng.choice(CATEGORIAS)}), (200,))
+    elif nome == "minhas_reservas":
+        pedir("GET /minhas_reservas", "GET", "/minhas_reservas", (200,))
+    elif nome == "dashboard":
+        pedir("GET /dashboard", "GET", "/dashboard", (200,))
+    elif nome == "reserva":
+        veiculo = rng.randint(1, n_veiculos)
+        pedir("GET /reservar", "GET", f"/reservar/{veiculo}", (200,))
+        #datas longe no futuro: conflitos (409) são possíveis mas raros, e contam como resposta esperada
+        inicio = hoje + timedelta(days=rng.randint(120, 3000))
+        fim = inicio + timedelta(days=rng.randint(0, 6))
+        estado, destino = pedir("POST /reservar", "POST", f"/reservar/{veiculo}", (302, 409),
+                                {"data_inicio": inicio.isoformat(), "data_fim": fim.isoformat()})
+        if estado == 302:
+            caminho = urlsplit(destino).path
+            pedir("GET /pagamento", "GET", caminho, (200,))
+            pedir("POST /pagamento", "POST", caminho, (302,), {
+                "numero_cartao": "4111111111111", "nome_cartao": "Cliente Carga",
+                "validade": f"{hoje.year + 2}-12", "codigo_seg": "123",
+            })
+    else:
+        raise ValueError(f"Cenário desconhecido: {nome}")
+
+
+def correr(cliente, semente, duracao, aquecimento, n_veiculos):
+    """Repete cenários da mistura durante aquecimento + duracao segundos; devolve [(rota, ms, ok)] sem o aquecimento."""
+    rng = random.Random(semente)
+    nomes, pesos = zip(*PESOS.items())
+    hoje = date.today()
+    amostras = []
+    a_medir = [False]
+
+    def registar(rota, ms, ok):
+        if a_medir[0]:
+            amostras.append((rota, ms, ok))
+
+    inicio = time.perf_counter()
+    while True:
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= aquecimento + duracao:
+            return amostras
+        a_medir[0] = decorrido >= aquecimento
+        cenario(rng.choices(nomes, pesos)[0], cliente, rng, hoje, n_veiculos, registar)
+
+
+def _percentil(ordenados, p):
+    #nearest-rank
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def resumir(amostras, duracao):
+    por_rota = {}
+    for rota, ms, ok in amostras:
+        por_rota.setdefault(rota, []).append((ms, ok))
+    resumo = {}
+    for rota, valores in sorted(por_rota.items()):
+        tempos = sorted(ms for ms, _ in valores)
+        resumo[rota] = {
+            "pedidos": len(tempos),
+            "erros": sum(1 for _, ok in valores if not ok),
+            "p50_ms": round(_percentil(tempos, 50), 3),
+            "p95_ms": round(_percentil(tempos, 95), 3),
+            "p99_ms": round(_percentil(tempos, 99), 3),
+            "pedidos_por_segundo": round(len(tempos) / duracao, 2),
+        }
+    tempos = sorted(ms for _, ms, _ in amostras)
+    total = {
+        "pedidos": len(tempos),
+        "erros": sum(1 for _, _, ok in amostras if not ok),
+        "p50_ms": round(_percentil(tempos, 50), 3) if tempos else 0,
+        "p95_ms": round(_percentil(tempos, 95), 3) if tempos else 0,
+        "p99_ms": round(_percentil(tempos, 99), 3) if tempos else 0,
+        "pedidos_por_segundo": round(len(tempos) / duracao, 2),
+    }
+    return resumo, total
+
+
+def _clientes_sinteticos(caminho_bd):
+    import sqlite3
+    conn = sqlite3.connect(caminho_bd)
+    conn.row_factory = sqlite3.Row
+    try:
+        linhas = conn.execute(
+            f"SELECT id, nome, usuario, senha FROM clientes WHERE id IN ({', '.join('?' * len(CLIENTES))}) ORDER BY id",
+            CLIENTES,
+        ).fetchall()
+        n_veiculos = conn.execute("SELECT MAX(id) FROM veiculos").fetchone()[0]
+    finally:
+        conn.close()
+    return [dict(linha) for linha in linhas], n_veiculos
+
+
+def driver_processo(caminho_bd, args):
+    #BD_CAMINHO tem de estar definido antes de importar a aplicação
+    os.environ["BD_CAMINHO"] = caminho_bd
+    sys.path.insert(0, RAIZ)
+    import project_web
+
+    clientes, n_veiculos = _clientes_sinteticos(caminho_bd)
+    amostras = []
+    #as sessões vão rodando entre os clientes sintéticos, em fatias iguais do tempo total
+    fatia = args.duracao / len(clientes)
+    for i, cliente in enumerate(clientes):
+        amostras += correr(ClienteTeste(project_web.app, cliente), args.semente + i, fatia,
+                           args.aquecimento if i == 0 else 0, n_veiculos)
+    return amostras
+
+
+def _trabalhador_http(url, cliente, semente, duracao, aquecimento, n_veiculos, fila):
+    http_cliente = ClienteHttp(url)
+    http_cliente.entrar(cliente["usuario"], cliente["senha"])
+    fila.put(correr(http_cliente, semente, duracao, aquecimento, n_veiculos))
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar_servidor(url, processo, limite=60):
+    partes = urlsplit(url)
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if processo is not None and processo.poll() is not None:
+            raise RuntimeError("O servidor terminou antes de aceitar pedidos.")
+        try:
+            conexao = http.client.HTTPConnection(partes.hostname, partes.port, timeout=2)
+            conexao.request("GET", "/")
+            conexao.getresponse().read()
+            conexao.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"O servidor em {url} não respondeu em {limite} s.")
+
+
+#servidor de desenvolvimento com threads (o mesmo do app.run, sem reloader)
+CODIGO_SERVIDOR = '''
+import sys
+from werkzeug.serving import run_simple
+import project_web
+run_simple("127.0.0.1", int(sys.argv[1]), project_web.app, threaded=True)
+'''
+
+
+def driver_http(caminho_bd, args):
+    servidor = None
+    url = args.url
+    if url is None:
+        porta = _porta_livre()
+        url = f"http://127.0.0.1:{porta}"
+        if args.servidor == "gunicorn":
+            comando = [sys.executable, "servidor.py", "--bind", f"127.0.0.1:{porta}", "--sem-tarefas"]
+        else:
+            comando = [sys.executable, "-c", CODIGO_SERVIDOR, str(porta)]
+        servidor = subprocess.Popen(
+            comando, cwd=RAIZ,
+            env=dict(os.environ, BD_CAMINHO=caminho_bd), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+    try:
+        _esperar_servidor(url, servidor)
+        clientes, n_veiculos = _clientes_sinteticos(caminho_bd)
+        contexto = multiprocessing.get_context("spawn")
+        fila = contexto.Queue()
+        processos = [
+            contexto.Process(target=_trabalhador_http, args=(
+                url, clientes[i % len(clientes)], args.semente + i, args.duracao, args.aquecimento, n_veiculos, fila,
+            ))
+            for i in range(args.processos)
+        ]
+        for processo in processos:
+            processo.start()
+        amostras = []
+        for _ in processos:
+            amostras += fila.get()
+        for processo in processos:
+            processo.join()
+        return amostras
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+
+def maquina():
+    #modelo do CPU (Linux: /proc/cpuinfo), para não comparar tempos medidos em máquinas diferentes
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as ficheiro:
+            for linha in ficheiro:
+                if linha.startswith("model name"):
+                    return linha.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def comparar(atual, baseline, tolerancia, margem_ms):
+    """Lista de regressões: p95 pior do que baseline*(1+tolerancia)+margem_ms, ou débito total abaixo de (1-tolerancia)."""
+    regressoes = []
+    for rota, base in baseline["rotas"].items():
+        novo = atual["rotas"].get(rota)
+        if novo is None:
+            continue
+        if novo["p95_ms"] > base["p95_ms"] * (1 + tolerancia) + margem_ms:
+            regressoes.append(f"{rota}: p95 {base['p95_ms']} -> {novo['p95_ms']} ms")
+    base_total, novo_total = baseline["total"]["pedidos_por_segundo"], atual["total"]["pedidos_por_segundo"]
+    if novo_total < base_total * (1 - tolerancia):
+        regressoes.append(f"total: {base_total} -> {novo_total} pedidos/s")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Testes de carga por rota com baselines em JSON.")
+    parser.add_argument("--driver", choices=("processo", "http"), default="processo")
+    parser.add_argument("--escala", default="pequena", help="pequena, media ou producao (ver dados_sinteticos.ESCALAS)")
+    parser.add_argument("--bd", help="base de dados já criada (por omissão gera uma temporária da escala)")
+    parser.add_argument("--servidor", choices=("werkzeug", "gunicorn"), default="werkzeug",
+                        help="servidor arrancado pelo driver http")
+    parser.add_argument("--url", help="servidor já a correr (driver http); exige --bd da mesma base")
+    parser.add_argument("--processos", type=int, default=4, help="processos cliente no driver http")
+    parser.add_argument("--duracao", type=float, default=20.0, help="segundos medidos")
+    parser.add_argument("--aquecimento", type=float, default=2.0, help="segundos iniciais não medidos")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--baseline", help="ficheiro JSON (por omissão baselines/<driver>[-gunicorn]-<escala>.json)")
+    parser.add_argument("--gravar-baseline", action="store_true")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    parser.add_argument("--margem-ms", type=float, default=1.0, help="folga absoluta no p95 (ruído em rotas rápidas)")
+    parser.add_argument("--json", help="grava também o resultado neste ficheiro")
+    args = parser.parse_args()
+    if args.url and not args.bd:
+        parser.error("--url precisa de --bd (a base do servidor, para os clientes e veículos sintéticos)")
+
+    sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+    import dados_sinteticos
+    if args.escala not in dados_sinteticos.ESCALAS:
+        parser.error(f"escala desconhecida: {args.escala}")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_bd = args.bd
+        if caminho_bd is None:
+            caminho_bd = os.path.join(pasta, "carga.db")
+            #num processo à parte: a aplicação lê BD_CAMINHO quando é importada
+            subprocess.run([sys.executable, os.path.join(RAIZ, "benchmarks", "dados_sinteticos.py"), caminho_bd,
+                            "--escala", args.escala, "--semente", str(args.semente)], check=True)
+        os.environ.setdefault("CACHE_CAMINHO", os.path.join(pasta, "cache.db"))
+
+        inicio = time.perf_counter()
+        amostras = (driver_processo if args.driver == "processo" else driver_http)(caminho_bd, args)
+        print(f"{len(amostras)} pedidos medidos em {time.perf_counter() - inicio:.1f} s")
+
+    rotas, total = resumir(amostras, args.duracao)
+    resultado = {
+        "meta": {
+            "driver": args.driver, "escala": args.escala, "processos": args.processos if args.driver == "http" else 1,
+            "servidor": args.servidor if args.driver == "http" and not args.url else None,
+            "duracao_s": args.duracao, "python": platform.python_version(), "cpus": os.cpu_count(),
+            "maquina": maquina(),
+            "data": date.today().isoformat(),
+        },
+        "rotas": rotas,
+        "total": total,
+    }
+
+    print(f"\n{'rota':<24}{'pedidos':>9}{'erros':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'pedidos/s':>11}")
+    for rota, r in [*rotas.items(), ("TOTAL", total)]:
+        print(f"{rota:<24}{r['pedidos']:>9}{r['erros']:>7}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['pedidos_por_segundo']:>11.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as ficheiro:
+            json.dump(resultado, ficheiro, indent=2, ensure_ascii=False)
+
+    nome_baseline = f"{args.driver}-gunicorn" if args.driver == "http" and args.servidor == "gunicorn" else args.driver
+    caminho_baseline = args.baseline or os.path.join(PASTA_BASELINES, f"{nome_baseline}-{args.escala}.json")
+    erros = [f"{total['erros']} respostas inesperadas"] if total["erros"] else []
+    if args.gravar_baseline or not os.path.exists(caminho_baseline):
+        #primeira execução nesta máquina (ou pedida): a baseline passa a ser este resultado
+        os.makedirs(os.path.dirname(caminho_baseline), exist_ok=True)
+        with open(caminho_baseline, "w", encoding="utf-8") as ficheiro:
+            json.dump(resultado, ficheiro, indent=2, ensure_ascii=False)
+            ficheiro.write("\n")
+        print(f"\nBaseline gravada em {caminho_baseline}")
+        for erro in erros:
+            print(f"  {erro}")
+        sys.exit(1 if erros else 0)
+    with open(caminho_baseline, encoding="utf-8") as ficheiro:
+        baseline = json.load(ficheiro)
+    regressoes = comparar(resultado, baseline, args.tolerancia, args.margem_ms)
+    campos = ("maquina", "cpus", "python")
+    mesma_maquina = all(baseline["meta"].get(campo) == resultado["meta"][campo] for campo in campos)
+    if mesma_maquina:
+        print(f"\nComparação com {caminho_baseline} (tolerância {args.tolerancia:.0%} + {args.margem_ms} ms): "
+              + ("sem regressões" if not regressoes else "REGRESSÕES"))
+    else:
+        print(f"\nA baseline {caminho_baseline} é de outra máquina "
+              f"({', '.join(str(baseline['meta'].get(campo)) for campo in campos)}): comparação só informativa, "
+              "usar --gravar-baseline para a substituir.")
+    for regressao in regressoes:
+        print(f"  {regressao}")
+    for erro in erros:
+        print(f"  {erro}")
+    sys.exit(1 if erros or (mesma_maquina and regressoes) else 0)
+
+
+if __name__ == "__main__":
+    main()
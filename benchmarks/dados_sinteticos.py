@@ -0,0 +1,199 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+"""
+dados_sinteticos.py
+
+Gerador determinístico de dados para benchmarks (mesma semente e mesmo `hoje` -> mesma base de dados).
+Preenche uma base já com o esquema criado (project_web.criar_tabelas) com clientes, veículos, reservas e pagamentos,
+com distribuições próximas das reais:
+- Poucos clientes fazem muitas reservas (popularidade tipo Zipf); os carros mais baratos são mais reservados.
+- Início das reservas nos últimos anos, mais denso perto de hoje, com picos no verão e no Natal
+  e até 90 dias no futuro; durações curtas (fins de semana) muito mais frequentes do que longas.
+- Status a partir das datas: 12% canceladas, as que já terminaram 'Concluída', as restantes 'Ativa'.
+- Um pagamento por reserva não cancelada; cada veículo tem uma matrícula única.
+
+Linha de comandos (base de dados para testes manuais ou para o servidor de carga):
+    python benchmarks/dados_sinteticos.py database/producao.db --escala producao
+"""
+
+MARCAS_MODELOS = [
+    ("Toyota", "Yaris", "Carro Pequeno", "Carro", 4, "yaris.jpg"),
+    ("Honda", "Civic", "Carro Médio", "Carro", 5, "civic.jpg"),
+    ("BMW", "X5", "Carro SUV", "Carro", 5, "bmw_x5.jpg"),
+    ("Audi", "A8", "Carros Luxo", "Carro", 5, "audi_a8.jpg"),
+    ("Fiat", "500", "Carro Pequeno", "Carro", 4, "fiat_500.jpg"),
+    ("Kawasaki", "Ninja 400", "Mota Média", "Mota", 2, "ninja_400.jpg"),
+    ("Yamaha", "TMAX", "Mota Grande", "Mota", 2, "tmax.jpg"),
+]
+TRANSMISSOES = ["Manual", "Automática"]
+TAMANHO_LOTE = 10000
+
+#(clientes, veículos, reservas) por escala
+ESCALAS = {
+    "pequena": (1_000, 200, 20_000),
+    "media": (10_000, 2_000, 200_000),
+    "producao": (100_000, 20_000, 2_000_000),
+}
+
+#peso relativo do mês de início (1 = janeiro)
+SAZONALIDADE = {1: 0.7, 2: 0.7, 3: 0.9, 4: 1.0, 5: 1.0, 6: 1.3, 7: 1.7, 8: 1.8, 9: 1.1, 10: 0.9, 11: 0.8, 12: 1.3}
+DURACOES = (1, 2, 3, 4, 5, 7, 10, 14)
+PESOS_DURACOES = (10, 25, 22, 10, 8, 15, 6, 4)
+PERCENTAGEM_CANCELADAS = 0.12
+DIAS_FUTURO = 90
+
+
+def _em_lotes(linhas, tamanho=TAMANHO_LOTE):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def matricula(i):
+    #AA-00-00 com as letras a variar primeiro: única para i < 26*26*100*100
+    letras = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return f"{letras[i // 26 % 26]}{letras[i % 26]}-{i // 676 % 100:02d}-{i // 67600 % 100:02d}"
+
+
+def gerar_clientes(rng, n):
+    for i in range(1, n + 1):
+        yield (f"Cliente {i}", f"cliente{i}", f"senha{rng.randint(1000, 9999)}")
+
+
+def gerar_veiculos(rng, n):
+    for _ in range(n):
+        marca, modelo, categoria, tipo, capacidade, imagem = rng.choice(MARCAS_MODELOS)
+        valor_diaria = round(rng.uniform(20, 200), 2)
+        ultima_revisao = date(2024, 1, 1) + timedelta(days=rng.randint(0, 365))
+        yield (
+            marca, modelo, categoria, rng.choice(TRANSMISSOES), tipo, capacidade, imagem, valor_diaria,
+            ultima_revisao.isoformat(),
+            (ultima_revisao + timedelta(days=365)).isoformat(),
+            (ultima_revisao + timedelta(days=30)).isoformat(),
+        )
+
+
+def _pesos_acumulados(pesos):
+    return list(itertools.accumulate(pesos))
+
+
+def gerar_reservas(rng, n, n_clientes, diarias, hoje, anos_historico=3):
+    """
+    Reservas (cliente_id, veiculo_id, data_inicio, data_fim, valor_total, status) com as distribuições
+    descritas no topo do ficheiro.
+    """
+    dias_historico = anos_historico * 365
+    maximo_sazonal = max(SAZONALIDADE.values())
+    #Zipf (s=0.8) nos clientes e 1/diária nos veículos; com pesos acumulados cada escolha é uma pesquisa binária
+    clientes = range(1, n_clientes + 1)
+    pesos_clientes = _pesos_acumulados(1 / i ** 0.8 for i in clientes)
+    veiculos = range(1, len(diarias) + 1)
+    pesos_veiculos = _pesos_acumulados(1 / diaria for diaria in diarias)
+    pesos_duracoes = _pesos_acumulados(PESOS_DURACOES)
+
+    for _ in range(n):
+        #triangular (mais reservas perto de hoje) com rejeição pela sazonalidade do mês
+        while True:
+            inicio = hoje + timedelta(days=int(rng.triangular(-dias_historico, DIAS_FUTURO, 0)))
+            if rng.random() * maximo_sazonal <= SAZONALIDADE[inicio.month]:
+                break
+        dias = rng.choices(DURACOES, cum_weights=pesos_duracoes)[0]
+        fim = inicio + timedelta(days=dias - 1)
+        veiculo_id = rng.choices(veiculos, cum_weights=pesos_veiculos)[0]
+        if rng.random() < PERCENTAGEM_CANCELADAS:
+            status = "Cancelada"
+        elif fim < hoje:
+            status = "Concluída"
+        else:
+            status = "Ativa"
+        yield (
+            rng.choices(clientes, cum_weights=pesos_clientes)[0], veiculo_id, inicio.isoformat(), fim.isoformat(),
+            round(dias * diarias[veiculo_id - 1], 2), status,
+        )
+
+
+def gerar(conn, n_clientes=1000, n_veiculos=100, n_reservas=10000, semente=42, hoje=None):
+    """
+    Insere os dados sintéticos numa única transação e devolve o número de linhas por tabela.
+    """
+    rng = random.Random(semente)
+    hoje = hoje or date.today()
+    cursor = conn.cursor()
+
+    for lote in _em_lotes(gerar_clientes(rng, n_clientes)):
+        cursor.executemany("INSERT INTO clientes (nome, usuario, senha) VALUES (?, ?, ?)", lote)
+
+    veiculos = list(gerar_veiculos(rng, n_veiculos))
+    primeiro = conn.execute("SELECT COUNT(*) FROM veiculos").fetchone()[0]
+    cursor.executemany('''
+        INSERT INTO veiculos (
+            marca, modelo, categoria, transmissao, tipo, capacidade, imagem, valor_diaria,
+            ultima_revisao, proxima_revisao, ultima_inspecao, matricula
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(*veiculo, matricula(primeiro + i)) for i, veiculo in enumerate(veiculos)])
+    diarias = [v[7] for v in veiculos]
+
+    for lote in _em_lotes(gerar_reservas(rng, n_reservas, n_clientes, diarias, hoje)):
+        cursor.executemany('''
+            INSERT INTO reservas (cliente_id, veiculo_id, data_inicio, data_fim, valor_total, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', lote)
+
+    #um pagamento por reserva não cancelada; cartão, validade e CVV variam (deterministicamente) com o id
+    cursor.execute('''
+        INSERT INTO pagamentos (reserva_id, numero_cartao, nome_cartao, validade, codigo_seg)
+        SELECT r.id, printf('4%012d', (r.id * 7919) % 1000000000000), COALESCE(c.nome, 'Cliente Sintetico'),
+               printf('%04d-%02d', 2027 + r.id % 5, 1 + r.id % 12), 100 + r.id % 900
+        FROM reservas r
+        LEFT JOIN clientes c ON c.id = r.cliente_id
+        WHERE r.status != 'Cancelada'
+    ''')
+    conn.commit()
+
+    return {
+        tabela: conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+        for tabela in ("clientes", "veiculos", "reservas", "pagamentos")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cria uma base de dados com dados sintéticos.")
+    parser.add_argument("bd", help="ficheiro SQLite a criar (não pode existir)")
+    parser.add_argument("--escala", choices=ESCALAS, default="pequena")
+    parser.add_argument("--clientes", type=int)
+    parser.add_argument("--veiculos", type=int)
+    parser.add_argument("--reservas", type=int)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--hoje", type=date.fromisoformat, help="data de referência (AAAA-MM-DD), por omissão hoje")
+    args = parser.parse_args()
+    if os.path.exists(args.bd):
+        parser.error(f"{args.bd} já existe")
+
+    n_clientes, n_veiculos, n_reservas = ESCALAS[args.escala]
+    os.environ["BD_CAMINHO"] = os.path.abspath(args.bd)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import project_web
+
+    project_web.criar_tabelas()
+    conn = project_web.conectar_bd()
+    inicio = time.perf_counter()
+    totais = gerar(conn, args.clientes or n_clientes, args.veiculos or n_veiculos, args.reservas or n_reservas,
+                   semente=args.semente, hoje=args.hoje)
+    conn.execute("ANALYZE")
+    conn.close()
+    print(", ".join(f"{n} {tabela}" for tabela, n in totais.items()) + f" em {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import argparse
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+"""
+stress_reservas.py
+
+Teste de carga à proteção contra reservas duplicadas (reservas.criar / reservas.alterar_datas):
+vários processos, cada um com várias threads e a sua própria conexão, disparam milhares de
+reservas e alterações de datas em simultâneo para o MESMO veículo. No fim verifica-se que não
+existe nenhum par de reservas ativas sobrepostas. Termina com código 1 se encontrar alguma.
+
+Uso:
+    python benchmarks/stress_reservas.py --processos 4 --threads 8 --pedidos 4000
+"""
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from base_dados import nova_conexao  # noqa: E402
+import reservas  # noqa: E402
+
+VEICULO_ID = 1
+JANELA_DIAS = 120   #intervalo de datas disputado: poucas vagas para muitos pedidos
+
+
+def _preparar(caminho):
+    #esquema real (triggers, agregados, índices) num processo à parte: a aplicação lê BD_CAMINHO quando é importada
+    subprocess.run([sys.executable, "-c", "import project_web; project_web.criar_tabelas()"],
+                   cwd=RAIZ, env=dict(os.environ, BD_CAMINHO=caminho), check=True)
+    conn = nova_conexao(caminho)
+    conn.execute("INSERT INTO clientes (id, nome, usuario, senha) VALUES (1, 'Stress', 'stress', 'senha')")
+    conn.execute('''
+        INSERT INTO veiculos (
+            id, marca, modelo, categoria, transmissao, tipo, capacidade, imagem, valor_diaria,
+            ultima_revisao, proxima_revisao, ultima_inspecao
+        ) VALUES (?, 'Toyota', 'Yaris', 'Carro Pequeno', 'Manual', 'Carro', 4, 'yaris.jpg', 50.0,
+                  '2024-01-10', '2025-01-10', '2024-02-10')
+    ''', (VEICULO_ID,))
+    conn.commit()
+    conn.close()
+
+
+def _bloqueado(erro):
+    #busy_timeout esgotado (SQLITE_BUSY / SQLITE_LOCKED); qualquer outro erro é um bug e tem de aparecer
+    return "locked" in str(erro) or getattr(erro, "sqlite_errorname", "").startswith(("SQLITE_BUSY", "SQLITE_LOCKED"))
+
+
+def _intervalo_aleatorio(rng, inicio_janela):
+    inicio = inicio_janela + timedelta(days=rng.randint(0, JANELA_DIAS))
+    fim = inicio + timedelta(days=rng.randint(0, 6))
+    return inicio.isoformat(), fim.isoformat()
+
+
+def _trabalhador(caminho, semente, n_pedidos, n_threads):
+    """Corre num processo filho: n_threads threads, cada uma com a sua conexão."""
+    inicio_janela = date.today() + timedelta(days=30)
+    contagem = Counter()
+    trinco = threading.Lock()
+    erros = []
+
+    def thread(indice):
+        try:
+            pedidos(indice)
+        except Exception as erro:
+            #uma exceção numa thread não chega ao processo principal: guarda-se para relançar no fim
+            erros.append(erro)
+
+    def pedidos(indice):
+        rng = random.Random(semente * 1000 + indice)
+        conn = nova_conexao(caminho)
+        minhas = []
+        local = Counter()
+        for _ in range(n_pedidos // n_threads):
+            try:
+                #1 em cada 4 pedidos altera as datas de uma reserva já feita por esta thread
+                if minhas and rng.random() < 0.25:
+                    inicio, fim = _intervalo_aleatorio(rng, inicio_janela)
+                    reservas.alterar_datas(conn, rng.choice(minhas), inicio, fim)
+                    local["alteracoes"] += 1
+                else:
+                    inicio, fim = _intervalo_aleatorio(rng, inicio_janela)
+                    reserva_id, _ = reservas.criar(conn, 1, VEICULO_ID, inicio, fim, 50.0)
+                    minhas.append(reserva_id)
+                    local["criadas"] += 1
+            except reservas.ConflitoReserva:
+                local["conflitos"] += 1
+            except sqlite3.OperationalError as erro:
+                #busy_timeout esgotado: o pedido falha sem escrever nada
+                if not _bloqueado(erro):
+                    raise
+                local["bloqueados"] += 1
+        conn.close()
+        with trinco:
+            contagem.update(local)
+
+    threads = [threading.Thread(target=thread, args=(i,)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if erros:
+        raise erros[0]
+    return contagem
+
+
+def contar_sobreposicoes(caminho):
+    conn = nova_conexao(caminho)
+    total = conn.execute('''
+        SELECT COUNT(*)
+        FROM reservas a
+        JOIN reservas b
+          ON a.veiculo_id = b.veiculo_id
+         AND a.id < b.id
+         AND a.data_inicio <= b.data_fim
+         AND a.data_fim >= b.data_inicio
+        WHERE a.status = 'Ativa' AND b.status = 'Ativa'
+    ''').fetchone()[0]
+    conn.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test de reservas concorrentes no mesmo veículo.")
+    parser.add_argument("--processos", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--pedidos", type=int, default=4000, help="total de pedidos (todos os processos)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "stress.db")
+        _preparar(caminho)
+
+        por_processo = args.pedidos // args.processos
+        inicio = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.processos) as executor:
+            futuros = [executor.submit(_trabalhador, caminho, p, por_processo, args.threads)
+                       for p in range(args.processos)]
+            contagem = sum((f.result() for f in futuros), Counter())
+        duracao = time.perf_counter() - inicio
+
+        sobreposicoes = contar_sobreposicoes(caminho)
+        print(f"{sum(contagem.values())} pedidos em {duracao:.2f} s "
+              f"({sum(contagem.values()) / duracao:.0f} pedidos/s): {dict(contagem)}")
+        print(f"Reservas ativas sobrepostas: {sobreposicoes}")
+        sys.exit(1 if sobreposicoes else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from base_dados import nova_conexao
+
+"""
+cache.py
+
+Cache partilhada pelos caminhos "quentes" (/dashboard e /carros), com dois backends:
+- CacheMemoria: LRU em memória, só para um processo (desenvolvimento, testes).
+- CacheSQLite: ficheiro SQLite próprio (não a base de dados da aplicação), partilhado por todos os
+  workers da máquina: o que um worker calcula serve aos outros.
+As chaves estão agrupadas em espaços ("dashboard", "catalogo"). Cada espaço tem um contador de geração
+guardado no próprio backend, e invalidar(espaco) incrementa-o. Como o contador está no ficheiro
+partilhado, a invalidação chega a todos os workers de uma vez, e um valor calculado antes da
+invalidação fica numa geração antiga, que já ninguém lê.
+"""
+
+TTL_SEGUNDOS = 60
+MAX_ITENS = 2048
+LIMPAR_A_CADA = 200         #escritas entre limpezas das entradas expiradas (CacheSQLite)
+
+
+class CacheMemoria:
+    """LRU em memória com expiração por entrada."""
+
+    def __init__(self, max_itens=MAX_ITENS):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()     #chave -> (valor, expira_em)
+        self._contadores = {}
+        self._trinco = threading.Lock()
+
+    def obter(self, chave):
+        with self._trinco:
+            entrada = self._itens.get(chave)
+            if entrada is None:
+                return None
+            if entrada[1] < time.time():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return entrada[0]
+
+    def guardar(self, chave, valor, ttl):
+        with self._trinco:
+            self._itens[chave] = (valor, time.time() + ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def apagar_prefixo(self, prefixo):
+        with self._trinco:
+            for chave in [chave for chave in self._itens if chave.startswith(prefixo)]:
+                del self._itens[chave]
+
+    def contador(self, nome):
+        with self._trinco:
+            return self._contadores.get(nome, 0)
+
+    def incrementar(self, nome):
+        with self._trinco:
+            self._contadores[nome] = self._contadores.get(nome, 0) + 1
+            return self._contadores[nome]
+
+
+class CacheSQLite:
+    """
+    Cache num ficheiro SQLite partilhado entre processos (valores serializados com pickle).
+    Uma conexão por thread; depois de um fork os processos filhos abrem conexões novas.
+    """
+
+    ESQUEMA = '''
+        CREATE TABLE IF NOT EXISTS cache (
+            chave TEXT PRIMARY KEY,
+            valor BLOB NOT NULL,
+            expira REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS contadores (
+            nome TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL
+        ) WITHOUT ROWID;
+    '''
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._escritas = 0
+        conn = self._conexao()
+        conn.executescript(self.ESQUEMA)
+        conn.commit()
+
+    def _conexao(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.conn = nova_conexao(self.caminho, cache_size_kb=2000)
+            local.pid = os.getpid()
+        return local.conn
+
+    def obter(self, chave):
+        linha = self._conexao().execute(
+            "SELECT valor FROM cache WHERE chave = ? AND expira >= ?", (chave, time.time())
+        ).fetchone()
+        return pickle.loads(linha[0]) if linha else None
+
+    def guardar(self, chave, valor, ttl):
+        conn = self._conexao()
+        agora = time.time()
+        conn.execute("INSERT OR REPLACE INTO cache (chave, valor, expira) VALUES (?, ?, ?)",
+                     (chave, pickle.dumps(valor, pickle.HIGHEST_PROTOCOL), agora + ttl))
+        self._escritas += 1
+        if self._escritas % LIMPAR_A_CADA == 0:
+            conn.execute("DELETE FROM cache WHERE expira < ?", (agora,))
+        conn.commit()
+
+    def apagar_prefixo(self, prefixo):
+        #intervalo na chave primária: [prefixo, prefixo + U+10FFFF)
+        conn = self._conexao()
+        conn.execute("DELETE FROM cache WHERE chave >= ? AND chave < ?", (prefixo, prefixo + "\U0010ffff"))
+        conn.commit()
+
+    def contador(self, nome):
+        linha = self._conexao().execute("SELECT valor FROM contadores WHERE nome = ?", (nome,)).fetchone()
+        return linha[0] if linha else 0
+
+    def incrementar(self, nome):
+        conn = self._conexao()
+        valor = conn.execute('''
+            INSERT INTO contadores (nome, valor) VALUES (?, 1)
+            ON CONFLICT (nome) DO UPDATE SET valor = valor + 1
+            RETURNING valor
+        ''', (nome,)).fetchone()[0]
+        conn.commit()
+        return valor
+
+
+BACKENDS = {"memoria": CacheMemoria, "sqlite": CacheSQLite}
+
+_backend = CacheMemoria()
+
+
+def configurar(backend):
+    global _backend
+    _backend = backend
+
+
+def init_app(app, caminho_padrao):
+    """
+    Escolhe o backend a partir de app.config: CACHE_BACKEND ("sqlite" ou "memoria")
+    e CACHE_CAMINHO (ficheiro da cache partilhada).
+    """
+    tipo = app.config.get("CACHE_BACKEND", "sqlite")
+    if tipo not in BACKENDS:
+        raise ValueError(f"Backend de cache desconhecido: {tipo}")
+    if tipo == "sqlite":
+        configurar(CacheSQLite(app.config.get("CACHE_CAMINHO", caminho_padrao)))
+    else:
+        configurar(CacheMemoria(app.config.get("CACHE_MAX_ITENS", MAX_ITENS)))
+    app.extensions["cache"] = _backend
+
+
+def obter_ou_calcular(espaco, chave, calcular, ttl=TTL_SEGUNDOS):
+    """
+    Devolve o valor guardado para espaco/chave na geração atual ou, se não existir,
+    chama calcular(), guarda o resultado durante `ttl` segundos e devolve-o.
+    """
+    completa = f"{espaco}:{_backend.contador(espaco)}:{chave}"
+    valor = _backend.obter(completa)
+    if valor is None:
+        valor = calcular()
+        if valor is not None:
+            _backend.guardar(completa, valor, ttl)
+    return valor
+
+
+def contador(espaco):
+    """Geração atual do espaço, igual em todos os processos que partilham o backend."""
+    return _backend.contador(espaco)
+
+
+def invalidar(espaco, *_):
+    """
+    Passa o espaço para uma nova geração (visível em todos os processos que partilham o backend)
+    e apaga as entradas da geração anterior. Os argumentos extra permitem registá-la em ao_alterar.
+    """
+    nova = _backend.incrementar(espaco)
+    _backend.apagar_prefixo(f"{espaco}:{nova - 1}:")
@@ -0,0 +1,63 @@
+import os
+import threading
+import time
+import traceback
+from datetime import date, timedelta
+
+import reservas
+from base_dados import nova_conexao
+
+"""
+ciclo_reservas.py
+
+Tarefa periódica do ciclo de vida das reservas:
+- Reservas 'Ativa' cujo data_fim já passou passam a 'Concluída' (UPDATE em lotes pelo índice (status, data_fim)).
+- Reservas concluídas ou canceladas há mais de DIAS_ARQUIVO dias (e os seus pagamentos) passam para o
+  arquivo por ano (arquivo.py), mantendo a base principal (usada em todas as verificações de disponibilidade) pequena.
+- Cada lote é uma transação curta, por isso os pedidos da aplicação não ficam à espera do lock de escrita.
+"""
+
+INTERVALO_SEGUNDOS = 3600
+#o dashboard mostra 12 meses: as reservas arquivadas já não entram nos gráficos
+DIAS_ARQUIVO = int(os.environ.get("ARQUIVO_DIAS", 730))
+
+
+def executar(conn, hoje=None, dias_arquivo=DIAS_ARQUIVO, tamanho_lote=reservas.TAMANHO_LOTE):
+    """Corre os dois passos e devolve {'concluidas': n, 'arquivadas': n}."""
+    hoje = hoje or date.today()
+    limite = (hoje - timedelta(days=dias_arquivo)).isoformat()
+    return {
+        "concluidas": reservas.concluir_terminadas(conn, hoje.isoformat(), tamanho_lote),
+        "arquivadas": reservas.arquivar_antigas(conn, limite, tamanho_lote),
+    }
+
+
+class CicloReservas(threading.Thread):
+    """Thread que corre executar() ao arrancar e depois a cada `intervalo` segundos."""
+
+    def __init__(self, caminho_bd, intervalo=INTERVALO_SEGUNDOS, dias_arquivo=DIAS_ARQUIVO):
+        super().__init__(name="ciclo_reservas", daemon=True)
+        self.caminho_bd = caminho_bd
+        self.intervalo = intervalo
+        self.dias_arquivo = dias_arquivo
+        self.ultimo_resultado = None
+        self._parar = threading.Event()
+
+    def parar(self):
+        self._parar.set()
+
+    def run(self):
+        while not self._parar.is_set():
+            try:
+                conn = nova_conexao(self.caminho_bd)
+                try:
+                    inicio = time.perf_counter()
+                    self.ultimo_resultado = executar(conn, dias_arquivo=self.dias_arquivo)
+                    print(f"Ciclo de reservas: {self.ultimo_resultado['concluidas']} concluídas, "
+                          f"{self.ultimo_resultado['arquivadas']} arquivadas em {time.perf_counter() - inicio:.2f} s")
+                finally:
+                    conn.close()
+            except Exception:
+                #um erro numa execução não pode matar a thread: tenta de novo na próxima
+                traceback.print_exc()
+            self._parar.wait(self.intervalo)
@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+import senhas
+
+"""
+clientes.py
+
+Identificação do cliente autenticado sem consultar a tabela clientes em cada pedido:
+- No login, o id e o nome do cliente ficam guardados na sessão (iniciar_sessao).
+- Sessões antigas, que só têm o nome de utilizador, usam uma cache LRU em memória usuario -> id
+  (uma consulta por utilizador enquanto estiver na cache) e passam a ter o id na sessão.
+- A cache é invalidada sempre que uma conta é criada ou alterada através deste módulo (invalidar).
+- As senhas são guardadas com hash (senhas.py); contas antigas em texto simples passam a ter hash
+  no primeiro login bem-sucedido.
+"""
+
+MAX_CACHE = 4096
+
+_cache_ids = OrderedDict()
+_trinco = threading.Lock()
+
+
+def invalidar(usuario=None):
+    #sem argumento esvazia a cache toda
+    with _trinco:
+        if usuario is None:
+            _cache_ids.clear()
+        else:
+            _cache_ids.pop(usuario, None)
+
+
+def id_de(conn, usuario):
+    """Devolve o id do cliente com este nome de utilizador (None se não existir)."""
+    with _trinco:
+        if usuario in _cache_ids:
+            _cache_ids.move_to_end(usuario)
+            return _cache_ids[usuario]
+
+    linha = conn.execute("SELECT id FROM clientes WHERE usuario = ?", (usuario,)).fetchone()
+    if linha is None:
+        return None
+
+    with _trinco:
+        _cache_ids[usuario] = linha[0]
+        _cache_ids.move_to_end(usuario)
+        while len(_cache_ids) > MAX_CACHE:
+            _cache_ids.popitem(last=False)
+    return linha[0]
+
+
+def iniciar_sessao(sessao, cliente):
+    #cliente: linha de clientes (id, nome, usuario, ...)
+    sessao['usuario'] = cliente['usuario']
+    sessao['cliente_id'] = cliente['id']
+    sessao['nome'] = cliente['nome']
+
+
+def id_da_sessao(conn, sessao):
+    """
+    Id do cliente autenticado: o da sessão ou, em sessões antigas, o da cache LRU
+    (que fica então guardado na sessão). None se não houver cliente para a sessão.
+    """
+    cliente_id = sessao.get('cliente_id')
+    if cliente_id is None and 'usuario' in sessao:
+        cliente_id = id_de(conn, sessao['usuario'])
+        if cliente_id is not None:
+            sessao['cliente_id'] = cliente_id
+    return cliente_id
+
+
+def registar(conn, nome, usuario, senha):
+    """
+    Cria a conta com a senha em hash. Lança sqlite3.IntegrityError se o nome de utilizador já existir
+    e senhas.Ocupado se o pool de hashes estiver cheio.
+    """
+    conn.execute("INSERT INTO clientes (nome, usuario, senha) VALUES (?, ?, ?)",
+                 (nome, usuario, senhas.gerar_hash(senha)))
+    conn.commit()
+    invalidar(usuario)
+
+
+def autenticar(conn, usuario, senha):
+    """
+    Devolve a linha do cliente se a senha estiver certa, ou None.
+    Se a senha guardada estiver em texto simples ou com outro custo, grava o hash novo.
+    """
+    cliente = conn.execute("SELECT * FROM clientes WHERE usuario = ?", (usuario,)).fetchone()
+    if not senhas.verificar(senha, cliente['senha'] if cliente else None):
+        return None
+
+    if senhas.precisa_rehash(cliente['senha']):
+        #só substitui se ninguém alterou a senha entretanto
+        conn.execute("UPDATE clientes SET senha = ? WHERE id = ? AND senha = ?",
+                     (senhas.gerar_hash(senha), cliente['id'], cliente['senha']))
+        conn.commit()
+    return cliente
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+"""
+disponibilidade.py
+
+Consultas de disponibilidade de veículos sobre a tabela reservas:
+- Índice composto (status, veiculo_id, data_fim) para que as consultas façam seek em vez de varrer a tabela.
+- As datas são guardadas como texto ISO (YYYY-MM-DD), por isso comparam-se diretamente como strings,
+  sem envolver a coluna em date(...), o que impediria o uso do índice.
+- Duas reservas [a_inicio, a_fim] e [b_inicio, b_fim] sobrepõem-se se a_inicio <= b_fim e a_fim >= b_inicio.
+"""
+
+INDICES = '''
+    CREATE INDEX IF NOT EXISTS idx_reservas_status_veiculo_fim
+        ON reservas (status, veiculo_id, data_fim);
+'''
+
+#Fragmento para usar num WHERE sobre "veiculos v": exclui veículos com reservas ativas a terminar a partir de ?
+SQL_SEM_RESERVA_ATIVA = '''
+    NOT EXISTS (
+        SELECT 1
+        FROM reservas r
+        WHERE r.status = 'Ativa'
+          AND r.veiculo_id = v.id
+          AND r.data_fim >= ?
+    )
+'''
+
+#Fragmento para usar num WHERE sobre "veiculos v": exclui veículos com reservas ativas que intersetam [?, ?]
+SQL_SEM_SOBREPOSICAO = '''
+    NOT EXISTS (
+        SELECT 1
+        FROM reservas r
+        WHERE r.status = 'Ativa'
+          AND r.veiculo_id = v.id
+          AND r.data_fim >= ?
+          AND r.data_inicio <= ?
+    )
+'''
+
+
+def criar_indices(conn):
+    #idempotente: pode ser chamado sempre que o esquema é criado
+    conn.executescript(INDICES)
+
+
+def reservas_sobrepostas(conn, veiculo_id, data_inicio, data_fim, ignorar_reserva_id=None):
+    """
+    Devolve as reservas ativas do veículo que intersetam o intervalo [data_inicio, data_fim].
+    As datas são strings ISO. `ignorar_reserva_id` exclui a própria reserva quando se alteram datas.
+    """
+    sql = '''
+        SELECT id, data_inicio, data_fim
+        FROM reservas
+        WHERE status = 'Ativa'
+          AND veiculo_id = ?
+          AND data_fim >= ?
+          AND data_inicio <= ?
+    '''
+    parametros = [veiculo_id, data_inicio, data_fim]
+    if ignorar_reserva_id is not None:
+        sql += " AND id != ?"
+        parametros.append(ignorar_reserva_id)
+    return conn.execute(sql, parametros).fetchall()
+
+
+def veiculo_disponivel(conn, veiculo_id, data_inicio, data_fim, ignorar_reserva_id=None):
+    return not reservas_sobrepostas(conn, veiculo_id, data_inicio, data_fim, ignorar_reserva_id)
+
+
+def veiculos_ocupados(conn, data_inicio, data_fim):
+    """
+    Conjunto de ids de veículos com pelo menos uma reserva ativa no intervalo [data_inicio, data_fim].
+    """
+    cursor = conn.execute('''
+        SELECT DISTINCT veiculo_id
+        FROM reservas
+        WHERE status = 'Ativa'
+          AND data_fim >= ?
+          AND data_inicio <= ?
+    ''', (data_inicio, data_fim))
+    return {row[0] for row in cursor}
+
+
+def normalizar_intervalo(data_inicio, data_fim):
+    """
+    Valida um intervalo vindo de um formulário/query string e devolve-o como par de strings ISO.
+    Se só uma das datas for dada, o intervalo é esse único dia.
+    Lança ValueError se o formato for inválido ou se o fim for anterior ao início.
+    """
+    data_inicio = (data_inicio or data_fim).strip()
+    data_fim = (data_fim or data_inicio).strip()
+    inicio = datetime.strptime(data_inicio, "%Y-%m-%d").date()
+    fim = datetime.strptime(data_fim, "%Y-%m-%d").date()
+    if fim < inicio:
+        raise ValueError("A data de fim não pode ser anterior à data de início.")
+    return inicio.isoformat(), fim.isoformat()
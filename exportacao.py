@@ -0,0 +1,429 @@
+import abc
+import csv
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import traceback
+
+from openpyxl import Workbook
+
+import arquivo
+from base_dados import nova_conexao
+
+"""
+exportacao.py
+
+Exportação das tabelas para Excel/CSV/Parquet em streaming:
+- As linhas são lidas em blocos de tamanho fixo (cursor.fetchmany) e escritas logo a seguir,
+  por isso a memória usada não depende do tamanho da tabela.
+- XLSX com openpyxl em modo write-only (as linhas vão diretamente para o ficheiro).
+- Parquet com pyarrow (dependência opcional), um row group por bloco e esquema a partir dos tipos do SQLite.
+- Cada ficheiro é escrito num temporário e só substitui o anterior no fim (os.replace).
+- Exportação incremental: guarda o maior id exportado por ficheiro (high-water mark) e as colunas, e na
+  execução seguinte só lê e escreve as linhas com id superior. O CSV é anexado no próprio ficheiro; XLSX e
+  Parquet não se podem anexar sem reescrever tudo, por isso as linhas novas vão para um ficheiro à parte
+  (<tabela>.parte-0001.<formato>, ...). Ao chegar a MAX_PARTES partes, ou se as colunas da tabela mudaram
+  (ex.: uma coluna nova), a tabela é exportada de novo num só ficheiro e as partes são apagadas.
+- ExportacaoEmSegundoPlano corre a exportação incremental numa thread, fora do arranque do servidor.
+- As exportações completas podem incluir o arquivo por ano (com_historico=True, ver arquivo.py). A incremental
+  também o inclui sempre que reescreve o ficheiro (primeira execução, estado perdido, colunas novas); as
+  execuções seguintes só leem a base principal, porque as reservas arquivadas já tinham sido exportadas.
+"""
+
+#Lista das tabelas que podem ser exportadas (também serve de lista branca para o nome da tabela no SQL)
+TABELAS = ["clientes", "veiculos", "reservas", "pagamentos"]
+FORMATOS = ("xlsx", "csv", "parquet")
+TAMANHO_BLOCO = 10000
+FICHEIRO_ESTADO = ".estado_exportacao.json"    #maior id exportado, colunas e partes por "<tabela>.<formato>"
+MAX_PARTES = 100                                #xlsx/parquet: a partir daqui a execução seguinte junta tudo
+
+
+def ler_em_blocos(conn, tabela, tamanho_bloco=TAMANHO_BLOCO, consulta=None, parametros=()):
+    """
+    Devolve (colunas, gerador de blocos de linhas) para a tabela.
+    `consulta` permite exportar só parte da tabela (ex.: linhas novas).
+    """
+    if tabela not in TABELAS:
+        raise ValueError(f"Tabela desconhecida: {tabela}")
+    cursor = conn.execute(consulta or f"SELECT * FROM {tabela} ORDER BY id", parametros)
+    colunas = [descricao[0] for descricao in cursor.description]
+
+    def blocos():
+        while True:
+            linhas = cursor.fetchmany(tamanho_bloco)
+            if not linhas:
+                break
+            yield [tuple(linha) for linha in linhas]
+
+    return colunas, blocos()
+
+
+def colunas_tabela(conn, tabela):
+    #nomes das colunas pela ordem do esquema (a mesma de SELECT *)
+    return [linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})")]
+
+
+def tipos_colunas(conn, tabela):
+    #tipos declarados no esquema (INTEGER, REAL, TEXT, DATE...), pela ordem das colunas
+    return [linha[2].upper() for linha in conn.execute(f"PRAGMA table_info({tabela})")]
+
+
+def _colunas_exportadas(conn, tabela, com_historico):
+    """
+    (colunas, tipos) que a exportação escreve: as da tabela ou, com o histórico, as comuns ao arquivo
+    (arquivo.COLUNAS), para o ficheiro ter sempre as mesmas colunas, venham as linhas de onde vierem.
+    """
+    tipos = dict(zip(colunas_tabela(conn, tabela), tipos_colunas(conn, tabela)))
+    if com_historico and tabela in arquivo.COLUNAS:
+        colunas = [coluna.strip() for coluna in arquivo.COLUNAS[tabela].split(",")]
+    else:
+        colunas = list(tipos)
+    return colunas, [tipos.get(coluna, "TEXT") for coluna in colunas]
+
+
+class _EscritorFicheiro(abc.ABC):
+    """
+    Base dos escritores: escreve num temporário na mesma pasta e move-o para o destino no fim.
+    Os formatos com anexavel=True podem, em vez disso, juntar as linhas no fim do ficheiro existente
+    (anexar=True); se a escrita falhar, o ficheiro volta ao tamanho que tinha.
+    """
+
+    extensao = None
+    anexavel = False
+
+    def __init__(self, caminho, colunas, tipos=None, anexar=False):
+        if anexar and not self.anexavel:
+            raise ValueError(f"O formato {self.extensao} não permite anexar linhas")
+        self.caminho = caminho
+        self.colunas = colunas
+        self.tipos = tipos
+        self.anexar = anexar
+        if anexar:
+            self.temporario = None
+            self.tamanho_anterior = os.path.getsize(caminho)
+            return
+        pasta = os.path.dirname(caminho) or "."
+        os.makedirs(pasta, exist_ok=True)
+        descritor, self.temporario = tempfile.mkstemp(dir=pasta, prefix=".export-", suffix="." + self.extensao)
+        os.close(descritor)
+
+    def __enter__(self):
+        self.abrir()
+        return self
+
+    def __exit__(self, tipo, valor, traceback):
+        if self.anexar:
+            self.fechar()
+            if tipo is not None:
+                os.truncate(self.caminho, self.tamanho_anterior)
+            return False
+        try:
+            if tipo is None:
+                self.fechar()
+                os.replace(self.temporario, self.caminho)
+        finally:
+            if os.path.exists(self.temporario):
+                os.remove(self.temporario)
+        return False
+
+    @abc.abstractmethod
+    def abrir(self):
+        """Abre o destino (o temporário, ou o próprio ficheiro com anexar=True); num ficheiro novo escreve o cabeçalho."""
+
+    @abc.abstractmethod
+    def escrever(self, linhas):
+        """Escreve um bloco de linhas (tuplos pela ordem de self.colunas)."""
+
+    @abc.abstractmethod
+    def fechar(self):
+        """Termina a escrita; o ficheiro tem de ficar completo."""
+
+
+class EscritorXlsx(_EscritorFicheiro):
+    extensao = "xlsx"
+
+    def abrir(self):
+        #write-only: as linhas não ficam guardadas em memória
+        self.livro = Workbook(write_only=True)
+        self.folha = self.livro.create_sheet("Sheet1")
+        self.folha.append(self.colunas)
+
+    def escrever(self, linhas):
+        for linha in linhas:
+            self.folha.append(linha)
+
+    def fechar(self):
+        self.livro.save(self.temporario)
+
+
+class EscritorCsv(_EscritorFicheiro):
+    extensao = "csv"
+    anexavel = True
+
+    def abrir(self):
+        if self.anexar:
+            #CSV permite juntar linhas no fim sem reler o conteúdo
+            self.ficheiro = open(self.caminho, "a", newline="", encoding="utf-8")
+            self.escritor = csv.writer(self.ficheiro)
+        else:
+            self.ficheiro = open(self.temporario, "w", newline="", encoding="utf-8")
+            self.escritor = csv.writer(self.ficheiro)
+            self.escritor.writerow(self.colunas)
+
+    def escrever(self, linhas):
+        self.escritor.writerows(linhas)
+
+    def fechar(self):
+        self.ficheiro.close()
+
+
+class EscritorParquet(_EscritorFicheiro):
+    extensao = "parquet"
+
+    @staticmethod
+    def _pyarrow():
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as erro:
+            raise RuntimeError("A exportação para Parquet precisa do pacote pyarrow (pip install pyarrow).") from erro
+        return pyarrow
+
+    @classmethod
+    def esquema_para(cls, colunas, tipos=None):
+        #esquema a partir dos tipos declarados no SQLite (INTEGER/REAL; o resto, incluindo datas ISO, fica texto)
+        pyarrow = cls._pyarrow()
+        tipos = tipos or ["TEXT"] * len(colunas)
+        return pyarrow.schema([
+            (nome, pyarrow.int64() if "INT" in tipo else pyarrow.float64() if tipo == "REAL" else pyarrow.string())
+            for nome, tipo in zip(colunas, tipos)
+        ])
+
+    def abrir(self):
+        pyarrow = self._pyarrow()
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.esquema = self.esquema_para(self.colunas, self.tipos)
+        self.escritor = pyarrow.parquet.ParquetWriter(self.temporario, self.esquema)
+
+    def escrever(self, linhas):
+        #cada bloco vira um row group
+        colunas = list(zip(*linhas))
+        tabela = self._pa.table(
+            [self._pa.array(valores, type=campo.type) for valores, campo in zip(colunas, self.esquema)],
+            schema=self.esquema,
+        )
+        self.escritor.write_table(tabela)
+
+    def fechar(self):
+        self.escritor.close()
+
+
+ESCRITORES = {
+    "xlsx": EscritorXlsx,
+    "csv": EscritorCsv,
+    "parquet": EscritorParquet,
+}
+
+
+def _ler_com_historico(conn, tabela, tamanho_bloco):
+    #ano a ano do arquivo (um ano ligado de cada vez) e depois a base principal, cada fonte por id
+    consulta = f"SELECT {arquivo.COLUNAS[tabela]} FROM {{}} ORDER BY id"
+
+    def blocos():
+        for fonte in arquivo.fontes(conn, tabela):
+            yield from ler_em_blocos(conn, tabela, tamanho_bloco, consulta.format(fonte))[1]
+
+    return blocos()
+
+
+def _exportar(conn, tabela, caminho, formato, tamanho_bloco, progresso, desde_id=None, com_historico=False, anexar=False):
+    """
+    Exporta as linhas da tabela (todas, ou só as com id > desde_id) para um ficheiro novo ou,
+    com anexar=True, no fim do ficheiro existente.
+    Com com_historico=True, reservas e pagamentos incluem também as linhas do arquivo por ano
+    (na exportação completa; as linhas novas estão sempre na base principal).
+    Devolve (linhas escritas, maior id exportado).
+    """
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato desconhecido: {formato}")
+    colunas, tipos = _colunas_exportadas(conn, tabela, com_historico)
+    if com_historico and desde_id is None and tabela in arquivo.COLUNAS:
+        blocos = _ler_com_historico(conn, tabela, tamanho_bloco)
+    elif desde_id is None:
+        blocos = ler_em_blocos(conn, tabela, tamanho_bloco, f"SELECT {', '.join(colunas)} FROM {tabela} ORDER BY id")[1]
+    else:
+        blocos = ler_em_blocos(conn, tabela, tamanho_bloco,
+                               f"SELECT {', '.join(colunas)} FROM {tabela} WHERE id > ? ORDER BY id", (desde_id,))[1]
+    posicao_id = colunas.index("id")
+    total = 0
+    maior_id = desde_id or 0
+    with ESCRITORES[formato](caminho, colunas, tipos, anexar=anexar) as escritor:
+        for linhas in blocos:
+            escritor.escrever(linhas)
+            total += len(linhas)
+            #os anos do arquivo vêm um a um, por isso o último id lido não é forçosamente o maior
+            maior_id = max(maior_id, max(linha[posicao_id] for linha in linhas))
+            if progresso:
+                progresso(tabela, total)
+    return total, maior_id
+
+
+def exportar_tabela(conn, tabela, caminho, formato="xlsx", tamanho_bloco=TAMANHO_BLOCO, progresso=None, com_historico=False):
+    """
+    Exporta uma tabela para `caminho` no formato pedido e devolve o número de linhas escritas.
+    `progresso(tabela, linhas_escritas)` é chamado depois de cada bloco.
+    """
+    return _exportar(conn, tabela, caminho, formato, tamanho_bloco, progresso, com_historico=com_historico)[0]
+
+
+def exportar(conn, pasta, formatos=("xlsx",), tabelas=TABELAS, tamanho_bloco=TAMANHO_BLOCO, progresso=None, com_historico=False):
+    """
+    Exporta várias tabelas para `pasta` (um ficheiro <tabela>.<formato> por tabela e formato).
+    Devolve {caminho: linhas}.
+    """
+    resultado = {}
+    for tabela in tabelas:
+        for formato in formatos:
+            caminho = os.path.join(pasta, f"{tabela}.{formato}")
+            resultado[caminho] = exportar_tabela(conn, tabela, caminho, formato, tamanho_bloco, progresso, com_historico)
+    return resultado
+
+
+def _ler_estado(pasta):
+    try:
+        with open(os.path.join(pasta, FICHEIRO_ESTADO), encoding="utf-8") as ficheiro:
+            return json.load(ficheiro)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _gravar_estado(pasta, estado):
+    temporario = os.path.join(pasta, FICHEIRO_ESTADO + ".tmp")
+    with open(temporario, "w", encoding="utf-8") as ficheiro:
+        json.dump(estado, ficheiro, indent=2, sort_keys=True)
+    os.replace(temporario, os.path.join(pasta, FICHEIRO_ESTADO))
+
+
+def partes(pasta, tabela, formato):
+    """Ficheiros com as linhas juntadas desde a última exportação completa (xlsx e parquet), por ordem."""
+    return sorted(glob.glob(os.path.join(glob.escape(pasta), f"{tabela}.parte-*.{formato}")))
+
+
+def _registo_valido(registo, caminho, colunas, tipos):
+    #o ficheiro existe e foi escrito com as colunas atuais? senão juntar-lhe linhas desalinhava as colunas
+    if not isinstance(registo, dict) or not os.path.exists(caminho):
+        return None
+    if registo["colunas"] != colunas or registo["tipos"] != tipos or registo["partes"] >= MAX_PARTES:
+        return None
+    if "bytes" in registo:
+        tamanho = os.path.getsize(caminho)
+        if tamanho < registo["bytes"]:
+            return None
+        if tamanho > registo["bytes"]:
+            #linhas de uma execução interrompida antes de gravar o estado: voltam a ser exportadas
+            os.truncate(caminho, registo["bytes"])
+    return registo
+
+
+def exportar_incremental(conn, pasta, formatos=("xlsx",), tabelas=TABELAS, tamanho_bloco=TAMANHO_BLOCO, progresso=None):
+    """
+    Exporta para `pasta` só as linhas com id acima do último exportado: no fim do CSV, ou num ficheiro
+    <tabela>.parte-NNNN.<formato> novo para XLSX e Parquet.
+    Se o ficheiro ou o estado não existirem, se as colunas da tabela mudaram ou se já houver MAX_PARTES partes,
+    faz a exportação completa dessa tabela (com o arquivo) e apaga as partes.
+    Só deteta linhas novas: alterações a linhas já exportadas exigem uma exportação completa (exportar).
+    Devolve {caminho do ficheiro principal: linhas escritas}.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    estado = _ler_estado(pasta)
+    resultado = {}
+    for tabela in tabelas:
+        #as mesmas colunas na exportação completa (com o arquivo) e nas linhas novas
+        colunas, tipos = _colunas_exportadas(conn, tabela, True)
+        for formato in formatos:
+            chave = f"{tabela}.{formato}"
+            caminho = os.path.join(pasta, chave)
+            registo = _registo_valido(estado.get(chave), caminho, colunas, tipos)
+            if registo is not None:
+                #nada de novo: não escreve nada
+                novo_maximo = conn.execute(f"SELECT MAX(id) FROM {tabela}").fetchone()[0] or 0
+                if novo_maximo <= registo["id"]:
+                    resultado[caminho] = 0
+                    continue
+
+            if registo is None:
+                #esquece o estado antes de apagar as partes: se parar a meio, a próxima execução recomeça do zero
+                estado.pop(chave, None)
+                _gravar_estado(pasta, estado)
+                for parte in partes(pasta, tabela, formato):
+                    os.remove(parte)
+                linhas, maior_id = _exportar(conn, tabela, caminho, formato, tamanho_bloco, progresso, com_historico=True)
+                registo = {"colunas": colunas, "tipos": tipos, "partes": 0}
+            elif ESCRITORES[formato].anexavel:
+                linhas, maior_id = _exportar(conn, tabela, caminho, formato, tamanho_bloco, progresso, registo["id"],
+                                             com_historico=True, anexar=True)
+            else:
+                #uma parte já escrita por uma execução interrompida é substituída (os.replace)
+                parte = os.path.join(pasta, f"{tabela}.parte-{registo['partes'] + 1:04d}.{formato}")
+                linhas, maior_id = _exportar(conn, tabela, parte, formato, tamanho_bloco, progresso, registo["id"],
+                                             com_historico=True)
+                registo["partes"] += 1
+            registo["id"] = maior_id
+            if ESCRITORES[formato].anexavel:
+                registo["bytes"] = os.path.getsize(caminho)
+            estado[chave] = registo
+            #grava o estado depois de cada ficheiro, para não repetir linhas se a tarefa for interrompida
+            _gravar_estado(pasta, estado)
+            resultado[caminho] = linhas
+    return resultado
+
+
+class ExportacaoEmSegundoPlano(threading.Thread):
+    """
+    Thread que corre exportar_incremental logo ao arrancar, depois a cada `intervalo` segundos
+    (None = só quando pedido com pedir()). Só uma exportação corre de cada vez.
+    """
+
+    def __init__(self, caminho_bd, pasta, formatos=("xlsx",), intervalo=None):
+        super().__init__(name="exportacao", daemon=True)
+        self.caminho_bd = caminho_bd
+        self.pasta = pasta
+        self.formatos = formatos
+        self.intervalo = intervalo
+        self.ultimo_resultado = None
+        self.ultima_execucao = None
+        self._pedido = threading.Event()
+        self._parar = threading.Event()
+        self._pedido.set()
+
+    def pedir(self):
+        #pede uma exportação assim que a thread estiver livre
+        self._pedido.set()
+
+    def parar(self):
+        self._parar.set()
+        self._pedido.set()
+
+    def run(self):
+        while not self._parar.is_set():
+            self._pedido.wait(timeout=self.intervalo)
+            self._pedido.clear()
+            if self._parar.is_set():
+                break
+            try:
+                conn = nova_conexao(self.caminho_bd)
+                try:
+                    inicio = time.perf_counter()
+                    self.ultimo_resultado = exportar_incremental(conn, self.pasta, self.formatos)
+                    self.ultima_execucao = time.time()
+                    novas = sum(self.ultimo_resultado.values())
+                    print(f"Exportação incremental concluída: {novas} linhas novas em {time.perf_counter() - inicio:.2f} s")
+                finally:
+                    conn.close()
+            except Exception:
+                #um erro numa execução não pode matar a thread: tenta de novo na próxima
+                traceback.print_exc()
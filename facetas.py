@@ -0,0 +1,139 @@
+from datetime import date
+
+from base_dados import transacao_imediata
+import disponibilidade
+
+"""
+facetas.py
+
+Filtros por facetas no catálogo (/carros) com contagens pré-calculadas, ex.: "Automática (12)":
+- As contagens de veículos disponíveis hoje por categoria, tipo, transmissão e capacidade ficam na
+  tabela facetas_veiculos, que é lida em cada pedido em vez de fazer GROUP BY.
+- Triggers em veiculos e reservas marcam a tabela como desatualizada (facetas_estado.sujo = 1);
+  o recálculo só acontece no pedido seguinte a uma alteração, ou quando muda o dia.
+- Como o estado fica na base de dados, todos os processos da aplicação veem a mesma tabela.
+- Os filtros usam índices simples em cada coluna de faceta.
+"""
+
+#colunas de veiculos usadas como facetas (lista branca: os nomes entram diretamente no SQL)
+FACETAS = ["categoria", "tipo", "transmissao", "capacidade"]
+NOMES = {
+    "categoria": "Categoria",
+    "tipo": "Tipo",
+    "transmissao": "Transmissão",
+    "capacidade": "Capacidade",
+}
+
+ESQUEMA = '''
+    CREATE TABLE IF NOT EXISTS facetas_veiculos (
+        faceta TEXT NOT NULL,
+        valor NOT NULL,
+        total INTEGER NOT NULL,
+        PRIMARY KEY (faceta, valor)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS facetas_estado (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        sujo INTEGER NOT NULL DEFAULT 1,
+        data TEXT
+    );
+    INSERT OR IGNORE INTO facetas_estado (id, sujo) VALUES (1, 1);
+
+    CREATE TRIGGER IF NOT EXISTS facetas_veiculos_inserir AFTER INSERT ON veiculos BEGIN
+        UPDATE facetas_estado SET sujo = 1 WHERE sujo = 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS facetas_veiculos_apagar AFTER DELETE ON veiculos BEGIN
+        UPDATE facetas_estado SET sujo = 1 WHERE sujo = 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS facetas_veiculos_atualizar
+    AFTER UPDATE OF categoria, tipo, transmissao, capacidade ON veiculos BEGIN
+        UPDATE facetas_estado SET sujo = 1 WHERE sujo = 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS facetas_reservas_inserir AFTER INSERT ON reservas BEGIN
+        UPDATE facetas_estado SET sujo = 1 WHERE sujo = 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS facetas_reservas_apagar AFTER DELETE ON reservas BEGIN
+        UPDATE facetas_estado SET sujo = 1 WHERE sujo = 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS facetas_reservas_atualizar
+    AFTER UPDATE OF status, veiculo_id, data_inicio, data_fim ON reservas BEGIN
+        UPDATE facetas_estado SET sujo = 1 WHERE sujo = 0;
+    END;
+
+    CREATE INDEX IF NOT EXISTS idx_veiculos_categoria ON veiculos (categoria);
+    CREATE INDEX IF NOT EXISTS idx_veiculos_tipo ON veiculos (tipo);
+    CREATE INDEX IF NOT EXISTS idx_veiculos_transmissao ON veiculos (transmissao);
+    CREATE INDEX IF NOT EXISTS idx_veiculos_capacidade ON veiculos (capacidade);
+'''
+
+
+def criar_tabelas(conn):
+    conn.executescript(ESQUEMA)
+
+
+def recalcular(conn, hoje):
+    """
+    Volta a preencher facetas_veiculos com os veículos disponíveis em `hoje`.
+    Corre em BEGIN IMMEDIATE e volta a verificar o estado, para que só um processo faça o trabalho.
+    """
+    with transacao_imediata(conn):
+        estado = conn.execute("SELECT sujo, data FROM facetas_estado WHERE id = 1").fetchone()
+        if estado and not estado[0] and estado[1] == hoje:
+            return
+        conn.execute("DELETE FROM facetas_veiculos")
+        for faceta in FACETAS:
+            conn.execute(f'''
+                INSERT INTO facetas_veiculos (faceta, valor, total)
+                SELECT '{faceta}', v.{faceta}, COUNT(*)
+                FROM veiculos v
+                WHERE {disponibilidade.SQL_SEM_RESERVA_ATIVA}
+                GROUP BY v.{faceta}
+            ''', (hoje,))
+        conn.execute("UPDATE facetas_estado SET sujo = 0, data = ? WHERE id = 1", (hoje,))
+
+
+def obter_contagens(conn, hoje=None):
+    """
+    Devolve {faceta: [(valor, total), ...]} a partir da tabela pré-calculada,
+    recalculando-a antes se estiver marcada como desatualizada ou for de outro dia.
+    """
+    hoje = hoje or date.today().isoformat()
+    estado = conn.execute("SELECT sujo, data FROM facetas_estado WHERE id = 1").fetchone()
+    if estado is None or estado[0] or estado[1] != hoje:
+        recalcular(conn, hoje)
+
+    contagens = {faceta: [] for faceta in FACETAS}
+    for faceta, valor, total in conn.execute(
+        "SELECT faceta, valor, total FROM facetas_veiculos ORDER BY faceta, valor"
+    ):
+        if faceta in contagens:
+            contagens[faceta].append((valor, total))
+    return contagens
+
+
+def selecionados(args):
+    """
+    Lê os valores escolhidos de cada faceta na query string (?transmissao=Manual&capacidade=4&capacidade=5).
+    Devolve {faceta: [valores]} só com as facetas que têm valores válidos.
+    """
+    escolhidos = {}
+    for faceta in FACETAS:
+        valores = [valor.strip() for valor in args.getlist(faceta) if valor.strip()]
+        if faceta == "capacidade":
+            valores = [int(valor) for valor in valores if valor.isdigit()]
+        if valores:
+            escolhidos[faceta] = valores
+    return escolhidos
+
+
+def filtro_sql(escolhidos):
+    """
+    Fragmento SQL (a juntar com AND sobre "veiculos v") e parâmetros para as facetas escolhidas:
+    valores da mesma faceta combinam-se com OR (IN), facetas diferentes com AND.
+    """
+    partes = []
+    parametros = []
+    for faceta, valores in escolhidos.items():
+        partes.append(f"v.{faceta} IN ({', '.join('?' * len(valores))})")
+        parametros.extend(valores)
+    return " AND ".join(partes), parametros
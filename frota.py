@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import namedtuple
+
+import cache
+
+"""
+frota.py
+
+Cache em memória dos veículos por id, para os caminhos de reserva (/reservar, /alterar_reserva)
+não irem ao SQLite buscar dados que quase nunca mudam:
+- Cada veículo fica num namedtuple (sem __dict__, acesso por índice como sqlite3.Row ou por atributo).
+- As entradas expiram ao fim de TTL_SEGUNDOS, e invalidar() apaga uma entrada ou a cache toda.
+- Escritas na frota devem passar por atualizar() (write-through: grava e invalida) ou chamar invalidar(),
+  que também avisa as funções registadas com ao_alterar (ex.: a cache do catálogo).
+- invalidar() num worker chega aos outros pela geração do espaço "frota" da cache partilhada (cache.contador).
+  Cada processo só lê essa geração no máximo uma vez a cada VERIFICAR_SEGUNDOS e esvazia a sua cache
+  quando ela muda: um acerto na cache é só uma consulta ao dicionário, sem SQLite, e uma alteração
+  feita noutro worker é vista ao fim de VERIFICAR_SEGUNDOS, no máximo.
+- Uma leitura que começou antes de uma invalidação não volta a pôr na cache o valor antigo (_geracao).
+"""
+
+TTL_SEGUNDOS = 300
+VERIFICAR_SEGUNDOS = 2      #intervalo entre leituras da geração partilhada
+
+COLUNAS = (
+    "id", "marca", "modelo", "categoria", "transmissao", "tipo", "capacidade", "imagem",
+    "valor_diaria", "ultima_revisao", "proxima_revisao", "ultima_inspecao",
+)
+#colunas que atualizar() aceita (o id não muda)
+EDITAVEIS = frozenset(COLUNAS[1:])
+
+Veiculo = namedtuple("Veiculo", COLUNAS)
+
+_cache = {}                     #id -> (Veiculo, expira_em)
+_trinco = threading.Lock()
+_ouvintes = []
+_geracao = 0                    #sobe sempre que a cache deste processo é invalidada
+_geracao_partilhada = None      #último valor lido de cache.contador("frota")
+_verificada_em = None
+
+
+def ao_alterar(funcao):
+    """Regista funcao(veiculo_id) a chamar depois de cada invalidação (veiculo_id None = frota toda)."""
+    _ouvintes.append(funcao)
+    return funcao
+
+
+def invalidar(veiculo_id=None):
+    #sem argumento esvazia a cache toda (ex.: depois de inserir carros); a nova geração chega aos outros workers
+    global _geracao
+    cache.invalidar("frota")
+    with _trinco:
+        _geracao += 1
+        if veiculo_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(veiculo_id, None)
+    for funcao in _ouvintes:
+        funcao(veiculo_id)
+
+
+def _sincronizar(agora):
+    #lê a geração partilhada se já passou VERIFICAR_SEGUNDOS desde a última vez; se mudou, esvazia a cache
+    global _geracao, _geracao_partilhada, _verificada_em
+    if _verificada_em is not None and agora - _verificada_em < VERIFICAR_SEGUNDOS:
+        return
+    partilhada = cache.contador("frota")
+    with _trinco:
+        _verificada_em = agora
+        if partilhada != _geracao_partilhada:
+            _geracao_partilhada = partilhada
+            _geracao += 1
+            _cache.clear()
+
+
+def obter(conn, veiculo_id):
+    """Devolve o Veiculo com este id (da cache, ou lido de conn se faltar/expirou) ou None."""
+    agora = time.monotonic()
+    _sincronizar(agora)
+    with _trinco:
+        entrada = _cache.get(veiculo_id)
+        if entrada and entrada[1] > agora:
+            return entrada[0]
+        geracao = _geracao
+
+    linha = conn.execute(
+        f"SELECT {', '.join(COLUNAS)} FROM veiculos WHERE id = ?", (veiculo_id,)
+    ).fetchone()
+    if linha is None:
+        return None
+    veiculo = Veiculo(*linha)
+
+    with _trinco:
+        #se houve uma invalidação durante a leitura, o valor lido pode já estar desatualizado
+        if geracao == _geracao:
+            _cache[veiculo_id] = (veiculo, agora + TTL_SEGUNDOS)
+    return veiculo
+
+
+def atualizar(conn, veiculo_id, **campos):
+    """
+    Altera colunas de um veículo (ex.: atualizar(conn, 3, valor_diaria=55.0)) e invalida a cache.
+    Lança ValueError para colunas desconhecidas.
+    """
+    desconhecidas = set(campos) - EDITAVEIS
+    if desconhecidas:
+        raise ValueError(f"Colunas inválidas: {', '.join(sorted(desconhecidas))}")
+    if not campos:
+        return
+    atribuicoes = ", ".join(f"{coluna} = ?" for coluna in campos)
+    conn.execute(f"UPDATE veiculos SET {atribuicoes} WHERE id = ?", (*campos.values(), veiculo_id))
+    conn.commit()
+    invalidar(veiculo_id)
@@ -0,0 +1,104 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from matplotlib.figure import Figure
+
+from instrumentacao import span
+
+"""
+graficos.py
+
+Cache dos gráficos PNG do dashboard:
+- O nome de cada ficheiro inclui um hash da série mensal que o gerou (ex.: reservas_por_mes-3f9a1c0b7e2d4a56.png),
+  por isso o gráfico só é desenhado quando os dados mudam e o URL nunca aponta para conteúdo diferente.
+- O PNG é escrito num ficheiro temporário e movido com os.replace, para nenhum pedido ler um ficheiro a meio.
+- Só os ficheiros mais recentes de cada gráfico são mantidos; os restantes são apagados.
+- Usa a API orientada a objetos do matplotlib (Figure) em vez de pyplot, que tem estado global partilhado.
+"""
+
+PASTA_RELATIVA = "img/graficos"     #relativa a app.static_folder
+VERSAO = 1                          #incrementar quando o aspeto dos gráficos mudar
+MANTER_POR_GRAFICO = 3              #ficheiros antigos mantidos (páginas já servidas ainda os podem pedir)
+
+_trinco = threading.Lock()
+
+
+def _hash_serie(nome, serie):
+    conteudo = json.dumps({"nome": nome, "versao": VERSAO, "serie": serie}, sort_keys=True)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()[:16]
+
+
+def _desenhar_barras(serie, caminho):
+    fig = Figure(figsize=(8, 4))
+    ax = fig.subplots()
+    ax.bar([mes for mes, _ in serie], [valor for _, valor in serie], color="#007bff")
+    ax.tick_params(axis="x", labelrotation=45)
+    for rotulo in ax.get_xticklabels():
+        rotulo.set_horizontalalignment("right")
+    ax.set_ylabel("Número de Reservas")
+    ax.set_title("Reservas nos Últimos 12 Meses")
+    fig.tight_layout()
+    fig.savefig(caminho, format="png")
+
+
+def _desenhar_linha(serie, caminho):
+    fig = Figure(figsize=(8, 4))
+    ax = fig.subplots()
+    ax.plot([mes for mes, _ in serie], [valor for _, valor in serie], marker="o")
+    ax.tick_params(axis="x", labelrotation=45)
+    for rotulo in ax.get_xticklabels():
+        rotulo.set_horizontalalignment("right")
+    ax.set_ylabel("Faturação (€)")
+    ax.set_title("Faturação Mensal (Últimos 12 Meses)")
+    fig.tight_layout()
+    fig.savefig(caminho, format="png")
+
+
+def _evictar(pasta, nome, atual):
+    #apaga as versões antigas deste gráfico, mantendo as MANTER_POR_GRAFICO mais recentes
+    ficheiros = sorted(glob.glob(os.path.join(pasta, f"{nome}-*.png")), key=os.path.getmtime, reverse=True)
+    for caminho in ficheiros[MANTER_POR_GRAFICO:]:
+        if os.path.basename(caminho) != atual:
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+
+
+def obter_grafico(static_folder, nome, serie, desenhar):
+    """
+    Devolve o caminho (relativo à pasta static) do PNG para esta série, desenhando-o só se ainda não existir.
+    """
+    serie = [[str(mes), float(valor)] for mes, valor in serie]
+    pasta = os.path.join(static_folder, PASTA_RELATIVA)
+    ficheiro = f"{nome}-{_hash_serie(nome, serie)}.png"
+    caminho = os.path.join(pasta, ficheiro)
+
+    if not os.path.exists(caminho):
+        #um só desenho de cada vez por processo; entre processos o os.replace garante a atomicidade
+        with _trinco:
+            if not os.path.exists(caminho):
+                os.makedirs(pasta, exist_ok=True)
+                descritor, temporario = tempfile.mkstemp(dir=pasta, prefix=f".{nome}-", suffix=".png")
+                try:
+                    with os.fdopen(descritor, "wb") as destino, span(f"matplotlib:{nome}"):
+                        desenhar(serie, destino)
+                    os.replace(temporario, caminho)
+                except BaseException:
+                    os.remove(temporario)
+                    raise
+                _evictar(pasta, nome, ficheiro)
+
+    return f"{PASTA_RELATIVA}/{ficheiro}"
+
+
+def grafico_reservas(static_folder, reservas_por_mes):
+    return obter_grafico(static_folder, "reservas_por_mes", reservas_por_mes, _desenhar_barras)
+
+
+def grafico_faturacao(static_folder, faturacao_por_mes):
+    return obter_grafico(static_folder, "faturacao_por_mes", faturacao_por_mes, _desenhar_linha)
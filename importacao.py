@@ -0,0 +1,333 @@
+import argparse
+import csv
+import os
+import time
+from datetime import date, datetime
+
+from openpyxl import load_workbook
+
+import cache
+import frota
+import miniaturas
+import pesquisa
+from base_dados import nova_conexao, transacao_imediata
+
+"""
+importacao.py
+
+Importação em massa da frota (veiculos) a partir de CSV ou XLSX, no mesmo formato que a exportação gera:
+- O ficheiro é lido em streaming (csv.reader / openpyxl read_only), nunca inteiro em memória.
+- Cada linha é validada; as inválidas ficam no relatório (número da linha e motivo) e não param a importação.
+- Chave natural: matricula (índice único). Uma matrícula nova é inserida; uma que já existe é atualizada,
+  mas só se alguma coluna mudou (linhas iguais não tocam no índice de pesquisa).
+- Veículos anteriores à coluna matricula (ex.: os carros padrão) têm-na a NULL. Nas linhas com id
+  (o ficheiro exportado), uma matrícula preenchida passa a ser a desse veículo; uma linha sem matrícula
+  atualiza o veículo pelo id, e é inválida se esse id não existir. Assim exportar -> editar -> importar funciona.
+- Escrita com executemany em blocos de TAMANHO_BLOCO, em transações de LINHAS_POR_TRANSACAO linhas:
+  cada transação segura o lock de escrita ~1 s, por isso as reservas feitas entretanto só esperam, não falham.
+- Modo em massa: se o ficheiro for grande em relação à frota já gravada, os triggers e os índices secundários
+  de veiculos são retirados durante a carga e recriados no fim, com o índice FTS reconstruído de uma vez
+  (pesquisa.reconstruir) e as facetas marcadas para recalcular. Se a importação parar a meio,
+  o arranque da aplicação (criar_tabelas) volta a criá-los.
+- No fim invalida a cache da frota (e, através dela, a do catálogo) e gera as miniaturas das imagens novas.
+
+Linha de comandos:
+    python importacao.py frota.csv [--bd database/banco_de_dados.db] [--static static] [--cache database/cache.db]
+"""
+
+TAMANHO_BLOCO = 5000
+LINHAS_POR_TRANSACAO = 50000
+FRACAO_MODO_EM_MASSA = 0.25     #modo em massa a partir de 25% das linhas já existentes
+MAX_ERROS_RELATORIO = 100
+
+COLUNAS = frota.COLUNAS[1:] + ("matricula",)
+TEXTO = ("marca", "modelo", "categoria", "transmissao", "tipo", "imagem")
+DATAS = ("ultima_revisao", "proxima_revisao", "ultima_inspecao")
+
+#atualiza só se alguma coluna mudou: um UPDATE sem mudanças dispararia à mesma os triggers de veiculos
+_LISTA = ", ".join(COLUNAS)
+SQL_UPSERT = f'''
+    INSERT INTO veiculos ({_LISTA}) VALUES ({", ".join("?" * len(COLUNAS))})
+    ON CONFLICT (matricula) DO UPDATE SET
+        {", ".join(f"{coluna} = excluded.{coluna}" for coluna in COLUNAS[:-1])}
+    WHERE ({", ".join(f"veiculos.{coluna}" for coluna in COLUNAS[:-1])})
+       IS NOT ({", ".join(f"excluded.{coluna}" for coluna in COLUNAS[:-1])})
+'''
+#veículo sem matrícula (id do ficheiro) recebe a da linha, se nenhum outro a tiver; o upsert seguinte já o encontra
+SQL_ATRIBUIR_MATRICULA = f'''
+    UPDATE veiculos SET {", ".join(f"{coluna} = ?" for coluna in COLUNAS)}
+    WHERE id = ? AND matricula IS NULL AND NOT EXISTS (SELECT 1 FROM veiculos WHERE matricula = ?)
+'''
+#linha sem matrícula: atualiza pelo id (a matrícula guardada não muda)
+SQL_ATUALIZAR_POR_ID = f'''
+    UPDATE veiculos SET {", ".join(f"{coluna} = ?" for coluna in COLUNAS[:-1])}
+    WHERE id = ? AND ({", ".join(COLUNAS[:-1])}) IS NOT ({", ".join("?" * len(COLUNAS[:-1]))})
+'''
+
+
+def criar_indices(conn):
+    #coluna matricula (bases antigas não a têm) e índice único para o upsert; os veículos antigos ficam com NULL
+    if "matricula" not in {linha[1] for linha in conn.execute("PRAGMA table_info(veiculos)")}:
+        conn.execute("ALTER TABLE veiculos ADD COLUMN matricula TEXT")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_veiculos_matricula ON veiculos (matricula)")
+    conn.commit()
+
+
+def _linhas_csv(caminho):
+    with open(caminho, newline="", encoding="utf-8-sig") as ficheiro:
+        yield from csv.reader(ficheiro)
+
+
+def _linhas_xlsx(caminho):
+    livro = load_workbook(caminho, read_only=True)
+    try:
+        yield from livro.worksheets[0].iter_rows(values_only=True)
+    finally:
+        livro.close()
+
+
+def ler(caminho):
+    """
+    Devolve um gerador de (número da linha, dicionário coluna -> valor) a partir de um CSV ou XLSX com cabeçalho.
+    Colunas a mais são ignoradas, exceto id (chave das linhas sem matrícula); lança ValueError se faltar
+    alguma obrigatória (matricula só é obrigatória sem a coluna id).
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == ".csv":
+        linhas = _linhas_csv(caminho)
+    elif extensao == ".xlsx":
+        linhas = _linhas_xlsx(caminho)
+    else:
+        raise ValueError(f"Formato não suportado: {extensao or caminho} (usar .csv ou .xlsx)")
+
+    cabecalho = [str(nome or "").strip().lower() for nome in next(linhas, [])]
+    em_falta = [coluna for coluna in COLUNAS if coluna not in cabecalho and (coluna != "matricula" or "id" not in cabecalho)]
+    if em_falta:
+        raise ValueError(f"Colunas em falta: {', '.join(em_falta)}")
+    posicoes = [(coluna, cabecalho.index(coluna)) for coluna in (*COLUNAS, "id") if coluna in cabecalho]
+
+    def registos():
+        for numero, linha in enumerate(linhas, start=2):
+            if not any(valor not in (None, "") for valor in linha):
+                continue #linhas vazias (frequentes no fim das folhas de cálculo)
+            yield numero, {coluna: (linha[i] if i < len(linha) else None) for coluna, i in posicoes}
+
+    return registos()
+
+
+def _data(valor):
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return date.fromisoformat(str(valor).strip()[:10]).isoformat()
+
+
+def _id(valor):
+    if valor is None or str(valor).strip() == "":
+        return None
+    try:
+        numero = float(str(valor).strip())
+    except ValueError:
+        raise ValueError(f"id inválido: {valor!r}") from None
+    if not numero.is_integer() or numero < 1:
+        raise ValueError(f"id inválido: {valor!r}")
+    return int(numero)
+
+
+def validar(registo):
+    """
+    Converte um registo lido para (tuplo de COLUNAS, id ou None); a matrícula fica None se vier vazia.
+    Lança ValueError com o motivo se for inválido (ex.: sem matrícula nem id).
+    """
+    valores = {}
+    for coluna in TEXTO:
+        texto = str(registo[coluna] if registo[coluna] is not None else "").strip()
+        if not texto:
+            raise ValueError(f"{coluna} vazio")
+        valores[coluna] = texto
+    try:
+        valores["capacidade"] = int(float(str(registo["capacidade"]).strip()))
+    except (ValueError, OverflowError):
+        raise ValueError(f"capacidade inválida: {registo['capacidade']!r}") from None
+    if valores["capacidade"] < 1:
+        raise ValueError("capacidade tem de ser pelo menos 1")
+    try:
+        valores["valor_diaria"] = float(str(registo["valor_diaria"]).strip().replace(",", "."))
+    except ValueError:
+        raise ValueError(f"valor_diaria inválido: {registo['valor_diaria']!r}") from None
+    if not valores["valor_diaria"] > 0:
+        raise ValueError("valor_diaria tem de ser positivo")
+    for coluna in DATAS:
+        try:
+            valores[coluna] = _data(registo[coluna])
+        except ValueError:
+            raise ValueError(f"{coluna} não é uma data (AAAA-MM-DD): {registo[coluna]!r}") from None
+    matricula = "".join(str(registo.get("matricula") or "").split()).upper()
+    veiculo_id = _id(registo.get("id"))
+    if not matricula and veiculo_id is None:
+        raise ValueError("matricula vazia (e sem id)")
+    valores["matricula"] = matricula or None
+    return tuple(valores[coluna] for coluna in COLUNAS), veiculo_id
+
+
+def _retirar_estruturas(conn):
+    """Apaga os triggers e os índices secundários de veiculos (menos o da matrícula) e devolve o SQL para os recriar."""
+    estruturas = conn.execute('''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name = 'veiculos' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+          AND name != 'idx_veiculos_matricula'
+    ''').fetchall()
+    for tipo, nome, _ in estruturas:
+        conn.execute(f'DROP {tipo.upper()} "{nome}"')
+    return [sql for _, _, sql in estruturas]
+
+
+def importar(conn, caminho, pasta_static=None, tamanho_bloco=TAMANHO_BLOCO,
+             linhas_por_transacao=LINHAS_POR_TRANSACAO, em_massa=None, progresso=None):
+    """
+    Importa a frota de `caminho` (CSV/XLSX) para veiculos com upsert pela matrícula (ou pelo id, ver o topo).
+    em_massa=None decide sozinho (ver FRACAO_MODO_EM_MASSA); True/False força o modo.
+    Com pasta_static gera também as miniaturas das imagens. progresso(linhas_gravadas) é chamado por transação.
+    Devolve um dicionário com lidas, inseridas, atualizadas, inalteradas, invalidas, erros, segundos e linhas_por_segundo.
+    """
+    inicio = time.perf_counter()
+    registos = ler(caminho)
+    criar_indices(conn)
+    maior_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM veiculos").fetchone()[0]
+    existentes = conn.execute("SELECT COUNT(*) FROM veiculos").fetchone()[0]
+    #só vale a pena procurar pelo id as matrículas a atribuir se houver veículos sem matrícula
+    sem_matricula = conn.execute("SELECT 1 FROM veiculos WHERE matricula IS NULL LIMIT 1").fetchone() is not None
+
+    relatorio = {"lidas": 0, "invalidas": 0, "erros": []}
+    imagens = set()
+    validas = 0
+    alteradas = 0
+    recriar = None        #SQL dos triggers/índices retirados no modo em massa
+
+    def invalida(numero, motivo):
+        relatorio["invalidas"] += 1
+        if len(relatorio["erros"]) < MAX_ERROS_RELATORIO:
+            relatorio["erros"].append({"linha": numero, "erro": motivo})
+
+    def proxima_transacao():
+        #linhas válidas da transação seguinte (no máximo linhas_por_transacao): (número, valores, id)
+        lote = []
+        for numero, registo in registos:
+            relatorio["lidas"] += 1
+            try:
+                lote.append((numero, *validar(registo)))
+            except ValueError as erro:
+                invalida(numero, str(erro))
+                continue
+            if len(lote) >= linhas_por_transacao:
+                break
+        return lote
+
+    def gravar(bloco):
+        #devolve (linhas alteradas, linhas gravadas); rowcount não conta as escritas feitas pelos triggers
+        alteradas = 0
+        if sem_matricula:
+            alteradas += conn.executemany(SQL_ATRIBUIR_MATRICULA, [
+                (*valores, veiculo_id, valores[-1]) for _, valores, veiculo_id in bloco
+                if valores[-1] is not None and veiculo_id is not None
+            ]).rowcount
+        alteradas += conn.executemany(SQL_UPSERT, [valores for _, valores, _ in bloco if valores[-1] is not None]).rowcount
+        so_id = [(numero, valores, veiculo_id) for numero, valores, veiculo_id in bloco if valores[-1] is None]
+        if so_id:
+            encontrados = {linha[0] for linha in conn.execute(
+                f"SELECT id FROM veiculos WHERE id IN ({', '.join('?' * len(so_id))})",
+                [veiculo_id for _, _, veiculo_id in so_id],
+            )}
+            for numero, _, veiculo_id in so_id:
+                if veiculo_id not in encontrados:
+                    invalida(numero, f"matricula vazia e não existe nenhum veículo com id {veiculo_id}")
+            alteradas += conn.executemany(SQL_ATUALIZAR_POR_ID, [
+                (*valores[:-1], veiculo_id, *valores[:-1]) for _, valores, veiculo_id in so_id if veiculo_id in encontrados
+            ]).rowcount
+            return alteradas, len(bloco) - len(so_id) + len(encontrados)
+        return alteradas, len(bloco)
+
+    try:
+        lote = proxima_transacao()
+        if em_massa is None:
+            #um ficheiro que cabe numa transação é barato com os triggers; um maior compensa recriar no fim
+            em_massa = len(lote) >= linhas_por_transacao and len(lote) >= existentes * FRACAO_MODO_EM_MASSA
+        if em_massa and lote:
+            with transacao_imediata(conn):
+                estruturas = _retirar_estruturas(conn)
+                conn.execute("UPDATE facetas_estado SET sujo = 1")
+            recriar = estruturas
+        while lote:
+            with transacao_imediata(conn):
+                for i in range(0, len(lote), tamanho_bloco):
+                    alteradas_bloco, gravadas = gravar(lote[i:i + tamanho_bloco])
+                    alteradas += alteradas_bloco
+                    validas += gravadas
+            imagens.update(valores[COLUNAS.index("imagem")] for _, valores, _ in lote)
+            if progresso:
+                progresso(validas)
+            lote = proxima_transacao()
+    finally:
+        if recriar is not None:
+            #índices, triggers (FTS e facetas) e o índice FTS de uma só vez, mesmo que a importação tenha falhado
+            with transacao_imediata(conn):
+                for sql in recriar:
+                    conn.execute(sql)
+            pesquisa.reconstruir(conn)
+        if alteradas:
+            frota.invalidar()
+
+    inseridas = conn.execute("SELECT COUNT(*) FROM veiculos WHERE id > ?", (maior_id,)).fetchone()[0]
+    if pasta_static and imagens:
+        miniaturas.gerar(pasta_static, imagens)
+
+    segundos = time.perf_counter() - inicio
+    relatorio.update(
+        inseridas=inseridas,
+        atualizadas=alteradas - inseridas,
+        inalteradas=validas - alteradas,
+        em_massa=recriar is not None,
+        segundos=round(segundos, 3),
+        linhas_por_segundo=round(relatorio["lidas"] / segundos) if segundos else 0,
+    )
+    return relatorio
+
+
+def main():
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Importação em massa da frota a partir de CSV/XLSX.")
+    parser.add_argument("ficheiro")
+    parser.add_argument("--bd", default=os.environ.get("BD_CAMINHO", os.path.join(pasta, "database", "banco_de_dados.db")))
+    parser.add_argument("--static", default=os.path.join(pasta, "static"), help="pasta static (miniaturas)")
+    parser.add_argument("--cache", default=os.environ.get("CACHE_CAMINHO", os.path.join(pasta, "database", "cache.db")),
+                        help="cache partilhada da aplicação, para invalidar o catálogo")
+    parser.add_argument("--sem-miniaturas", action="store_true")
+    parser.add_argument("--em-massa", choices=("auto", "sim", "nao"), default="auto")
+    args = parser.parse_args()
+
+    cache.configurar(cache.CacheSQLite(args.cache))
+    #os workers da aplicação veem a invalidação (catálogo e cache de veículos) através da cache partilhada
+    frota.ao_alterar(lambda *_: cache.invalidar("catalogo"))
+
+    conn = nova_conexao(args.bd)
+    try:
+        relatorio = importar(
+            conn, args.ficheiro,
+            pasta_static=None if args.sem_miniaturas else args.static,
+            em_massa={"auto": None, "sim": True, "nao": False}[args.em_massa],
+            progresso=lambda n: print(f"{n} linhas gravadas..."),
+        )
+    finally:
+        conn.close()
+
+    for erro in relatorio["erros"]:
+        print(f"Linha {erro['linha']}: {erro['erro']}")
+    print(f"Lidas: {relatorio['lidas']}  inseridas: {relatorio['inseridas']}  atualizadas: {relatorio['atualizadas']}  "
+          f"inalteradas: {relatorio['inalteradas']}  inválidas: {relatorio['invalidas']}")
+    print(f"{relatorio['segundos']} s ({relatorio['linhas_por_segundo']} linhas/s)"
+          + (" em modo em massa" if relatorio["em_massa"] else ""))
+
+
+if __name__ == "__main__":
+    main()
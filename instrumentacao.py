@@ -0,0 +1,317 @@
+import cProfile
+import hmac
+import ipaddress
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, abort, before_render_template, g, has_request_context, request, template_rendered
+
+"""
+instrumentacao.py
+
+Medição de tempos por pedido, para saber onde vai o tempo de /dashboard ou /carros (SQLite, matplotlib, Jinja):
+- Cada pedido é cronometrado (before/after_request) por endpoint, método e código de resposta.
+- As conexões do pool são ConexaoMedida: cada consulta regista a latência (execute + leitura das linhas)
+  e o número de linhas, agrupada por operação e tabela principal (ex.: SELECT veiculos).
+- span("nome") mede um bloco de código; render_template é medido automaticamente através dos sinais do Flask.
+- Cada resposta leva o cabeçalho Server-Timing (total, sql e spans), visível nas ferramentas do browser.
+- GET /metrics devolve tudo no formato de texto do Prometheus. Com METRICAS_TOKEN exige
+  "Authorization: Bearer <token>"; sem token só responde a pedidos locais.
+- Perfil opcional: com PERFIL_PEDIDOS=1, um pedido com ?_perfil=1 (ou cabeçalho X-Perfil: 1) corre com cProfile
+  e o resultado fica em PERFIL_PASTA/<hora>-<endpoint>-<pid>-<n>.prof (abrir com pstats ou snakeviz).
+- Os valores são por processo: com vários workers cada um expõe os seus.
+"""
+
+BALDES_PEDIDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BALDES_SQL = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+_sequencia_perfis = itertools.count(1)      #dois perfis no mesmo segundo não se sobrepõem
+_TABELA = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|INDEX\s+\w+\s+ON)\s+((?:\w+\.)?\w+)", re.IGNORECASE)
+
+
+class Contador:
+    def __init__(self, nome, ajuda, etiquetas=()):
+        self.nome, self.ajuda, self.etiquetas = nome, ajuda, etiquetas
+        self._valores = {}
+        self._trinco = threading.Lock()
+
+    def somar(self, valor=1, *etiquetas):
+        with self._trinco:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + valor
+
+    def linhas(self):
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} counter"
+        with self._trinco:
+            valores = sorted(self._valores.items())
+        for etiquetas, valor in valores:
+            yield f"{self.nome}{_etiquetas(self.etiquetas, etiquetas)} {valor}"
+
+
+class Histograma:
+    def __init__(self, nome, ajuda, etiquetas=(), baldes=BALDES_PEDIDOS):
+        self.nome, self.ajuda, self.etiquetas, self.baldes = nome, ajuda, etiquetas, baldes
+        self._series = {}   #etiquetas -> [contagens por balde..., +Inf], soma
+        self._trinco = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        with self._trinco:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * (len(self.baldes) + 1), 0.0]
+            serie[0][bisect_left(self.baldes, valor)] += 1
+            serie[1] += valor
+
+    def linhas(self):
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} histogram"
+        with self._trinco:
+            series = sorted((etiquetas, list(contagens), soma) for etiquetas, (contagens, soma) in self._series.items())
+        for etiquetas, contagens, soma in series:
+            acumulado = 0
+            for limite, contagem in zip((*self.baldes, "+Inf"), contagens):
+                acumulado += contagem
+                yield f"{self.nome}_bucket{_etiquetas((*self.etiquetas, 'le'), (*etiquetas, limite))} {acumulado}"
+            yield f"{self.nome}_sum{_etiquetas(self.etiquetas, etiquetas)} {soma}"
+            yield f"{self.nome}_count{_etiquetas(self.etiquetas, etiquetas)} {acumulado}"
+
+
+def _etiquetas(nomes, valores):
+    if not nomes:
+        return ""
+    pares = (f'{nome}="{str(valor).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+             for nome, valor in zip(nomes, valores))
+    return "{" + ",".join(pares) + "}"
+
+
+pedidos_segundos = Histograma("pedidos_http_segundos", "Duração dos pedidos HTTP.", ("endpoint", "metodo", "estado"))
+sql_segundos = Histograma("sql_consultas_segundos", "Duração das consultas SQLite (execute e leitura das linhas).",
+                          ("operacao", "tabela"), BALDES_SQL)
+sql_linhas = Contador("sql_linhas_total", "Linhas lidas ou alteradas pelas consultas SQLite.", ("operacao", "tabela"))
+spans_segundos = Histograma("spans_segundos", "Duração dos blocos medidos com span().", ("span",))
+REGISTO = [pedidos_segundos, sql_segundos, sql_linhas, spans_segundos]
+
+
+def texto_prometheus():
+    return "\n".join(linha for metrica in REGISTO for linha in metrica.linhas()) + "\n"
+
+
+def _no_pedido():
+    #acumulados do pedido atual para o Server-Timing (None fora de um pedido)
+    if not has_request_context():
+        return None
+    if "instrumentacao" not in g:
+        g.instrumentacao = {"sql": 0.0, "consultas": 0, "spans": {}}
+    return g.instrumentacao
+
+
+@contextmanager
+def span(nome):
+    """Mede o bloco (ex.: with span("graficos"): ...) e soma-o ao pedido atual."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        spans_segundos.observar(duracao, nome)
+        acumulados = _no_pedido()
+        if acumulados is not None:
+            acumulados["spans"][nome] = acumulados["spans"].get(nome, 0.0) + duracao
+
+
+def classificar(sql):
+    #(operação, tabela principal) com poucas combinações possíveis, para servir de etiquetas
+    palavras = sql.lstrip(" \n\t(").split(None, 1)
+    operacao = palavras[0].upper() if palavras else "?"
+    if operacao == "WITH":
+        operacao = "SELECT"
+    encontrada = _TABELA.search(sql)
+    #sem o nome da base ligada (ex.: arquivo_2023.reservas -> reservas)
+    return operacao, (encontrada.group(1).rsplit(".", 1)[-1].lower() if encontrada else "-")
+
+
+class CursorMedido(sqlite3.Cursor):
+    """
+    Cursor que mede cada consulta: execute mais as leituras que se seguem (no SQLite o trabalho é feito
+    à medida que as linhas são pedidas). A observação é registada quando as linhas acabam, quando o cursor
+    é reutilizado ou fechado, ou quando é libertado (ex.: conn.execute(...).fetchone()).
+    """
+
+    _consulta = None
+    _duracao = 0.0
+    _linhas = 0
+
+    def _somar(self, inicio, linhas=0):
+        self._duracao += time.perf_counter() - inicio
+        self._linhas += linhas
+
+    def _concluir(self):
+        if self._consulta is not None:
+            sql_segundos.observar(self._duracao, *self._consulta)
+            if self._linhas:
+                sql_linhas.somar(self._linhas, *self._consulta)
+            acumulados = _no_pedido()
+            if acumulados is not None:
+                acumulados["sql"] += self._duracao
+                acumulados["consultas"] += 1
+            self._consulta = None
+
+    def _medir(self, metodo, sql, *argumentos):
+        self._concluir()
+        self._consulta, self._duracao, self._linhas = classificar(sql), 0.0, 0
+        inicio = time.perf_counter()
+        try:
+            return metodo(self, sql, *argumentos)
+        finally:
+            #rowcount: linhas alteradas por INSERT/UPDATE/DELETE (-1 num SELECT)
+            self._somar(inicio, max(self.rowcount, 0))
+            if self.description is None:
+                self._concluir() #não há linhas para ler
+
+    def execute(self, sql, parametros=()):
+        return self._medir(sqlite3.Cursor.execute, sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self._medir(sqlite3.Cursor.executemany, sql, sequencia)
+
+    def executescript(self, script):
+        return self._medir(sqlite3.Cursor.executescript, script)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        linha = super().fetchone()
+        self._somar(inicio, linha is not None)
+        if linha is None:
+            self._concluir()
+        return linha
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        inicio = time.perf_counter()
+        linhas = super().fetchmany(size)
+        self._somar(inicio, len(linhas))
+        if len(linhas) < size:
+            self._concluir()
+        return linhas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        linhas = super().fetchall()
+        self._somar(inicio, len(linhas))
+        self._concluir()
+        return linhas
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        try:
+            linha = super().__next__()
+        except StopIteration:
+            self._somar(inicio)
+            self._concluir()
+            raise
+        self._somar(inicio, 1)
+        return linha
+
+    def close(self):
+        self._concluir()
+        super().close()
+
+    def __del__(self):
+        self._concluir()
+
+
+class ConexaoMedida(sqlite3.Connection):
+    """Conexão cujos cursores (incluindo os de conn.execute) são CursorMedido. Usar com sqlite3.connect(factory=...)."""
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+
+def _autorizado(app):
+    token = app.config.get("METRICAS_TOKEN")
+    if token:
+        enviado = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        return hmac.compare_digest(enviado.encode(), token.encode())
+    try:
+        return ipaddress.ip_address(request.remote_addr or "").is_loopback
+    except ValueError:
+        return False
+
+
+def init_app(app):
+    """
+    Regista o cronómetro dos pedidos, os sinais de render_template, o Server-Timing, o perfil opcional e /metrics.
+    Configuração (app.config / ambiente): METRICAS_TOKEN, PERFIL_PEDIDOS, PERFIL_PASTA.
+    """
+    app.config.setdefault("METRICAS_TOKEN", os.environ.get("METRICAS_TOKEN", ""))
+    app.config.setdefault("PERFIL_PEDIDOS", os.environ.get("PERFIL_PEDIDOS") == "1")
+    app.config.setdefault("PERFIL_PASTA", os.environ.get("PERFIL_PASTA", os.path.join(app.root_path, "perfis")))
+
+    @app.before_request
+    def _iniciar_pedido():
+        g.inicio_pedido = time.perf_counter()
+        if app.config["PERFIL_PEDIDOS"] and (request.args.get("_perfil") == "1" or request.headers.get("X-Perfil") == "1"):
+            g.perfil = cProfile.Profile()
+            g.perfil.enable()
+
+    @app.after_request
+    def _terminar_pedido(resposta):
+        inicio = g.pop("inicio_pedido", None)
+        if inicio is None:
+            return resposta
+        perfil = g.pop("perfil", None)
+        if perfil is not None:
+            perfil.disable()
+            os.makedirs(app.config["PERFIL_PASTA"], exist_ok=True)
+            nome = (f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'sem_endpoint'}-{os.getpid()}"
+                    f"-{next(_sequencia_perfis)}.prof")
+            perfil.dump_stats(os.path.join(app.config["PERFIL_PASTA"], nome))
+            resposta.headers["X-Perfil-Ficheiro"] = nome
+        duracao = time.perf_counter() - inicio
+        pedidos_segundos.observar(duracao, request.endpoint or "sem_endpoint", request.method, resposta.status_code)
+
+        acumulados = g.get("instrumentacao") or {"sql": 0.0, "consultas": 0, "spans": {}}
+        partes = [f"total;dur={duracao * 1000:.1f}",
+                  f'sql;dur={acumulados["sql"] * 1000:.1f};desc="{acumulados["consultas"]} consultas"']
+        partes += [f'span{i};dur={segundos * 1000:.1f};desc="{nome}"'
+                   for i, (nome, segundos) in enumerate(acumulados["spans"].items())]
+        resposta.headers["Server-Timing"] = ", ".join(partes)
+        return resposta
+
+    #render_template não tem um ponto único onde pôr um span: usa os sinais antes/depois do render
+    def _antes_render(remetente, template, context, **_):
+        if has_request_context():
+            g.setdefault("renders", []).append(time.perf_counter())
+
+    def _depois_render(remetente, template, context, **_):
+        renders = g.get("renders") if has_request_context() else None
+        if renders:
+            duracao = time.perf_counter() - renders.pop()
+            nome = f"render_template:{template.name}"
+            spans_segundos.observar(duracao, nome)
+            acumulados = _no_pedido()
+            acumulados["spans"][nome] = acumulados["spans"].get(nome, 0.0) + duracao
+
+    before_render_template.connect(_antes_render, app, weak=False)
+    template_rendered.connect(_depois_render, app, weak=False)
+
+    @app.route("/metrics")
+    def metricas():
+        if not _autorizado(app):
+            abort(403)
+        return Response(texto_prometheus(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,81 @@
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+import agregados
+import cache
+
+"""
+metricas_dashboard.py
+
+Indicadores do /dashboard lidos das tabelas pré-agregadas (agregados.py) e de contagens simples,
+em vez de carregar tabelas inteiras para DataFrames, guardados na cache partilhada pelos workers (cache.py):
+- A cache é invalidada sempre que há escritas em reservas (ver reservas.ao_alterar) ou novos clientes.
+- Com a cache "quente", obter() não toca na base de dados.
+- A chave inclui o mês, e as entradas expiram ao fim de TTL_SEGUNDOS (escritas que não passam pela aplicação).
+"""
+
+TTL_SEGUNDOS = 60
+MESES_GRAFICOS = 12
+
+
+def meses_ate(hoje, n=MESES_GRAFICOS):
+    #lista "YYYY-MM" dos últimos n meses, do mais antigo ao atual
+    primeiro = hoje.replace(day=1) - relativedelta(months=n - 1)
+    return [(primeiro + relativedelta(months=i)).strftime("%Y-%m") for i in range(n)]
+
+
+def calcular_indicadores(conn, hoje=None):
+    """
+    Calcula todos os indicadores do dashboard (contagens simples e leituras das tabelas pré-agregadas).
+    As séries mensais vêm sempre com os 12 meses, com 0 nos meses sem reservas.
+    """
+    hoje = hoje or date.today()
+    meses = meses_ate(hoje)
+
+    total_clientes = conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0]
+    total_veiculos = conn.execute("SELECT COUNT(*) FROM veiculos").fetchone()[0]
+    total_reservas_ativas = conn.execute(
+        "SELECT COUNT(*) FROM reservas WHERE status = 'Ativa'"
+    ).fetchone()[0]
+
+    # Reservas e faturação por mês (últimos 12 meses) e faturação do mês atual: no máximo 12 linhas de
+    # reservas_mensal, tabela mantida por triggers (ver agregados.py)
+    por_mes = agregados.por_mes(conn, meses[0], meses[-1])
+    reservas_por_mes = [(m, por_mes.get(m, (0, 0))[0]) for m in meses]
+    faturacao_por_mes = [(m, round(float(por_mes.get(m, (0, 0))[1]), 2)) for m in meses]
+    faturacao_ultimo_mes = por_mes.get(meses[-1], (0, 0))[1]
+
+    # Top 5 clientes por faturação (inclui as reservas já arquivadas), pelo índice de faturacao_clientes
+    top5_clientes = [
+        (posicao, nome or f"Cliente {cliente_id}", round(total, 2))
+        for posicao, (cliente_id, nome, total) in enumerate(agregados.top_clientes(conn, 5), start=1)
+    ]
+
+    return {
+        "total_clientes": total_clientes,
+        "total_veiculos": total_veiculos,
+        "total_reservas_ativas": total_reservas_ativas,
+        "faturacao_ultimo_mes": round(float(faturacao_ultimo_mes), 2),
+        "reservas_por_mes": reservas_por_mes,
+        "faturacao_por_mes": faturacao_por_mes,
+        "top5_clientes": top5_clientes,
+    }
+
+
+ESPACO_CACHE = "dashboard"
+
+
+def obter(conn, hoje=None):
+    """
+    Indicadores do mês de `hoje`, da cache partilhada (ver cache.py) ou calculados e guardados.
+    Com a cache "quente", não toca na base de dados, em nenhum dos workers.
+    """
+    hoje = hoje or date.today()
+    return cache.obter_ou_calcular(ESPACO_CACHE, f"indicadores:{hoje:%Y-%m}",
+                                   lambda: calcular_indicadores(conn, hoje), ttl=TTL_SEGUNDOS)
+
+
+def invalidar(*_):
+    #aceita os argumentos de reservas.ao_alterar (evento, reserva_id) para poder ser registado diretamente
+    cache.invalidar(ESPACO_CACHE)
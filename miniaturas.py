@@ -0,0 +1,212 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from PIL import Image, features
+
+try:
+    import fcntl
+except ImportError:     #Windows: só o servidor de desenvolvimento, com um processo
+    fcntl = None
+
+"""
+miniaturas.py
+
+Miniaturas das imagens dos veículos para o catálogo:
+- Cada imagem original (ex.: static/yaris.jpg) dá origem a várias larguras (LARGURAS, sem ampliar)
+  em AVIF (se o Pillow o suportar), WebP e JPEG.
+- O nome de cada ficheiro inclui o hash do conteúdo original (ex.: yaris-320-3f9a1c0b7e2d4a56.webp), por isso
+  o URL nunca aponta para conteúdo diferente e pode ser servido com cache imutável (PASTAS_IMUTAVEIS).
+- O manifesto (static/img/miniaturas.json) diz, para cada imagem original, que variantes existem; os templates
+  usam-no para escrever srcset. É partilhado por todos os processos e relido quando muda; as atualizações
+  são feitas com um lock de ficheiro (miniaturas.json.lock), para dois workers não perderem entradas um do outro.
+- Uma imagem que não se consegue abrir (corrompida, formato desconhecido, demasiado grande) fica sem
+  miniaturas e o catálogo mostra o original; as outras são geradas na mesma.
+- Para muitas imagens (importações da frota) o trabalho é repartido por um pool de processos.
+"""
+
+PASTA_RELATIVA = "img/miniaturas"          #relativa a app.static_folder
+MANIFESTO_RELATIVO = "img/miniaturas.json"
+VERSAO = 1                                 #incrementar quando as larguras ou a qualidade mudarem
+LARGURAS = (160, 320, 640)
+QUALIDADE = {"avif": 50, "webp": 80, "jpeg": 82}
+MINIMO_PARA_POOL = 8                       #abaixo disto não compensa arrancar processos
+MAX_PROCESSOS = max(1, min(4, os.cpu_count() or 1))
+
+_trinco = threading.Lock()
+_manifesto = {}
+_manifesto_mtime = None
+
+
+def formatos():
+    #do mais eficiente para o de compatibilidade; o último é sempre o JPEG do <img>
+    return tuple(f for f in ("avif", "webp") if features.check(f)) + ("jpeg",)
+
+
+def _hash_ficheiro(caminho):
+    h = hashlib.sha256(f"v{VERSAO}".encode())
+    with open(caminho, "rb") as ficheiro:
+        for bloco in iter(lambda: ficheiro.read(65536), b""):
+            h.update(bloco)
+    return h.hexdigest()[:16]
+
+
+def _gravar_atomico(pasta, nome, escrever):
+    descritor, temporario = tempfile.mkstemp(dir=pasta, prefix=".", suffix=os.path.splitext(nome)[1])
+    try:
+        with os.fdopen(descritor, "wb") as destino:
+            escrever(destino)
+        os.replace(temporario, os.path.join(pasta, nome))
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+
+def _gerar_uma(static_folder, imagem):
+    """
+    Gera todas as variantes de uma imagem (corre nos processos do pool). Ficheiros que já existem
+    com o mesmo hash não são refeitos. Devolve (imagem, entrada do manifesto), (imagem, None) se faltar
+    o original, ou (imagem, {}) se não se conseguir ler a imagem.
+    """
+    origem = os.path.join(static_folder, imagem)
+    if not os.path.isfile(origem):
+        return imagem, None
+    try:
+        return imagem, _variantes_de(static_folder, imagem, origem)
+    except (OSError, Image.DecompressionBombError) as erro:
+        print(f"Miniaturas de {imagem} não geradas (fica a imagem original): {erro}")
+        return imagem, {}
+
+
+def _variantes_de(static_folder, imagem, origem):
+    #entrada do manifesto de uma imagem; os erros de leitura ficam para _gerar_uma
+    pasta = os.path.join(static_folder, PASTA_RELATIVA)
+    os.makedirs(pasta, exist_ok=True)
+    hash_origem = _hash_ficheiro(origem)
+    base = os.path.splitext(os.path.basename(imagem))[0]
+
+    with Image.open(origem) as original:
+        original = original.convert("RGB")
+        largura_original, altura_original = original.size
+        larguras = sorted({min(largura, largura_original) for largura in LARGURAS})
+        variantes = {formato: [] for formato in formatos()}
+        for largura in larguras:
+            altura = round(altura_original * largura / largura_original)
+            reduzida = original if largura == largura_original else original.resize((largura, altura), Image.LANCZOS)
+            for formato in variantes:
+                nome = f"{base}-{largura}-{hash_origem}.{'jpg' if formato == 'jpeg' else formato}"
+                if not os.path.exists(os.path.join(pasta, nome)):
+                    opcoes = {"quality": QUALIDADE[formato]}
+                    if formato == "jpeg":
+                        opcoes.update(optimize=True, progressive=True)
+                    _gravar_atomico(pasta, nome, lambda destino: reduzida.save(destino, formato.upper(), **opcoes))
+                variantes[formato].append([largura, f"{PASTA_RELATIVA}/{nome}"])
+
+    return {"hash": hash_origem, "largura": largura_original, "altura": altura_original, "variantes": variantes}
+
+
+def _caminho_manifesto(static_folder):
+    return os.path.join(static_folder, MANIFESTO_RELATIVO)
+
+
+def _ler_manifesto(static_folder):
+    try:
+        with open(_caminho_manifesto(static_folder), encoding="utf-8") as ficheiro:
+            return json.load(ficheiro)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+@contextmanager
+def _manifesto_exclusivo(static_folder):
+    #uma atualização do manifesto de cada vez: threads deste processo (_trinco) e outros processos (flock)
+    with _trinco:
+        if fcntl is None:
+            yield
+            return
+        pasta = os.path.dirname(_caminho_manifesto(static_folder))
+        os.makedirs(pasta, exist_ok=True)
+        with open(_caminho_manifesto(static_folder) + ".lock", "a") as trinco:
+            fcntl.flock(trinco, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(trinco, fcntl.LOCK_UN)
+
+
+def _remover_antigas(static_folder, imagem, antiga, nova):
+    #ficheiros da versão anterior desta imagem que a nova já não usa
+    usados = {caminho for lista in nova["variantes"].values() for _, caminho in lista}
+    for lista in antiga.get("variantes", {}).values():
+        for _, caminho in lista:
+            if caminho not in usados:
+                try:
+                    os.remove(os.path.join(static_folder, caminho))
+                except FileNotFoundError:
+                    pass
+
+
+def gerar(static_folder, imagens, processos=None):
+    """
+    Gera as miniaturas das imagens indicadas (nomes relativos à pasta static, como em veiculos.imagem)
+    e atualiza o manifesto. Com MINIMO_PARA_POOL ou mais imagens usa um pool de processos.
+    Devolve o número de imagens processadas.
+    """
+    imagens = sorted(set(imagens))
+    if not imagens:
+        return 0
+    if len(imagens) >= MINIMO_PARA_POOL:
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processos or MAX_PROCESSOS, mp_context=contexto) as executor:
+            resultados = list(executor.map(_gerar_uma, [static_folder] * len(imagens), imagens))
+    else:
+        resultados = [_gerar_uma(static_folder, imagem) for imagem in imagens]
+
+    with _manifesto_exclusivo(static_folder):
+        #relido já com o lock: pode ter mudado noutro processo enquanto as miniaturas eram geradas
+        manifesto = _ler_manifesto(static_folder)
+        for imagem, entrada in resultados:
+            if entrada is None:
+                continue
+            if not entrada:
+                #imagem ilegível: sem entrada, os templates mostram o original
+                if imagem in manifesto:
+                    _remover_antigas(static_folder, imagem, manifesto.pop(imagem), {"variantes": {}})
+                continue
+            if imagem in manifesto and manifesto[imagem]["hash"] != entrada["hash"]:
+                _remover_antigas(static_folder, imagem, manifesto[imagem], entrada)
+            manifesto[imagem] = entrada
+        os.makedirs(os.path.dirname(_caminho_manifesto(static_folder)), exist_ok=True)
+        _gravar_atomico(os.path.dirname(_caminho_manifesto(static_folder)), os.path.basename(MANIFESTO_RELATIVO),
+                        lambda destino: destino.write(json.dumps(manifesto, indent=1, sort_keys=True).encode("utf-8")))
+    return sum(1 for _, entrada in resultados if entrada)
+
+
+def garantir(static_folder, conn):
+    #gera as miniaturas das imagens de veiculos que ainda não estão no manifesto (ex.: bases já existentes)
+    manifesto = _ler_manifesto(static_folder)
+    em_falta = [linha[0] for linha in conn.execute("SELECT DISTINCT imagem FROM veiculos") if linha[0] not in manifesto]
+    return gerar(static_folder, em_falta)
+
+
+def variantes(static_folder, imagem):
+    """
+    Variantes de uma imagem para os templates: {formato: [[largura, caminho], ...]}, ou {} se ainda não houver.
+    O manifesto fica em memória e só é relido quando o ficheiro muda.
+    """
+    global _manifesto, _manifesto_mtime
+    try:
+        mtime = os.stat(_caminho_manifesto(static_folder)).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if mtime != _manifesto_mtime:
+        with _trinco:
+            _manifesto = _ler_manifesto(static_folder)
+            _manifesto_mtime = mtime
+    entrada = _manifesto.get(imagem)
+    return entrada["variantes"] if entrada else {}
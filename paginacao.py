@@ -0,0 +1,86 @@
+import base64
+import json
+from typing import NamedTuple
+
+"""
+paginacao.py
+
+Paginação por keyset (seek) em vez de OFFSET:
+- Cada página é pedida a partir da chave de ordenação da última (ou primeira) linha da página anterior,
+  por isso o custo de uma página não depende de quantas linhas vêm antes dela.
+- Os cursores são opacos (JSON em base64 url-safe) e estáveis: inserções noutras posições não fazem
+  saltar nem repetir linhas.
+- A comparação usa row values do SQLite: (data_inicio, id) < (?, ?).
+"""
+
+TAMANHO_PAGINA = 12
+TAMANHO_MAXIMO = 100
+
+
+class Pagina(NamedTuple):
+    linhas: list
+    cursor_seguinte: str | None
+    cursor_anterior: str | None
+
+
+def codificar_cursor(valores):
+    texto = json.dumps(list(valores), separators=(",", ":"))
+    return base64.urlsafe_b64encode(texto.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def descodificar_cursor(cursor, n_colunas):
+    """Lança ValueError se o cursor estiver mal formado."""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        valores = json.loads(texto)
+    except (ValueError, UnicodeDecodeError) as erro:
+        raise ValueError("Cursor de paginação inválido.") from erro
+    if not isinstance(valores, list) or len(valores) != n_colunas:
+        raise ValueError("Cursor de paginação inválido.")
+    return valores
+
+
+def tamanho_pedido(valor, omissao=TAMANHO_PAGINA):
+    #valor vindo da query string (?por_pagina=), limitado a [1, TAMANHO_MAXIMO]
+    try:
+        return max(1, min(TAMANHO_MAXIMO, int(valor)))
+    except (TypeError, ValueError):
+        return omissao
+
+
+def paginar(conn, sql, parametros, ordem, chaves, descendente=False, apos=None, antes=None, tamanho=TAMANHO_PAGINA):
+    """
+    Executa `sql` (um SELECT que já tem WHERE) devolvendo só uma página.
+    - ordem: expressões SQL da ordenação (ex.: ["r.data_inicio", "r.id"]); a última deve ser única.
+    - chaves: nomes das colunas do resultado com esses valores (ex.: ["data_inicio", "id"]).
+    - apos/antes: cursor da página seguinte/anterior (no máximo um dos dois).
+    """
+    colunas = "(" + ", ".join(ordem) + ")"
+    marcadores = "(" + ", ".join("?" * len(ordem)) + ")"
+    recuar = antes is not None
+    cursor = antes if recuar else apos
+
+    #recuar = percorrer na ordem inversa a partir do cursor e depois inverter o resultado
+    decrescente = descendente != recuar
+    sentido = "DESC" if decrescente else "ASC"
+    parametros = list(parametros)
+    if cursor is not None:
+        sql += f" AND {colunas} {'<' if decrescente else '>'} {marcadores}"
+        parametros.extend(descodificar_cursor(cursor, len(ordem)))
+    sql += " ORDER BY " + ", ".join(f"{expressao} {sentido}" for expressao in ordem) + " LIMIT ?"
+    parametros.append(tamanho + 1)
+
+    linhas = conn.execute(sql, parametros).fetchall()
+    ha_mais = len(linhas) > tamanho
+    linhas = linhas[:tamanho]
+    if recuar:
+        linhas.reverse()
+    if not linhas:
+        return Pagina([], None, None)
+
+    def chave(linha):
+        return codificar_cursor(linha[nome] for nome in chaves)
+
+    if recuar:
+        return Pagina(linhas, chave(linhas[-1]), chave(linhas[0]) if ha_mais else None)
+    return Pagina(linhas, chave(linhas[-1]) if ha_mais else None, chave(linhas[0]) if apos is not None else None)
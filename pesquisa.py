@@ -0,0 +1,93 @@
+import math
+import re
+
+"""
+pesquisa.py
+
+Índice de pesquisa de texto (FTS5) sobre os veículos:
+- Tabela virtual veiculos_fts com marca, modelo, categoria, tipo e transmissão, de conteúdo externo
+  (os dados ficam só em veiculos; o índice guarda apenas os termos).
+- Mantida sincronizada por triggers em INSERT/UPDATE/DELETE de veiculos.
+- Tokenizer unicode61 com remove_diacritics: "medio" encontra "Médio", sem distinção de maiúsculas.
+- Cada termo pesquisado é tratado como prefixo ("autom" encontra "Automática"); os termos combinam-se com AND.
+- Um número pesquisado procura no texto ("Fiat 500") ou o preço/dia igual; intervalos de preço usam valor_diaria.
+"""
+
+ESQUEMA = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS veiculos_fts USING fts5(
+        marca, modelo, categoria, tipo, transmissao,
+        content='veiculos',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS veiculos_fts_inserir AFTER INSERT ON veiculos BEGIN
+        INSERT INTO veiculos_fts (rowid, marca, modelo, categoria, tipo, transmissao)
+        VALUES (new.id, new.marca, new.modelo, new.categoria, new.tipo, new.transmissao);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS veiculos_fts_apagar AFTER DELETE ON veiculos BEGIN
+        INSERT INTO veiculos_fts (veiculos_fts, rowid, marca, modelo, categoria, tipo, transmissao)
+        VALUES ('delete', old.id, old.marca, old.modelo, old.categoria, old.tipo, old.transmissao);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS veiculos_fts_atualizar
+    AFTER UPDATE OF marca, modelo, categoria, tipo, transmissao ON veiculos BEGIN
+        INSERT INTO veiculos_fts (veiculos_fts, rowid, marca, modelo, categoria, tipo, transmissao)
+        VALUES ('delete', old.id, old.marca, old.modelo, old.categoria, old.tipo, old.transmissao);
+        INSERT INTO veiculos_fts (rowid, marca, modelo, categoria, tipo, transmissao)
+        VALUES (new.id, new.marca, new.modelo, new.categoria, new.tipo, new.transmissao);
+    END;
+
+    CREATE INDEX IF NOT EXISTS idx_veiculos_valor_diaria ON veiculos (valor_diaria);
+'''
+
+#Fragmento para usar num WHERE sobre "veiculos v"
+SQL_CORRESPONDE = "v.id IN (SELECT rowid FROM veiculos_fts WHERE veiculos_fts MATCH ?)"
+
+_TERMO = re.compile(r"\w+", re.UNICODE)
+
+
+def criar_indice(conn):
+    """
+    Cria o índice FTS e os triggers. Se o índice ainda não existia (ou faltavam os triggers),
+    indexa os veículos já gravados.
+    """
+    existia = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'veiculos_fts'"
+    ).fetchone()
+    #sem os triggers (importação em massa interrompida) o índice pode ter ficado atrás da tabela
+    com_triggers = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'veiculos_fts_inserir'"
+    ).fetchone()
+    conn.executescript(ESQUEMA)
+    if not existia or not com_triggers:
+        reconstruir(conn)
+
+
+def reconstruir(conn):
+    #volta a gerar o índice a partir da tabela veiculos (ex.: depois de importações em massa)
+    conn.execute("INSERT INTO veiculos_fts (veiculos_fts) VALUES ('rebuild')")
+    conn.commit()
+
+
+def expressao_fts(texto):
+    """
+    Converte o texto escrito pelo utilizador numa expressão MATCH segura:
+    cada palavra entre aspas (sem operadores FTS) e com * para pesquisa por prefixo.
+    Devolve None se não houver palavras.
+    """
+    termos = _TERMO.findall(texto or "")
+    if not termos:
+        return None
+    return " ".join(f'"{termo}"*' for termo in termos)
+
+
+def valor_numerico(texto):
+    #"45", "45.5" ou "45,5" -> float; None se o texto não for um número
+    try:
+        valor = float((texto or "").strip().replace(",", "."))
+    except ValueError:
+        return None
+    return valor if math.isfinite(valor) else None
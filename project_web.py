@@ -1,13 +1,39 @@
-from flask import Flask, flash, render_template, request, redirect, url_for, session
+from flask import Flask, flash, render_template, request, redirect, url_for, session, jsonify, send_file, abort
+from functools import wraps
+import hmac
+import hashlib
+import json
 import sqlite3
+import tempfile
 from datetime import datetime, timedelta, date
 from dateutil.relativedelta import relativedelta
 import re
-import pandas as pd
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 import os
+import base_dados
+from base_dados import obter_bd, nova_conexao
+import disponibilidade
+import reservas as reservas_bd
+from reservas import ConflitoReserva
+import metricas_dashboard
+import graficos
+import exportacao
+import tarefas_exportacao
+import paginacao
+import pesquisa as pesquisa_fts
+import facetas
+import clientes
+import senhas
+import frota
+import cache
+import ciclo_reservas
+import arquivo
+import agregados
+import miniaturas
+import importacao
+import instrumentacao
+from instrumentacao import span
 
 """
 project_web.py
@@ -21,8 +47,50 @@ Aplicação Flask para gerenciamento de reservas de carros:
 
 #criar base de dados no sqlite (primeiro passo)
 app = Flask(__name__)
-app.secret_key= 'chave_super_secreta_444'   #Usada para criptografar cookies da sessão
-app.config["DEBUG"] = True              #Modo Debug habilitado
+#Configuração por variáveis de ambiente com o prefixo FLASK_ (ex.: FLASK_DEBUG=1, FLASK_SECRET_KEY=..., FLASK_BD_TAMANHO_POOL=16),
+#lidas antes de qualquer init_app; o modo debug fica desligado por omissão
+CHAVE_DESENVOLVIMENTO = 'chave_super_secreta_444'
+app.config["SECRET_KEY"] = CHAVE_DESENVOLVIMENTO    #Usada para criptografar cookies da sessão (só para desenvolvimento)
+app.config.from_prefixed_env()
+
+#Caminho para a base de dados SQLite (a variável de ambiente BD_CAMINHO permite usar outra base, ex.: benchmarks)
+DB_PATH = os.environ.get("BD_CAMINHO", os.path.join(os.path.dirname(__file__), "database", "banco_de_dados.db"))
+
+#pool de conexões: uma conexão por pedido, devolvida automaticamente no fim do pedido
+base_dados.init_app(app, DB_PATH)
+
+#tempos por pedido, SQL e spans: cabeçalho Server-Timing, /metrics (Prometheus) e perfil cProfile opcional
+instrumentacao.init_app(app)
+
+#número de linhas por página em /carros e /minhas_reservas (?por_pagina= pode alterar, até 100)
+app.config["TAMANHO_PAGINA"] = paginacao.TAMANHO_PAGINA
+
+#cache partilhada pelos workers (dashboard e páginas do catálogo): ficheiro SQLite ao lado da base de dados,
+#ou CACHE_BACKEND=memoria para um só processo
+app.config["CACHE_BACKEND"] = os.environ.get("CACHE_BACKEND", "sqlite")
+app.config["CACHE_CAMINHO"] = os.environ.get("CACHE_CAMINHO", os.path.join(os.path.dirname(DB_PATH), "cache.db"))
+cache.init_app(app, app.config["CACHE_CAMINHO"])
+
+#os indicadores do dashboard e as páginas do catálogo ficam em cache até à próxima escrita em reservas
+#(reservar, alterar, cancelar...); a invalidação chega a todos os workers através da cache partilhada
+reservas_bd.ao_alterar(metricas_dashboard.invalidar)
+reservas_bd.ao_alterar(lambda *_: cache.invalidar("catalogo"))
+frota.ao_alterar(lambda *_: cache.invalidar("catalogo"))
+
+#ficheiros estáticos com o hash do conteúdo no nome nunca mudam: o browser pode guardá-los "para sempre"
+PASTAS_IMUTAVEIS = (graficos.PASTA_RELATIVA + "/", miniaturas.PASTA_RELATIVA + "/")
+
+@app.after_request
+def cache_ficheiros_imutaveis(resposta):
+    if request.endpoint == "static" and (request.view_args or {}).get("filename", "").startswith(PASTAS_IMUTAVEIS):
+        resposta.cache_control.no_cache = None #o send_file do Flask marca no-cache por omissão
+        resposta.cache_control.public = True
+        resposta.cache_control.max_age = 365 * 24 * 3600
+        resposta.cache_control.immutable = True
+    return resposta
+
+#variantes (AVIF/WebP/JPEG em várias larguras) de uma imagem de veículo, para o srcset de templates/miniatura.html
+app.add_template_global(lambda imagem: miniaturas.variantes(app.static_folder, imagem), "miniaturas")
 
 #filtro para converter string de data para objeto date
 @app.template_filter('todate')
@@ -36,11 +104,10 @@ def todate_filter(value, format="%Y-%m-%d"):
     except:
         return value
 
-#conectar base de dados ao projeto
+#conectar base de dados ao projeto (fora de pedidos, ex.: criação do esquema e exportações)
+#dentro das rotas usa-se obter_bd(), que reutiliza as conexões do pool
 def conectar_bd():
-    conn = sqlite3.connect("database/banco_de_dados.db")
-    conn.row_factory = sqlite3.Row
-    return conn
+    return nova_conexao(DB_PATH)
 
 #criação das tabelas da base de dados
 def criar_tabelas():
@@ -72,7 +139,8 @@ def criar_tabelas():
             valor_diaria REAL NOT NULL,
             ultima_revisao DATE NOT NULL,
             proxima_revisao DATE NOT NULL,
-            ultima_inspecao DATE NOT NULL
+            ultima_inspecao DATE NOT NULL,
+            matricula TEXT
         );
         
         CREATE TABLE IF NOT EXISTS reservas (
@@ -97,6 +165,15 @@ def criar_tabelas():
             FOREIGN KEY (reserva_id) REFERENCES reservas(id)
         );
     ''')
+    #índices usados nas consultas de disponibilidade e na listagem de reservas
+    disponibilidade.criar_indices(conn)
+    reservas_bd.criar_indices(conn)
+    importacao.criar_indices(conn) #matrícula única (chave das importações da frota)
+    arquivo.criar(conn)
+    agregados.criar_tabelas(conn)
+    #índice de pesquisa de texto (FTS5) sobre os veículos, mantido por triggers
+    pesquisa_fts.criar_indice(conn)
+    facetas.criar_tabelas(conn)
     conn.commit()
     conn.close()
 
@@ -111,20 +188,13 @@ def verificar_usuario(usuario, senha):
 #Returns:
     #dict | None: dados do usuário (id, nome) se válido, ou None caso contrário.
 
-    conn= conectar_bd()
-    cursor=conn.cursor()
-    cursor.execute("SELECT * FROM clientes WHERE usuario = ? AND senha = ?", (usuario,senha))
-    usuario_encontrado= cursor.fetchone()
-    conn.close()
-    return usuario_encontrado
+#A senha é comparada com o hash scrypt guardado (contas antigas em texto simples ganham hash neste login)
+    return clientes.autenticar(obter_bd(), usuario, senha)
 
 #função para registar um novo utilizador
 def registar_usuario(nome, usuario, senha):
-    conn= conectar_bd()
-    cursor= conn.cursor()
-    cursor.execute("INSERT INTO clientes (nome, usuario, senha) VALUES (?, ?, ?)", (nome, usuario, senha))
-    conn.commit()
-    conn.close()
+    clientes.registar(obter_bd(), nome, usuario, senha)
+    metricas_dashboard.invalidar()
 
 #página inicial (login/registo)
 @app.route('/', methods=  ['GET','POST'])
@@ -143,21 +213,23 @@ def home ():
 
             else: 
                 try:
-                    conn =conectar_bd()
-                    cursor = conn.cursor()
-                    cursor.execute("INSERT INTO clientes (nome, usuario, senha) VALUES (?,?,?)", (nome,usuario, senha))
-                    conn.commit()
-                    conn.close()
+                    registar_usuario(nome, usuario, senha) #também invalida o total de clientes do dashboard
                     mensagem= "Registo efetuado com sucesso! Agora podes realizar o login."
                 except sqlite3.IntegrityError:
                     mensagem= "Este nome do usuário ja se encontra registado."
+                except senhas.Ocupado:
+                    return render_template('index.html', mensagem="Serviço ocupado, tente novamente daqui a pouco."), 503
     if 'usuario' in request.form and 'senha' in request.form:
         usuario= request.form['usuario']
         senha= request.form['senha']
 
-        usuario_encontrado= verificar_usuario(usuario,senha)
+        try:
+            usuario_encontrado= verificar_usuario(usuario,senha)
+        except senhas.Ocupado:
+            #demasiados logins em simultâneo: recusa em vez de acumular pedidos à espera do hash
+            return render_template('index.html', mensagem="Serviço ocupado, tente novamente daqui a pouco."), 503
         if usuario_encontrado:
-            session['usuario'] = usuario_encontrado[2] #guarda o nome do usuário na sessão
+            clientes.iniciar_sessao(session, usuario_encontrado) #guarda o id, o nome e o usuário na sessão
             return redirect(url_for('listar_carros')) #Redireciona para a página listar_carros após executar login
             
         else:
@@ -178,46 +250,90 @@ def listar_carros():
     um_ano = (date.today() + relativedelta(years=1)).isoformat()
     
     #conectar á base de dados
-    conn= conectar_bd()
-    cursor = conn.cursor()
+    conn= obter_bd()
+
+    #Recolher os filtros enviados por GET (pesquisa, intervalo de datas e filtros laterais)
+    pesquisa= request.args.get('pesquisa', "").strip()
+    data_inicio = request.args.get('data_inicio', "").strip()
+    data_fim = request.args.get('data_fim', "").strip()
+
+    # Monta a query principal com exclusão de veículos reservados
+    # (comparação ISO direta nas datas para usar o índice (status, veiculo_id, data_fim))
+    if data_inicio or data_fim:
+        #só os veículos sem reservas ativas que intersetem o intervalo pedido
+        try:
+            data_inicio, data_fim = disponibilidade.normalizar_intervalo(data_inicio, data_fim)
+        except ValueError:
+            return "Intervalo de datas inválido.", 400
+        filtro_reservas = disponibilidade.SQL_SEM_SOBREPOSICAO
+        parametros = [data_inicio, data_fim]
+    else:
+        #sem datas: esconde os veículos com qualquer reserva ativa a partir de hoje
+        filtro_reservas = disponibilidade.SQL_SEM_RESERVA_ATIVA
+        parametros = [hoje]
 
-    # Monta a query principal com filtros de inspeção e revisão e exclusão de veículos reservados
-    sql_base = '''
+    sql_base = f'''
     SELECT v.*
     FROM veiculos v
-    WHERE v.id NOT IN (
-        SELECT r.veiculo_id
-        FROM reservas r
-        WHERE date(r.data_fim) >= DATE('now')
-            AND r.status = 'Ativa'
-        )
+    WHERE {filtro_reservas}
     '''
-    parametros = []
-
-
-    #Recolher os filtros enviados por GET (pesquisa e filtros laterais)
-    pesquisa= request.args.get('pesquisa', "").strip()
 
     if pesquisa:
-         # Adiciona filtro de pesquisa por marca, modelo, categoria, tipo e transmissão
-        sql_base += """
-            AND (LOWER(v.marca) LIKE ?
-              OR LOWER(v.modelo) LIKE ?
-              OR LOWER(v.categoria) LIKE ?
-              OR LOWER(v.tipo) LIKE ?
-              OR LOWER(v.transmissao) LIKE ?
-              OR LOWER(v.valor_diaria) LIKE ?)
-        """
-        pesquisa_like = f'%{pesquisa}%'
-        parametros.extend([pesquisa_like, pesquisa_like, pesquisa_like, pesquisa_like, pesquisa_like, pesquisa_like])
-
-    # Executa a query final com placeholders para evitar SQL injection
-    cursor.execute(sql_base, tuple(parametros))
-    carros = cursor.fetchall()
-    conn.close()
+        # Adiciona filtro de pesquisa por marca, modelo, categoria, tipo e transmissão (índice FTS5,
+        # por prefixo e sem acentos: "medio" encontra "Médio")
+        expressao = pesquisa_fts.expressao_fts(pesquisa)
+        preco = pesquisa_fts.valor_numerico(pesquisa)
+        if expressao and preco is not None:
+            #um número pode ser parte do nome ("Fiat 500", "Ninja 400") ou o preço/dia
+            sql_base += f" AND ({pesquisa_fts.SQL_CORRESPONDE} OR v.valor_diaria = ?)"
+            parametros.extend([expressao, preco])
+        elif expressao:
+            sql_base += " AND " + pesquisa_fts.SQL_CORRESPONDE
+            parametros.append(expressao)
+
+    # Intervalo de preço/dia (índice em valor_diaria)
+    preco_min = pesquisa_fts.valor_numerico(request.args.get('preco_min'))
+    preco_max = pesquisa_fts.valor_numerico(request.args.get('preco_max'))
+    if preco_min is not None:
+        sql_base += " AND v.valor_diaria >= ?"
+        parametros.append(preco_min)
+    if preco_max is not None:
+        sql_base += " AND v.valor_diaria <= ?"
+        parametros.append(preco_max)
+
+    # Facetas escolhidas (categoria, tipo, transmissão, capacidade), cada uma com índice próprio
+    escolhidos = facetas.selecionados(request.args)
+    filtro_facetas, parametros_facetas = facetas.filtro_sql(escolhidos)
+    if filtro_facetas:
+        sql_base += " AND " + filtro_facetas
+        parametros.extend(parametros_facetas)
+
+    # Executa a query final com placeholders para evitar SQL injection, só para a página pedida
+    # (keyset por id: ?apos=<cursor> para a página seguinte, ?antes=<cursor> para a anterior)
+    # A página fica na cache partilhada (chave = consulta + parâmetros + cursor) até à próxima escrita em reservas/veículos
+    tamanho = paginacao.tamanho_pedido(request.args.get('por_pagina'), app.config["TAMANHO_PAGINA"])
+    apos, antes = request.args.get('apos'), request.args.get('antes')
+    chave = hashlib.sha1(json.dumps([sql_base, parametros, tamanho, apos, antes]).encode("utf-8")).hexdigest()
+
+    def calcular_pagina():
+        pagina = paginacao.paginar(conn, sql_base, parametros, ["v.id"], ["id"], apos=apos, antes=antes, tamanho=tamanho)
+        return pagina._replace(linhas=[tuple(linha) for linha in pagina.linhas])
 
-    # Renderiza template passando lista filtrada de carros e termo de pesquisa
-    return render_template('carros.html', carros=carros, pesquisa=pesquisa)
+    try:
+        pagina = cache.obter_ou_calcular("catalogo", chave, calcular_pagina)
+    except ValueError as erro:
+        return str(erro), 400
+
+    # Renderiza template passando a página de carros, o termo de pesquisa e os filtros para os links da paginação
+    filtros = {'pesquisa': pesquisa or None, 'data_inicio': data_inicio or None, 'data_fim': data_fim or None,
+               'preco_min': preco_min, 'preco_max': preco_max, 'por_pagina': request.args.get('por_pagina'),
+               **escolhidos}
+    # Contagens por faceta lidas da tabela pré-calculada (sem GROUP BY por pedido)
+    contagens = facetas.obter_contagens(conn, hoje)
+    return render_template('carros.html', carros=pagina.linhas, pagina=pagina, filtros=filtros,
+                           pesquisa=pesquisa, data_inicio=data_inicio, data_fim=data_fim,
+                           preco_min=preco_min, preco_max=preco_max,
+                           contagens=contagens, escolhidos=escolhidos, nomes_facetas=facetas.NOMES)
 #Função vou inserir os carros para o utilizador ter acesso
 def inserir_carros():
     conn = conectar_bd()
@@ -251,6 +367,8 @@ def inserir_carros():
 
     conn.commit()
     conn.close()
+    frota.invalidar() #a frota mudou
+    miniaturas.gerar(app.static_folder, [carro[6] for carro in carros])
 
 
 
@@ -264,51 +382,34 @@ def reservar_carro(carro_id):
     if 'usuario' not in session:
         return redirect(url_for('home'))
     
-    conn = conectar_bd()
-    cursor = conn.cursor()
+    conn = obter_bd()
 
-# Busca o carro no GET para preencher template e no POST para cálculo
-    cursor.execute("SELECT * FROM veiculos WHERE id = ?", (carro_id,))
-    carro = cursor.fetchone()
+# Busca o carro no GET para preencher template e no POST para cálculo (cache da frota, sem ir ao SQLite)
+    carro = frota.obter(conn, carro_id)
     if not carro:
-        conn.close()
         return "Carro não encontrado", 404
     
     if request.method == "POST":
         data_inicio_str = request.form['data_inicio']
         data_fim_str = request.form['data_fim']
-        usuario = session['usuario']
-
         # Converte para datetime.date
         data_inicio = datetime.strptime(data_inicio_str, "%Y-%m-%d").date()
         data_fim = datetime.strptime(data_fim_str, "%Y-%m-%d").date()
 
         # Validação: fim não pode ser antes de início
         if data_fim < data_inicio:
-            conn.close()
             return "A data de fim não pode ser anterior à data de início.", 400
 
-        # Busca ID do cliente
-        cursor.execute("SELECT id FROM clientes WHERE usuario = ?", (usuario,))
-        cliente = cursor.fetchone()
-        if not cliente:
-            conn.close()
-            return f"Cliente não encontrado para o usuário {usuario}.", 404
-        cliente_id = cliente['id']
+        # ID do cliente guardado na sessão no login
+        cliente_id = clientes.id_da_sessao(conn, session)
+        if cliente_id is None:
+            return f"Cliente não encontrado para o usuário {session['usuario']}.", 404
 
-        # Calcula dias e total
-        dias = (data_fim - data_inicio).days + 1
-        valor_diaria = carro['valor_diaria']
-        total = dias * valor_diaria
-
-        # Insere reserva
-        cursor.execute("""
-            INSERT INTO reservas 
-                (cliente_id, veiculo_id, data_inicio, data_fim, valor_total, status)
-            VALUES (?, ?, ?, ?, ?, 'Ativa')
-        """, (cliente_id, carro_id, data_inicio_str, data_fim_str, total))
-        conn.commit()
-        reserva_id = cursor.lastrowid
+        # Calcula o total e insere a reserva, verificando na mesma transação que o carro está livre
+        try:
+            reserva_id, total = reservas_bd.criar(conn, cliente_id, carro_id, data_inicio.isoformat(), data_fim.isoformat(), carro.valor_diaria)
+        except ConflitoReserva:
+            return "O carro já está reservado nessas datas.", 409
 
         # Armazena o total a pagar na sessão para exibir no pagamento
         session['total_a_pagar'] = total
@@ -316,12 +417,12 @@ def reservar_carro(carro_id):
         # Certifica-se de remover qualquer diferença pré-existente
         session.pop('diferenca_pagamento', None)
 
-        conn.close()
         # Redireciona para a tela de pagamento
         return redirect(url_for('pagamento', reserva_id=reserva_id))
 
-    conn.close()
-    return render_template("reserva.html", carro=carro)
+    #datas escolhidas na pesquisa de /carros (se existirem) pré-preenchem o formulário
+    return render_template("reserva.html", carro=carro,
+                           data_inicio=request.args.get('data_inicio', ''), data_fim=request.args.get('data_fim', ''))
 
 #Rota de pagamento após uma reserva
 @app.route('/pagamento/<int:reserva_id>', methods=['GET', 'POST'])
@@ -336,13 +437,12 @@ def pagamento(reserva_id):
     if 'usuario' not in session:
         return redirect(url_for('home'))
     
-    conn = conectar_bd()
+    conn = obter_bd()
     cursor = conn.cursor()
 
     # Recupera apenas o mínimo de dados da reserva (pode ser usado para validação extra)
     cursor.execute("SELECT id FROM reservas WHERE id = ?", (reserva_id,))
     if not cursor.fetchone():
-        conn.close()
         return "Reserva não encontrada.", 404
 
     # Carrega valores da sessão
@@ -361,12 +461,10 @@ def pagamento(reserva_id):
         #validação do número do cartão
         if not re.fullmatch(r'\d{13}|\d{15}', numero_cartao):
             flash('Número do cartão inválido: deve ter 13 ou 15 dígitos.', 'error')
-            conn.close()
             return redirect(url_for('pagamento', reserva_id=reserva_id))
          #validação do nome (apenas letras e espaços)
         if not re.fullmatch(r"[A-Za-zÀ-ÿ ]+", nome_cartao):
             flash('Nome no cartão inválido: apenas letras e espaços são permitidos.', 'error')
-            conn.close()
             return redirect(url_for('pagamento', reserva_id=reserva_id))
 
         #validação da validade (formato e não expirado)
@@ -375,17 +473,14 @@ def pagamento(reserva_id):
             # considera válido todo o mês: compara primeiro dia do mês
             if date(ano, mes, 1) < date.today().replace(day=1):
                 flash('Data de expiração já passou.', 'error')
-                conn.close()
                 return redirect(url_for('pagamento', reserva_id=reserva_id))
         except ValueError:
             flash('Formato de data de expiração inválido.', 'error')
-            conn.close()
             return redirect(url_for('pagamento', reserva_id=reserva_id))
 
         #validação do código de segurança (3 ou 4 dígitos)
         if not re.fullmatch(r'\d{3,4}', codigo_seg):
             flash('CVV inválido: deve ter 3 ou 4 dígitos.', 'error')
-            conn.close()
             return redirect(url_for('pagamento', reserva_id=reserva_id))
 
         #insere os dados do pagamento
@@ -399,13 +494,11 @@ def pagamento(reserva_id):
         session.pop('diferenca_pagamento', None)
         session.pop('total_a_pagar', None)
 
-        conn.close()
         #mostra a mensagem e redireciona o utilizador para a página "minhas_reservas"
         flash ('Pagamento realizado com sucesso!', 'sucess')
         #Mensagem de confirmação de reserva, categoria 'success' para estilização no template.
         return redirect(url_for('minhas_reservas'))
 
-    conn.close()
     #Se for pedido GET, mostra o formulário de pagamento
     return render_template('pagamento.html', reserva_id=reserva_id, valor_total= valor_total, mostrar_alteracao=mostrar_alteracao, valor_alteracao=diferenca)
 
@@ -414,45 +507,24 @@ def minhas_reservas():
     if 'usuario' not in session:
         return redirect(url_for('home')) #se não estiver logado
     
-    usuario = session['usuario']
-    conn= conectar_bd()
-    cursor = conn.cursor()
-
-    #Obter ID do cliente com base no nome do utilizador da sessão
-    cursor.execute("SELECT id FROM clientes WHERE usuario = ?", (usuario,))
-    cliente= cursor.fetchone()
+    conn= obter_bd()
 
-    if cliente:
-        cliente_id = cliente[0]
+    #ID do cliente guardado na sessão no login (sessões antigas: cache usuario -> id)
+    cliente_id = clientes.id_da_sessao(conn, session)
+    if cliente_id is None:
+        return redirect(url_for('home'))
 
-        #Obter todas as reservas feitas por este cliente
-        cursor.execute("""
-            SELECT reservas.id, veiculos.marca, veiculos.modelo, reservas.data_inicio, reservas.data_fim, veiculos.valor_diaria, reservas.status
-            FROM reservas
-            JOIN veiculos ON reservas.veiculo_id = veiculos.id
-            WHERE reservas.cliente_id = ?
-        """, (cliente_id,))
-        reservas = []
-        for row in cursor.fetchall():
-            id, marca, modelo, data_inicio, data_fim, valor_diaria, status = row
-            dias = (datetime.strptime(data_fim, "%Y-%m-%d") - datetime.strptime(data_inicio, "%Y-%m-%d")).days + 1
-            total = dias * valor_diaria
-            reservas.append({
-                "id": id,
-                "marca": marca,
-                "modelo": modelo,
-                "data_inicio": data_inicio,
-                "data_fim": data_fim,
-                "valor_diaria": valor_diaria,
-                "total": total,
-                "status": status
-            })
-        conn.close()
+    #Uma só consulta por página (índice de cobertura em reservas), com o total já guardado em valor_total
+    ordem, chaves = reservas_bd.ORDEM_DO_CLIENTE
+    tamanho = paginacao.tamanho_pedido(request.args.get('por_pagina'), app.config["TAMANHO_PAGINA"])
+    try:
+        pagina = paginacao.paginar(conn, reservas_bd.SQL_DO_CLIENTE, (cliente_id,), ordem, chaves, descendente=True,
+                                   apos=request.args.get('apos'), antes=request.args.get('antes'), tamanho=tamanho)
+    except ValueError as erro:
+        return str(erro), 400
 
-        return render_template("minhas_reservas.html", reservas=reservas)
-    
-    conn.close()
-    return redirect(url_for('home'))
+    filtros = {'por_pagina': request.args.get('por_pagina')}
+    return render_template("minhas_reservas.html", reservas=pagina.linhas, pagina=pagina, filtros=filtros)
 
 #esta rota trata  do pedido de POST no botão "limpar_reservas"
 @app.route('/limpar_reservas', methods=['POST'])
@@ -461,23 +533,13 @@ def limpar_reservas():
     if 'usuario' not in session:
         return redirect(url_for('home'))
 
-    #obter o id do utilizador autenticado
-    usuario= session['usuario']
-
-    conn = conectar_bd()
-    cursor = conn.cursor()
-    #Buscar Id do cliente
-    cursor.execute("SELECT id FROM clientes WHERE usuario = ?", (usuario,))
-    cliente = cursor.fetchone()
+    #obter o id do utilizador autenticado (guardado na sessão)
+    conn = obter_bd()
+    cliente_id = clientes.id_da_sessao(conn, session)
 
     #o importante é apagar as reservas que não estão ativas
-    if cliente:
-        cliente_id = cliente[0]
-        cursor.execute("DELETE FROM reservas WHERE cliente_id = ? AND status != 'Ativa'", (cliente_id,))
-        conn.commit()
-    
-    
-    conn.close()
+    if cliente_id is not None:
+        reservas_bd.limpar_inativas(conn, cliente_id)
 
     #enviar uma mensagem de sucesso temporária 
     flash("Reservas inativas foram removidas com sucesso com sucesso")
@@ -489,13 +551,8 @@ def cancelar_reserva(reserva_id):
     if 'usuario' not in session:
         return redirect(url_for('home'))
     
-    conn = conectar_bd()
-    cursor = conn.cursor()
-
     #Atualizar o status da reserva para 'Cancelada'
-    cursor.execute("UPDATE reservas SET status = 'Cancelada' WHERE id = ?", (reserva_id,))
-    conn.commit()
-    conn.close()
+    reservas_bd.cancelar(obter_bd(), reserva_id)
 
     return redirect(url_for("minhas_reservas"))
 
@@ -513,7 +570,7 @@ def alterar_reserva(reserva_id):
     if 'usuario' not in session:
         return redirect(url_for('home'))
     
-    conn = conectar_bd()
+    conn = obter_bd()
     cursor = conn.cursor()
 
     if request.method == "POST":
@@ -527,52 +584,25 @@ def alterar_reserva(reserva_id):
 
         #Verifica se a data do fim é anterior á de inicio
         if data_fim < data_inicio:
-            conn.close()
             return "A data de fim não pode ser anterior á data de início!"
 
-        # Obter dados da reserva original (veiculo e valor anterior)
-        cursor.execute("SELECT veiculo_id, valor_total FROM reservas WHERE id = ?", (reserva_id,))
-        dados_reserva = cursor.fetchone()
-
-        if not dados_reserva:
-            conn.close()
-            return "Reserva não encontrada."
-        
-        veiculo_id, valor_anterior = dados_reserva['veiculo_id'], dados_reserva['valor_total']
-
-        #Obter o valor da diária do veículo
-        cursor.execute("SELECT valor_diaria FROM veiculos WHERE id = ?", (veiculo_id,))
-        valor = cursor.fetchone()
-
-        if not valor:
-            conn.close()
-            return "Veículo não encontrado."
-        
-        diaria = valor['valor_diaria']
-
-        #calcular o novo total com base nas novas datas
-        dias = (data_fim - data_inicio).days + 1
-        novo_total = diaria * dias
+        #Atualizar as datas e o novo valor na reserva (numa só transação com a verificação de conflitos)
+        try:
+            novo_total, valor_anterior = reservas_bd.alterar_datas(conn, reserva_id, data_inicio.isoformat(), data_fim.isoformat())
+        except LookupError as erro:
+            return str(erro)
+        except ConflitoReserva:
+            return "O veículo já está reservado nessas datas.", 409
 
         #calcular a diferença entre o novo total e o valor pago anteriormente
         diferenca = novo_total - valor_anterior
 
-        #Atualizar as datas e o novo valor na reserva
-        cursor.execute("""
-            UPDATE reservas
-            SET data_inicio = ?, data_fim = ?, valor_total = ?
-            WHERE id = ?
-        """, (nova_inicio, nova_fim, novo_total, reserva_id))
-
-        conn.commit()
         # Armazena na sessão apenas o que for relevante
         session['total_a_pagar'] = novo_total
         if diferenca > 0:
             session['diferenca_pagamento'] = diferenca
         else:
             session.pop('diferenca_pagamento', None)
-        
-        conn.close()
 
         #se houver valor adicional a pagar, redireciona para a página de pagamento
         return redirect(url_for('pagamento', reserva_id=reserva_id))
@@ -583,7 +613,6 @@ def alterar_reserva(reserva_id):
         FROM reservas WHERE id = ?
     """, (reserva_id,))
     reserva = cursor.fetchone()
-    conn.close()
 
     #enviar os dados para o template
     return render_template("alterar_reserva.html", reserva = reserva, reserva_id= reserva_id)
@@ -617,190 +646,200 @@ def logout():
 # Garante que a pasta static/img existe
 os.makedirs(os.path.join(app.static_folder, "img"), exist_ok=True)
 #Criação do excel com os dados dos clientes, veiculos, reservas e formas de pagamento
-#Caminho para a base de dados SQLite
-DB_PATH = os.path.join(os.path.dirname(__file__), "database", "banco_de_dados.db")
 
 #Lista das tabelas que queremos exportar
-TABELAS = ["clientes", "veiculos", "reservas", "pagamentos"]
-
-#função que retorna um pandas.DATAFRAME para cada tabela
-def ler_tabela(tabela: str, conn: sqlite3.Connection) -> pd.DataFrame:
-    query = f"SELECT * FROM {tabela};"
-    df = pd. read_sql_query(query,conn)
-    return df
-
-def main():
+TABELAS = exportacao.TABELAS
+PASTA_EXPORTS = os.path.join(os.path.dirname(__file__), "exports")
+#segundos entre exportações incrementais em segundo plano
+INTERVALO_EXPORTACAO = int(os.environ.get("EXPORTACAO_INTERVALO", 3600))
+INTERVALO_CICLO_RESERVAS = int(os.environ.get("CICLO_RESERVAS_INTERVALO", ciclo_reservas.INTERVALO_SEGUNDOS))
+
+#exportação completa (python -c "import project_web; project_web.main()")
+def main(formatos=("xlsx",)):
     #cria a pasta "exports" se não existir
-    pasta_exports = os.path.join(os.path.dirname(__file__), "exports")
+    pasta_exports = PASTA_EXPORTS
     os.makedirs(pasta_exports, exist_ok=True)
 
     #abrir a conexão SQLite
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar_bd()
     try:
         for tabela in TABELAS:
             print(f"Lendo a tabela '{tabela}'...")
-            df = ler_tabela(tabela, conn)
-
-            #gravar excel 
-            excel_path = os.path.join(pasta_exports, f"{tabela}.xlsx")
-            #para escrever XLSX, é necessário o openpyxl
-            df.to_excel(excel_path, index=False, engine= "openpyxl")
-            print(f"Gravado Excel em: {excel_path}")
+            for formato in formatos:
+                #lê e grava em blocos: a memória não cresce com o tamanho da tabela (inclui o arquivo por ano)
+                caminho = os.path.join(pasta_exports, f"{tabela}.{formato}")
+                linhas = exportacao.exportar_tabela(conn, tabela, caminho, formato, com_historico=True)
+                print(f"Gravado {formato.upper()} em: {caminho} ({linhas} linhas)")
         
         print("\nExportação concluída com sucesso!")
     finally:
         conn.close()
 
-def ler_tabela_para_dashboard_inicial(tabela:str) -> pd.DataFrame:
-    conn = sqlite3.connect(DB_PATH)
+#API de exportação a pedido (equipa de operações), protegida por token:
+#  Authorization: Bearer <EXPORTACAO_TOKEN>
+app.config["EXPORTACAO_TOKEN"] = os.environ.get("EXPORTACAO_TOKEN", "")
+PASTA_TAREFAS_EXPORTACAO = os.path.join(PASTA_EXPORTS, "tarefas")
+
+def requer_token_exportacao(funcao):
+    @wraps(funcao)
+    def verificar(*args, **kwargs):
+        token = app.config["EXPORTACAO_TOKEN"]
+        #sem token configurado a API fica desligada
+        if not token:
+            abort(403)
+        enviado = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(enviado.encode(), token.encode()):
+            abort(401)
+        return funcao(*args, **kwargs)
+    return verificar
+
+def _estado_tarefa_json(estado):
+    resposta = dict(estado)
+    resposta["url_estado"] = url_for("estado_exportacao", tarefa_id=estado["id"])
+    if estado["estado"] == "concluida":
+        resposta["url_download"] = url_for("download_exportacao", tarefa_id=estado["id"])
+    return resposta
+
+@app.route("/exports", methods=["POST"])
+@requer_token_exportacao
+def criar_exportacao():
+    #aceita JSON ou formulário: formato (xlsx/csv/parquet) e lista opcional de tabelas
+    if request.is_json:
+        dados = request.get_json(silent=True)
+        if not isinstance(dados, dict):
+            return jsonify(erro="O corpo tem de ser um objeto JSON."), 400
+    else:
+        dados = request.form
+    tabelas = dados.get("tabelas")
+    if isinstance(tabelas, str):
+        tabelas = [t.strip() for t in tabelas.split(",") if t.strip()]
     try:
-        df = pd.read_sql_query(f"SELECT * FROM {tabela};", conn)
+        estado = tarefas_exportacao.criar_tarefa(DB_PATH, PASTA_TAREFAS_EXPORTACAO, dados.get("formato", "xlsx"), tabelas)
+    except ValueError as erro:
+        return jsonify(erro=str(erro)), 400
+    return jsonify(_estado_tarefa_json(estado)), 202
+
+@app.route("/exports/<tarefa_id>", methods=["GET"])
+@requer_token_exportacao
+def estado_exportacao(tarefa_id):
+    estado = tarefas_exportacao.ler_estado(PASTA_TAREFAS_EXPORTACAO, tarefa_id)
+    if estado is None:
+        return jsonify(erro="Tarefa não encontrada."), 404
+    return jsonify(_estado_tarefa_json(estado))
+
+@app.route("/exports/<tarefa_id>/download", methods=["GET"])
+@requer_token_exportacao
+def download_exportacao(tarefa_id):
+    estado = tarefas_exportacao.ler_estado(PASTA_TAREFAS_EXPORTACAO, tarefa_id)
+    if estado is None:
+        return jsonify(erro="Tarefa não encontrada."), 404
+    if estado["estado"] != "concluida":
+        return jsonify(_estado_tarefa_json(estado)), 409
+    #send_file envia o zip em blocos a partir do disco
+    return send_file(tarefas_exportacao.caminho_ficheiro(PASTA_TAREFAS_EXPORTACAO, tarefa_id),
+                     as_attachment=True, download_name=f"exportacao-{tarefa_id}.zip", mimetype="application/zip")
+
+#importação em massa da frota (CSV/XLSX no formato da exportação), com o mesmo token:
+#  curl -H "Authorization: Bearer $EXPORTACAO_TOKEN" -F ficheiro=@frota.csv /frota/importacoes
+@app.route("/frota/importacoes", methods=["POST"])
+@requer_token_exportacao
+def importar_frota():
+    ficheiro = request.files.get("ficheiro")
+    if ficheiro is None or not ficheiro.filename:
+        return jsonify(erro="Falta o ficheiro (campo 'ficheiro')."), 400
+    extensao = os.path.splitext(ficheiro.filename)[1].lower()
+    if extensao not in (".csv", ".xlsx"):
+        return jsonify(erro="Formato não suportado (usar .csv ou .xlsx)."), 400
+    #o openpyxl precisa de um ficheiro no disco; o CSV é lido dele em streaming
+    descritor, temporario = tempfile.mkstemp(suffix=extensao)
+    try:
+        with os.fdopen(descritor, "wb") as destino:
+            ficheiro.save(destino)
+        conn = conectar_bd()
+        try:
+            relatorio = importacao.importar(conn, temporario, pasta_static=app.static_folder)
+        finally:
+            conn.close()
+    except ValueError as erro:
+        return jsonify(erro=str(erro)), 400
     finally:
-        conn.close()
-    return df
+        os.remove(temporario)
+    return jsonify(relatorio)
 
 def gerar_graficos_dashboard():
-    #ler todas as tabelas
-    df_clientes = ler_tabela_para_dashboard_inicial("clientes")
-    df_veiculos = ler_tabela_para_dashboard_inicial("veiculos")
-    df_reservas = ler_tabela_para_dashboard_inicial("reservas")
-
-
-    #Total de clientes
-    total_clientes = len(df_clientes)
-
-    #Total de veículos
-    total_veiculos = len(df_veiculos)
-
-    # calcular reservas ativas
-    if "status" in df_reservas.columns:
-        total_reservas_ativas = len(df_reservas[df_reservas["status"].str.lower() == "ativa"])
-    else:
-        total_reservas_ativas = 0
-
-    # Faturação do último mês (usando data_inicio)
-    #converte data_inicio para datetime
-    df_reservas["data_inicio"] = pd.to_datetime(df_reservas["data_inicio"])
-    hoje = pd.Timestamp.today()
-
-     # Começo do mês atual
-    mes_atual_inicio = hoje.replace(day=1)
-    mask_mes_atual = df_reservas["data_inicio"] >= mes_atual_inicio
-    faturacao_ultimo_mes = df_reservas.loc[mask_mes_atual, "valor_total"].sum()
-
-    # Reservas por mês (últimos 12 meses)
-    inicio_12meses = hoje - pd.DateOffset(months=11)  # data de 11 meses atrás (para totalizar 12)
-    mask_12 = df_reservas["data_inicio"] >= inicio_12meses
-    df_ultimas_res = df_reservas.loc[mask_12].copy()
-    df_ultimas_res["ano_mes"] = df_ultimas_res["data_inicio"].dt.to_period("M")
-    reservas_por_mes = (
-        df_ultimas_res
-        .groupby("ano_mes")
-        .size()
-        .reset_index(name="qtd_reservas")
-    )
+    #indicadores agregados em SQL e guardados em cache (ver metricas_dashboard.py)
+    with span("indicadores"):
+        indicadores = metricas_dashboard.obter(obter_bd())
 
-    # Garante que mesmo meses sem reservas apareçam com valor 0
-    todos_meses = pd.period_range(
-        start=inicio_12meses.to_period("M"),
-        end=hoje.to_period("M"),
-        freq="M"
-    )
-    reservas_por_mes = (
-        reservas_por_mes
-        .set_index("ano_mes")
-        .reindex(todos_meses, fill_value=0)
-        .reset_index()
-        .rename(columns={"index": "ano_mes"})
-    )
-    reservas_por_mes["ano_mes_str"] = reservas_por_mes["ano_mes"].astype(str)
-
-    # Faturação por mês (últimos 12 meses)
-    df_ultimas_res["ano_mes"] = df_ultimas_res["data_inicio"].dt.to_period("M")
-    faturacao_por_mes = (
-        df_ultimas_res
-        .groupby("ano_mes")["valor_total"]
-        .sum()
-        .reset_index()
-    )
-    faturacao_por_mes = (
-        faturacao_por_mes
-        .set_index("ano_mes")
-        .reindex(todos_meses, fill_value=0)
-        .reset_index()
-        .rename(columns={"index": "ano_mes"})
-    )
-    faturacao_por_mes["ano_mes_str"] = faturacao_por_mes["ano_mes"].astype(str)
-
-    # Gera o gráfico de Reservas por mês
-    plt.figure(figsize=(8, 4))
-    plt.bar(reservas_por_mes["ano_mes_str"], reservas_por_mes["qtd_reservas"], color="#007bff")
-    plt.xticks(rotation=45, ha="right")
-    plt.ylabel("Número de Reservas")
-    plt.title("Reservas nos Últimos 12 Meses")
-    plt.tight_layout()
-    caminho_reservas = os.path.join(app.static_folder, "img", "reservas_por_mes.png")
-    plt.savefig(caminho_reservas)
-    plt.close()
-
-    # Gera o gráfico de Faturação por mês
-    plt.figure(figsize=(8, 4))
-    plt.plot(faturacao_por_mes["ano_mes_str"], faturacao_por_mes["valor_total"], marker="o")
-    plt.xticks(rotation=45, ha="right")
-    plt.ylabel("Faturação (€)")
-    plt.title("Faturação Mensal (Últimos 12 Meses)")
-    plt.tight_layout()
-    caminho_faturacao = os.path.join(app.static_folder, "img", "faturacao_por_mes.png")
-    plt.savefig(caminho_faturacao)
-    plt.close()
-
-    # Top 5 clientes por faturação (usando somente reservas)
-    top5_clientes = []
-    # Verifica se existem as colunas necessárias
-    if {"cliente_id", "valor_total"}.issubset(df_reservas.columns):
-        soma_por_cliente = (
-            df_reservas
-            .groupby("cliente_id")["valor_total"]
-            .sum()
-            .sort_values(ascending=False)
-            .head(5)
-            .reset_index()
-        )
-        # Mapeia id_cliente -> nome 
-        mapa_nomes = {}
-        if "nome" in df_clientes.columns and "id" in df_clientes.columns:
-            mapa_nomes = df_clientes.set_index("id")["nome"].to_dict()
-
-        for idx, row in soma_por_cliente.iterrows():
-            cliente_id = row["cliente_id"]
-            nome_cliente = mapa_nomes.get(cliente_id, f"Cliente {cliente_id}")
-            valor_faturado = row["valor_total"]
-            top5_clientes.append((idx + 1, nome_cliente, valor_faturado))
+    # Gráficos só são desenhados quando a série muda (nome do ficheiro = hash dos dados)
+    with span("graficos"):
+        img_reservas = graficos.grafico_reservas(app.static_folder, indicadores["reservas_por_mes"])
+        img_faturacao = graficos.grafico_faturacao(app.static_folder, indicadores["faturacao_por_mes"])
 
     # Retorna o dicionário com todos os indicadores para o template
     return {
-        "total_clientes": total_clientes,
-        "total_veiculos": total_veiculos,
-        "total_reservas_ativas": total_reservas_ativas,
-        "faturacao_ultimo_mes": round(float(faturacao_ultimo_mes), 2),
-        "img_reservas": "img/reservas_por_mes.png",
-        "img_faturacao": "img/faturacao_por_mes.png",
-        "top5_clientes": top5_clientes
+        "total_clientes": indicadores["total_clientes"],
+        "total_veiculos": indicadores["total_veiculos"],
+        "total_reservas_ativas": indicadores["total_reservas_ativas"],
+        "faturacao_ultimo_mes": indicadores["faturacao_ultimo_mes"],
+        "img_reservas": img_reservas,
+        "img_faturacao": img_faturacao,
+        "top5_clientes": indicadores["top5_clientes"]
     }
  
 #Rota dashboard com os gráficos
 @app.route("/dashboard")
 def dashboard():
     # Gera (ou atualiza) os gráficos e obtém os indicadores
-    indicadores = gerar_graficos_dashboard()
+    with span("gerar_graficos_dashboard"):
+        indicadores = gerar_graficos_dashboard()
 
     # Passa para o template
     return render_template("dashboard_inicial.html", **indicadores)
-if __name__=='__main__':
-    #Inicializa o esquema e dados padrão de carros
+
+
+def criar_app(config=None):
+    """
+    Fábrica usada pelos servidores WSGI (servidor.py, ou gunicorn "project_web:criar_app()").
+    As rotas estão registadas na aplicação deste módulo: a fábrica aplica a configuração extra e devolve-a.
+    """
+    if config:
+        app.config.update(config)
+    if not app.debug and app.config["SECRET_KEY"] == CHAVE_DESENVOLVIMENTO:
+        print("Aviso: a usar a chave de sessão de desenvolvimento; definir FLASK_SECRET_KEY em produção.")
+    return app
+
+
+def preparar():
+    """
+    Esquema, carros padrão e miniaturas em falta: corre uma vez antes de o servidor aceitar pedidos.
+    """
     criar_tabelas()
     inserir_carros()
+    #miniaturas em falta (bases de dados criadas antes de existirem, ou imagens novas)
+    conn = conectar_bd()
+    miniaturas.garantir(app.static_folder, conn)
+    conn.close()
     #atualiza_categorias() codigo necessário para atualizar as categorias
-    main()
-    app.run(debug=True)
 
+
+def iniciar_tarefas_fundo():
+    """
+    Arranca as threads da exportação incremental e do ciclo de reservas (uma vez por servidor, não por worker).
+    """
+    #exportação incremental numa thread: o servidor arranca logo, seja qual for o tamanho da base de dados
+    app.extensions["exportacao"] = exportacao.ExportacaoEmSegundoPlano(DB_PATH, PASTA_EXPORTS, intervalo=INTERVALO_EXPORTACAO)
+    app.extensions["exportacao"].start()
+    #reservas terminadas passam a 'Concluída' e as antigas vão para o histórico
+    app.extensions["ciclo_reservas"] = ciclo_reservas.CicloReservas(DB_PATH, intervalo=INTERVALO_CICLO_RESERVAS)
+    app.extensions["ciclo_reservas"].start()
+
+
+if __name__=='__main__':
+    #Servidor de desenvolvimento (FLASK_DEBUG=1 liga o reloader e o debugger); em produção usar servidor.py
+    #Com o reloader o módulo corre em dois processos: o esquema só no primeiro, as threads só no que serve os pedidos
+    if os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        preparar()
+    if not app.debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        iniciar_tarefas_fundo()
+    app.run(debug=app.debug)
@@ -0,0 +1,176 @@
+from datetime import datetime
+
+from base_dados import transacao_imediata
+import arquivo
+import disponibilidade
+import frota
+
+"""
+reservas.py
+
+Escritas na tabela reservas com proteção contra reservas duplicadas:
+- A verificação de sobreposição e o INSERT/UPDATE correm na mesma transação BEGIN IMMEDIATE,
+  por isso dois pedidos simultâneos para o mesmo veículo nunca ficam ambos com as mesmas datas.
+- As datas chegam como strings ISO (YYYY-MM-DD), tal como vêm dos formulários.
+- Depois de cada escrita confirmada são chamadas as funções registadas com ao_alterar
+  (ex.: invalidar a cache do dashboard).
+- Reservas terminadas passam a 'Concluída' e as antigas (concluídas/canceladas) vão para o arquivo
+  por ano (arquivo.py), em lotes pequenos (ver ciclo_reservas.py), para a tabela reservas não crescer sem fim.
+"""
+
+#funções chamadas como funcao(evento, reserva_id) depois de cada escrita em reservas
+_ouvintes = []
+
+#índice de cobertura para listar as reservas de um cliente da mais recente para a mais antiga
+#(paginação por keyset): tem todas as colunas de reservas que /minhas_reservas lê, por isso a tabela
+#não é visitada; substitui o antigo idx_reservas_cliente_inicio
+INDICES = '''
+    DROP INDEX IF EXISTS idx_reservas_cliente_inicio;
+    CREATE INDEX IF NOT EXISTS idx_reservas_cliente_cobertura
+        ON reservas (cliente_id, data_inicio, id, veiculo_id, data_fim, status, valor_total);
+    CREATE INDEX IF NOT EXISTS idx_reservas_status_fim
+        ON reservas (status, data_fim);
+'''
+
+ESTADOS_ARQUIVAVEIS = ("Concluída", "Cancelada")
+TAMANHO_LOTE = 1000
+
+#página de reservas de um cliente (para paginacao.paginar), com o total guardado na reserva
+SQL_DO_CLIENTE = '''
+    SELECT r.id, v.marca, v.modelo, r.data_inicio, r.data_fim, v.valor_diaria, r.valor_total AS total, r.status
+    FROM reservas r
+    JOIN veiculos v ON v.id = r.veiculo_id
+    WHERE r.cliente_id = ?
+'''
+ORDEM_DO_CLIENTE = (["r.data_inicio", "r.id"], ["data_inicio", "id"])
+
+
+def criar_indices(conn):
+    conn.executescript(INDICES)
+
+
+def ao_alterar(funcao):
+    """
+    Regista uma função a chamar depois de cada escrita confirmada em reservas.
+    Eventos: 'criada', 'alterada', 'cancelada', 'removidas', 'concluidas' e 'arquivadas'
+    (reserva_id é None nos três últimos).
+    Pode ser usada como decorator.
+    """
+    _ouvintes.append(funcao)
+    return funcao
+
+
+def _notificar(evento, reserva_id=None):
+    for funcao in _ouvintes:
+        funcao(evento, reserva_id)
+
+
+class ConflitoReserva(Exception):
+    """O veículo já tem uma reserva ativa que se sobrepõe ao intervalo pedido."""
+
+
+def calcular_total(data_inicio, data_fim, valor_diaria):
+    #o dia de início e o dia de fim contam ambos
+    dias = (datetime.strptime(data_fim, "%Y-%m-%d") - datetime.strptime(data_inicio, "%Y-%m-%d")).days + 1
+    return dias * valor_diaria
+
+
+def criar(conn, cliente_id, veiculo_id, data_inicio, data_fim, valor_diaria):
+    """
+    Cria uma reserva 'Ativa' se o veículo estiver livre no intervalo.
+    Devolve (reserva_id, total). Lança ConflitoReserva se houver sobreposição.
+    """
+    total = calcular_total(data_inicio, data_fim, valor_diaria)
+    with transacao_imediata(conn):
+        if not disponibilidade.veiculo_disponivel(conn, veiculo_id, data_inicio, data_fim):
+            raise ConflitoReserva()
+        cursor = conn.execute("""
+            INSERT INTO reservas
+                (cliente_id, veiculo_id, data_inicio, data_fim, valor_total, status)
+            VALUES (?, ?, ?, ?, ?, 'Ativa')
+        """, (cliente_id, veiculo_id, data_inicio, data_fim, total))
+    _notificar("criada", cursor.lastrowid)
+    return cursor.lastrowid, total
+
+
+def alterar_datas(conn, reserva_id, data_inicio, data_fim):
+    """
+    Muda as datas de uma reserva e recalcula o total com a diária atual do veículo.
+    Devolve (novo_total, valor_anterior).
+    Lança LookupError se a reserva ou o veículo não existirem e ConflitoReserva se as novas
+    datas se sobrepuserem a outra reserva ativa do mesmo veículo.
+    """
+    with transacao_imediata(conn):
+        dados_reserva = conn.execute(
+            "SELECT veiculo_id, valor_total FROM reservas WHERE id = ?", (reserva_id,)
+        ).fetchone()
+        if not dados_reserva:
+            raise LookupError("Reserva não encontrada.")
+        veiculo_id, valor_anterior = dados_reserva['veiculo_id'], dados_reserva['valor_total']
+
+        veiculo = frota.obter(conn, veiculo_id)
+        if not veiculo:
+            raise LookupError("Veículo não encontrado.")
+
+        #a própria reserva não conta como conflito
+        if not disponibilidade.veiculo_disponivel(conn, veiculo_id, data_inicio, data_fim,
+                                                  ignorar_reserva_id=reserva_id):
+            raise ConflitoReserva()
+
+        novo_total = calcular_total(data_inicio, data_fim, veiculo.valor_diaria)
+        conn.execute("""
+            UPDATE reservas
+            SET data_inicio = ?, data_fim = ?, valor_total = ?
+            WHERE id = ?
+        """, (data_inicio, data_fim, novo_total, reserva_id))
+    _notificar("alterada", reserva_id)
+    return novo_total, valor_anterior
+
+
+def cancelar(conn, reserva_id):
+    conn.execute("UPDATE reservas SET status = 'Cancelada' WHERE id = ?", (reserva_id,))
+    conn.commit()
+    _notificar("cancelada", reserva_id)
+
+
+def limpar_inativas(conn, cliente_id):
+    #apaga as reservas do cliente que já não estão ativas (canceladas, concluídas...)
+    conn.execute("DELETE FROM reservas WHERE cliente_id = ? AND status != 'Ativa'", (cliente_id,))
+    conn.commit()
+    _notificar("removidas")
+
+
+def concluir_terminadas(conn, hoje, tamanho_lote=TAMANHO_LOTE):
+    """
+    Passa a 'Concluída' as reservas ativas com data_fim anterior a `hoje` (ISO), em lotes de
+    `tamanho_lote` linhas, cada um na sua transação curta (índice (status, data_fim)).
+    Devolve o número de reservas concluídas.
+    """
+    total = 0
+    while True:
+        with transacao_imediata(conn):
+            alteradas = conn.execute("""
+                UPDATE reservas SET status = 'Concluída'
+                WHERE id IN (
+                    SELECT id FROM reservas
+                    WHERE status = 'Ativa' AND data_fim < ?
+                    LIMIT ?
+                )
+            """, (hoje, tamanho_lote)).rowcount
+        total += alteradas
+        if alteradas < tamanho_lote:
+            break
+    if total:
+        _notificar("concluidas")
+    return total
+
+
+def arquivar_antigas(conn, limite, tamanho_lote=TAMANHO_LOTE):
+    """
+    Move para o arquivo por ano (arquivo.py) as reservas concluídas ou canceladas com data_fim anterior a
+    `limite` (ISO), com os respetivos pagamentos, em lotes. Devolve o número de reservas movidas.
+    """
+    total = arquivo.arquivar(conn, limite, ESTADOS_ARQUIVAVEIS, tamanho_lote)
+    if total:
+        _notificar("arquivadas")
+    return total
@@ -0,0 +1,139 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+senhas.py
+
+Hash das senhas com scrypt, calculado num pool limitado de threads:
+- hashlib.scrypt liberta o GIL enquanto calcula, por isso um pool com tantas threads como núcleos usa
+  todos os CPUs sem deixar que uma vaga de logins ponha dezenas de hashes (16 MiB cada) a correr ao mesmo tempo.
+- Há um limite de pedidos em espera: acima dele, gerar_hash/verificar lançam Ocupado em vez de acumular fila.
+- O formato guardado é "scrypt$n$r$p$sal$hash" (base64), com os parâmetros de custo de cada hash.
+  Se o custo configurado mudar, precisa_rehash indica que o hash deve ser refeito no próximo login.
+- Senhas antigas guardadas em texto simples continuam a ser aceites (comparação em tempo constante)
+  e também são marcadas para rehash.
+
+Parâmetros (variáveis de ambiente): SENHA_SCRYPT_N, SENHA_SCRYPT_R, SENHA_SCRYPT_P,
+SENHA_TRABALHADORES e SENHA_MAX_EM_ESPERA.
+"""
+
+PREFIXO = "scrypt"
+TAMANHO_SAL = 16
+TAMANHO_HASH = 32
+ESPERA_SEGUNDOS = 10.0
+
+CUSTO_N = int(os.environ.get("SENHA_SCRYPT_N", 2 ** 14))
+CUSTO_R = int(os.environ.get("SENHA_SCRYPT_R", 8))
+CUSTO_P = int(os.environ.get("SENHA_SCRYPT_P", 1))
+TRABALHADORES = int(os.environ.get("SENHA_TRABALHADORES", os.cpu_count() or 1))
+MAX_EM_ESPERA = int(os.environ.get("SENHA_MAX_EM_ESPERA", 8 * TRABALHADORES))
+
+_executor = None
+_executor_pid = None
+_vagas = threading.BoundedSemaphore(MAX_EM_ESPERA)
+_trinco = threading.Lock()
+_hash_falso = None
+
+
+class Ocupado(Exception):
+    """Demasiados hashes em espera: o pedido deve ser recusado (ex.: HTTP 503)."""
+
+
+def configurar(n=None, r=None, p=None, trabalhadores=None, max_em_espera=None):
+    """Altera o custo e/ou o tamanho do pool (o pool é recriado no próximo hash)."""
+    global CUSTO_N, CUSTO_R, CUSTO_P, TRABALHADORES, MAX_EM_ESPERA, _executor, _vagas, _hash_falso
+    with _trinco:
+        CUSTO_N = n or CUSTO_N
+        CUSTO_R = r or CUSTO_R
+        CUSTO_P = p or CUSTO_P
+        TRABALHADORES = trabalhadores or TRABALHADORES
+        MAX_EM_ESPERA = max_em_espera or MAX_EM_ESPERA
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+        _vagas = threading.BoundedSemaphore(MAX_EM_ESPERA)
+        _hash_falso = None
+
+
+def _obter_executor():
+    #um pool por processo (as threads não sobrevivem a um fork dos workers)
+    global _executor, _executor_pid
+    with _trinco:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=TRABALHADORES, thread_name_prefix="senhas")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _scrypt(senha, sal, n, r, p):
+    return hashlib.scrypt(senha.encode("utf-8"), salt=sal, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=TAMANHO_HASH)
+
+
+def _no_pool(funcao, *args):
+    vagas = _vagas
+    if not vagas.acquire(timeout=ESPERA_SEGUNDOS):
+        raise Ocupado("Demasiados pedidos de autenticação em simultâneo.")
+    try:
+        return _obter_executor().submit(funcao, *args).result()
+    finally:
+        vagas.release()
+
+
+def _codificar(sal, valor, n, r, p):
+    b64 = lambda dados: base64.b64encode(dados).decode("ascii")
+    return f"{PREFIXO}${n}${r}${p}${b64(sal)}${b64(valor)}"
+
+
+def _gerar(senha, n, r, p):
+    sal = os.urandom(TAMANHO_SAL)
+    return _codificar(sal, _scrypt(senha, sal, n, r, p), n, r, p)
+
+
+def _verificar(senha, guardado):
+    try:
+        _, n, r, p, sal, valor = guardado.split("$")
+        calculado = _scrypt(senha, base64.b64decode(sal), int(n), int(r), int(p))
+        return hmac.compare_digest(calculado, base64.b64decode(valor))
+    except (ValueError, TypeError):
+        return False
+
+
+def e_hash(guardado):
+    return isinstance(guardado, str) and guardado.startswith(PREFIXO + "$")
+
+
+def gerar_hash(senha):
+    """Hash da senha com o custo configurado (calculado no pool)."""
+    return _no_pool(_gerar, senha, CUSTO_N, CUSTO_R, CUSTO_P)
+
+
+def verificar(senha, guardado):
+    """
+    Compara a senha com o valor guardado em clientes.senha (hash scrypt ou, em contas antigas, texto simples).
+    Com guardado=None faz na mesma um hash, para que um utilizador inexistente demore o mesmo tempo.
+    """
+    if guardado is None:
+        global _hash_falso
+        if _hash_falso is None:
+            _hash_falso = _gerar("", CUSTO_N, CUSTO_R, CUSTO_P)
+        _no_pool(_verificar, senha, _hash_falso)
+        return False
+    if not e_hash(guardado):
+        return hmac.compare_digest(senha.encode("utf-8"), str(guardado).encode("utf-8"))
+    return _no_pool(_verificar, senha, guardado)
+
+
+def precisa_rehash(guardado):
+    #texto simples ou hash com parâmetros de custo diferentes dos atuais
+    if not e_hash(guardado):
+        return True
+    try:
+        _, n, r, p, _, _ = guardado.split("$")
+        return (int(n), int(r), int(p)) != (CUSTO_N, CUSTO_R, CUSTO_P)
+    except ValueError:
+        return True
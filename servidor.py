@@ -0,0 +1,136 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+from gunicorn.app.base import BaseApplication
+
+"""
+servidor.py
+
+Servidor de produção: gunicorn com vários processos (workers) e várias threads por processo (gthread).
+- Configuração por variáveis de ambiente (ou pelas opções da linha de comandos, que têm prioridade):
+  SERVIDOR_ENDERECO (127.0.0.1:8000), SERVIDOR_WORKERS (2 x CPUs + 1), SERVIDOR_THREADS (4),
+  SERVIDOR_TIMEOUT (60 s), SERVIDOR_TIMEOUT_GRACIOSO (30 s), SERVIDOR_PIDFILE, SERVIDOR_LOG_ACESSOS ("-" = stdout).
+  A aplicação lê as suas variáveis FLASK_* (project_web.py).
+- O esquema e os dados padrão (project_web.preparar) correm uma única vez, antes de o servidor aceitar pedidos.
+- A exportação incremental e o ciclo de reservas correm num só processo à parte, não em cada worker.
+- O master nunca importa a aplicação: cada worker carrega-a depois do fork, por isso um HUP carrega o código novo.
+
+Uso:
+    python servidor.py [--workers 4] [--threads 8] [--bind 0.0.0.0:8000] [--pidfile servidor.pid]
+    kill -HUP <pid do master>     recarregamento gracioso: workers novos com o código e a configuração atuais,
+                                  os antigos acabam os pedidos em curso (até SERVIDOR_TIMEOUT_GRACIOSO) e saem
+    kill -TERM <pid do master>    paragem graciosa
+    kill -TTIN / -TTOU <pid>      mais um / menos um worker, sem reiniciar
+"""
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+
+def configuracao():
+    """Configuração do gunicorn a partir das variáveis de ambiente SERVIDOR_*."""
+    return {
+        "bind": os.environ.get("SERVIDOR_ENDERECO", "127.0.0.1:8000"),
+        "workers": int(os.environ.get("SERVIDOR_WORKERS", 2 * (os.cpu_count() or 1) + 1)),
+        "threads": int(os.environ.get("SERVIDOR_THREADS", 4)),
+        "worker_class": "gthread",
+        "timeout": int(os.environ.get("SERVIDOR_TIMEOUT", 60)),
+        "graceful_timeout": int(os.environ.get("SERVIDOR_TIMEOUT_GRACIOSO", 30)),
+        "keepalive": 5,
+        "pidfile": os.environ.get("SERVIDOR_PIDFILE"),
+        "accesslog": os.environ.get("SERVIDOR_LOG_ACESSOS"),
+        "proc_name": "projeto_web",
+        "chdir": RAIZ,
+    }
+
+
+def _executar(codigo):
+    #num processo à parte, para o master continuar sem a aplicação importada
+    return [sys.executable, "-c", codigo]
+
+
+def preparar(servidor):
+    """Hook on_starting: esquema, carros padrão e miniaturas, uma vez antes de abrir o socket."""
+    subprocess.run(_executar("import project_web; project_web.preparar()"), cwd=RAIZ, check=True)
+
+
+def arrancar_tarefas(servidor):
+    """Hook when_ready / on_reload: (re)arranca o processo das tarefas em segundo plano."""
+    parar_tarefas(servidor)
+    servidor.tarefas = subprocess.Popen(_executar("import servidor; servidor.tarefas_fundo()"), cwd=RAIZ)
+
+
+def parar_tarefas(servidor):
+    """Hook on_exit: pede às tarefas que terminem e espera pela exportação em curso."""
+    processo = getattr(servidor, "tarefas", None)
+    if processo is None:
+        return
+    processo.terminate()
+    try:
+        processo.wait(timeout=servidor.cfg.graceful_timeout)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+        processo.wait()
+    servidor.tarefas = None
+
+
+def tarefas_fundo():
+    """Processo das tarefas: as threads de project_web até receber SIGTERM (ou SIGINT)."""
+    import project_web
+
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+    project_web.iniciar_tarefas_fundo()
+    parar.wait()
+    tarefas = [project_web.app.extensions["exportacao"], project_web.app.extensions["ciclo_reservas"]]
+    for tarefa in tarefas:
+        tarefa.parar()
+    for tarefa in tarefas:
+        tarefa.join()
+
+
+class Servidor(BaseApplication):
+    """Aplicação gunicorn com a configuração de configuracao() e a fábrica project_web.criar_app."""
+
+    def __init__(self, opcoes=None, tarefas=True):
+        #opções não dadas na linha de comandos (None) não podem tapar as variáveis de ambiente
+        self.opcoes = {nome: valor for nome, valor in (opcoes or {}).items() if valor is not None}
+        self.tarefas = tarefas
+        super().__init__()
+
+    def load_config(self):
+        #chamado outra vez em cada HUP: as variáveis de ambiente são relidas
+        for nome, valor in {**configuracao(), **self.opcoes}.items():
+            if valor is not None:
+                self.cfg.set(nome, valor)
+        self.cfg.set("on_starting", preparar)
+        if self.tarefas:
+            self.cfg.set("when_ready", arrancar_tarefas)
+            self.cfg.set("on_reload", arrancar_tarefas)
+            self.cfg.set("on_exit", parar_tarefas)
+
+    def load(self):
+        #já dentro do worker (depois do fork)
+        from project_web import criar_app
+        return criar_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de produção (gunicorn, workers com threads).")
+    parser.add_argument("--bind", help="endereço:porta (SERVIDOR_ENDERECO)")
+    parser.add_argument("--workers", type=int, help="número de processos (SERVIDOR_WORKERS)")
+    parser.add_argument("--threads", type=int, help="threads por processo (SERVIDOR_THREADS)")
+    parser.add_argument("--pidfile", help="ficheiro com o pid do master, para o HUP (SERVIDOR_PIDFILE)")
+    parser.add_argument("--sem-tarefas", action="store_true", help="não arranca a exportação nem o ciclo de reservas")
+    args = parser.parse_args()
+
+    opcoes = {"bind": args.bind, "workers": args.workers, "threads": args.threads, "pidfile": args.pidfile}
+    Servidor(opcoes, tarefas=not args.sem_tarefas).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import time
+import traceback
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import exportacao
+from base_dados import nova_conexao
+
+"""
+tarefas_exportacao.py
+
+Exportações a pedido (API /exports) num pool de processos:
+- Cada tarefa tem uma pasta própria (<pasta>/<id>/) com o ficheiro estado.json e, no fim, exportacao.zip.
+- O processo filho atualiza estado.json depois de cada bloco (linhas escritas por tabela), por isso
+  qualquer worker da aplicação consegue ler o progresso, não só o que criou a tarefa.
+- O pedido HTTP só cria a tarefa e devolve o id: a exportação nunca bloqueia um worker de pedidos.
+"""
+
+MAX_PROCESSOS = max(1, min(4, (os.cpu_count() or 1) // 2))
+HORAS_RETENCAO = 24                 #tarefas mais antigas são apagadas ao criar uma nova
+NOME_ZIP = "exportacao.zip"
+_ID_VALIDO = re.compile(r"[0-9a-f]{32}")
+
+_executor = None
+_executor_pid = None
+_trinco = threading.Lock()
+
+
+def _obter_executor():
+    #um pool por processo (criado só depois de um eventual fork dos workers)
+    global _executor, _executor_pid
+    with _trinco:
+        if _executor is None or _executor_pid != os.getpid():
+            #spawn: o filho não herda locks/threads do servidor
+            _executor = ProcessPoolExecutor(max_workers=MAX_PROCESSOS, mp_context=multiprocessing.get_context("spawn"))
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _gravar_estado(pasta_tarefa, estado):
+    temporario = os.path.join(pasta_tarefa, "estado.json.tmp")
+    with open(temporario, "w", encoding="utf-8") as ficheiro:
+        json.dump(estado, ficheiro)
+    os.replace(temporario, os.path.join(pasta_tarefa, "estado.json"))
+
+
+def ler_estado(pasta, tarefa_id):
+    """Devolve o estado da tarefa ou None se o id for inválido/desconhecido."""
+    if not _ID_VALIDO.fullmatch(tarefa_id or ""):
+        return None
+    try:
+        with open(os.path.join(pasta, tarefa_id, "estado.json"), encoding="utf-8") as ficheiro:
+            return json.load(ficheiro)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def caminho_ficheiro(pasta, tarefa_id):
+    return os.path.join(pasta, tarefa_id, NOME_ZIP)
+
+
+def _correr_tarefa(caminho_bd, pasta_tarefa, formato, tabelas):
+    """Corre no processo filho: exporta as tabelas, atualiza o progresso e junta tudo num zip."""
+    with open(os.path.join(pasta_tarefa, "estado.json"), encoding="utf-8") as ficheiro:
+        estado = json.load(ficheiro)
+    estado["estado"] = "a_correr"
+    estado["iniciada"] = time.time()
+    _gravar_estado(pasta_tarefa, estado)
+
+    def progresso(tabela, linhas):
+        estado["linhas"][tabela] = linhas
+        _gravar_estado(pasta_tarefa, estado)
+
+    try:
+        conn = nova_conexao(caminho_bd)
+        try:
+            ficheiros = []
+            for tabela in tabelas:
+                caminho = os.path.join(pasta_tarefa, f"{tabela}.{formato}")
+                estado["linhas"][tabela] = exportacao.exportar_tabela(conn, tabela, caminho, formato, progresso=progresso,
+                                                                         com_historico=True)
+                ficheiros.append(caminho)
+        finally:
+            conn.close()
+
+        temporario = os.path.join(pasta_tarefa, NOME_ZIP + ".tmp")
+        with zipfile.ZipFile(temporario, "w", compression=zipfile.ZIP_DEFLATED) as arquivo_zip:
+            for caminho in ficheiros:
+                arquivo_zip.write(caminho, os.path.basename(caminho))
+                os.remove(caminho)
+        os.replace(temporario, os.path.join(pasta_tarefa, NOME_ZIP))
+
+        estado["estado"] = "concluida"
+    except Exception:
+        estado["estado"] = "erro"
+        estado["erro"] = traceback.format_exc(limit=3)
+    estado["terminada"] = time.time()
+    _gravar_estado(pasta_tarefa, estado)
+
+
+def limpar_antigas(pasta, horas=HORAS_RETENCAO):
+    limite = time.time() - horas * 3600
+    if not os.path.isdir(pasta):
+        return
+    for nome in os.listdir(pasta):
+        caminho = os.path.join(pasta, nome)
+        if _ID_VALIDO.fullmatch(nome) and os.path.getmtime(caminho) < limite:
+            shutil.rmtree(caminho, ignore_errors=True)
+
+
+def criar_tarefa(caminho_bd, pasta, formato="xlsx", tabelas=None):
+    """
+    Cria a tarefa, envia-a para o pool de processos e devolve o estado inicial (inclui o id).
+    Lança ValueError se o formato ou as tabelas forem inválidos.
+    """
+    if tabelas is not None and (not isinstance(tabelas, (list, tuple)) or not all(isinstance(t, str) for t in tabelas)):
+        raise ValueError("As tabelas têm de ser uma lista de nomes.")
+    tabelas = list(tabelas or exportacao.TABELAS)
+    if not isinstance(formato, str) or formato not in exportacao.FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}")
+    desconhecidas = [t for t in tabelas if t not in exportacao.TABELAS]
+    if desconhecidas:
+        raise ValueError(f"Tabelas inválidas: {', '.join(desconhecidas)}")
+
+    limpar_antigas(pasta)
+    tarefa_id = uuid.uuid4().hex
+    pasta_tarefa = os.path.join(pasta, tarefa_id)
+    os.makedirs(pasta_tarefa)
+    estado = {
+        "id": tarefa_id,
+        "estado": "em_fila",
+        "formato": formato,
+        "tabelas": tabelas,
+        "linhas": {tabela: 0 for tabela in tabelas},
+        "criada": time.time(),
+    }
+    _gravar_estado(pasta_tarefa, estado)
+    _obter_executor().submit(_correr_tarefa, caminho_bd, pasta_tarefa, formato, tabelas)
+    return estado
@@ -0,0 +1,78 @@
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+"""
+conftest.py
+
+A aplicação lê BD_CAMINHO e CACHE_CAMINHO ao ser importada: os testes usam uma base de dados temporária,
+criada uma vez por sessão com o esquema e os carros padrão (project_web.preparar).
+A pasta static (miniaturas, gráficos) e a das exportações também são temporárias: os testes não escrevem na árvore do projeto.
+"""
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA = tempfile.mkdtemp(prefix="testes_projeto_web_")
+os.environ["BD_CAMINHO"] = os.path.join(PASTA, "testes.db")
+os.environ["CACHE_CAMINHO"] = os.path.join(PASTA, "cache.db")
+sys.path.insert(0, RAIZ)
+_NUMERO_CLIENTE = itertools.count(1)
+
+import project_web
+from base_dados import nova_conexao
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    pasta = tmp_path_factory.mktemp("app")
+    #cópia das imagens originais, sem o que é gerado (img/)
+    project_web.app.static_folder = shutil.copytree(project_web.app.static_folder, pasta / "static",
+                                                    ignore=shutil.ignore_patterns("img"))
+    project_web.PASTA_EXPORTS = str(pasta / "exports")
+    project_web.PASTA_TAREFAS_EXPORTACAO = os.path.join(project_web.PASTA_EXPORTS, "tarefas")
+    project_web.preparar()
+    project_web.app.config["TESTING"] = True
+    return project_web.app
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def conn(app):
+    conexao = project_web.conectar_bd()
+    yield conexao
+    conexao.close()
+
+
+@pytest.fixture
+def autenticado(cliente, conn):
+    """Cria um cliente novo e guarda-o na sessão do cliente de testes; devolve o id."""
+    usuario = f"teste{next(_NUMERO_CLIENTE)}"
+    cursor = conn.execute("INSERT INTO clientes (nome, usuario, senha) VALUES (?, ?, ?)", (usuario, usuario, "senha"))
+    conn.commit()
+    with cliente.session_transaction() as sessao:
+        sessao["usuario"] = usuario
+        sessao["cliente_id"] = cursor.lastrowid
+        sessao["nome"] = usuario
+    return cursor.lastrowid
+
+
+@pytest.fixture
+def pasta_temporaria():
+    with tempfile.TemporaryDirectory() as pasta:
+        yield pasta
+
+
+@pytest.fixture
+def base(conn, pasta_temporaria):
+    """Cópia da base de dados de testes numa pasta temporária: o teste pode alterá-la sem afetar os outros."""
+    copia = nova_conexao(os.path.join(pasta_temporaria, "copia.db"))
+    conn.backup(copia)
+    yield copia
+    copia.close()
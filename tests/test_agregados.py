@@ -0,0 +1,55 @@
+import reservas
+
+"""
+test_agregados.py
+
+Totais por mês e por cliente mantidos pelos triggers: depois de criar, alterar e cancelar reservas
+têm de ser iguais a um GROUP BY sobre as reservas não canceladas.
+"""
+
+
+def totais_diretos(conn):
+    meses = {
+        mes: (n, round(total, 2)) for mes, n, total in conn.execute('''
+            SELECT substr(data_inicio, 1, 7), COUNT(*), SUM(valor_total)
+            FROM reservas WHERE status IS NOT 'Cancelada' GROUP BY 1
+        ''')
+    }
+    clientes = {
+        cliente_id: round(total, 2) for cliente_id, total in conn.execute('''
+            SELECT cliente_id, SUM(valor_total) FROM reservas WHERE status IS NOT 'Cancelada' GROUP BY 1
+        ''')
+    }
+    return meses, clientes
+
+
+def totais_agregados(conn):
+    #meses/clientes que ficaram a zero depois de cancelamentos não contam
+    meses = {mes: (n, round(total, 2)) for mes, n, total in conn.execute("SELECT * FROM reservas_mensal") if n}
+    clientes = {cliente_id: round(total, 2) for cliente_id, total in conn.execute("SELECT * FROM faturacao_clientes")
+                if round(total, 2)}
+    return meses, clientes
+
+
+def test_triggers_acompanham_as_reservas(base):
+    ids = [
+        base.execute("INSERT INTO clientes (nome, usuario, senha) VALUES (?, ?, 'x')", (nome, nome)).lastrowid
+        for nome in ("agregados_a", "agregados_b")
+    ]
+    base.commit()
+
+    primeira, _ = reservas.criar(base, ids[0], 1, "2033-01-30", "2033-02-02", 30.0)
+    segunda, _ = reservas.criar(base, ids[1], 2, "2033-01-10", "2033-01-11", 45.0)
+    terceira, _ = reservas.criar(base, ids[1], 3, "2033-03-01", "2033-03-03", 120.0)
+    assert totais_agregados(base) == totais_diretos(base)
+
+    #mudar datas troca o mês e o valor; cancelar subtrai
+    reservas.alterar_datas(base, primeira, "2033-02-05", "2033-02-06")
+    reservas.cancelar(base, segunda)
+    assert totais_agregados(base) == totais_diretos(base)
+
+    #voltar a ativar uma cancelada e mudar o cliente
+    base.execute("UPDATE reservas SET status = 'Ativa', cliente_id = ? WHERE id = ?", (ids[0], segunda))
+    base.execute("UPDATE reservas SET status = 'Concluída' WHERE id = ?", (terceira,))
+    base.commit()
+    assert totais_agregados(base) == totais_diretos(base)
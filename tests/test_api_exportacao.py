@@ -0,0 +1,97 @@
+import csv
+import io
+import os
+import time
+import uuid
+import zipfile
+
+import pytest
+
+import project_web
+
+"""
+test_api_exportacao.py
+
+API /exports: token obrigatório, validação do pedido e ciclo de vida de uma tarefa (fila -> concluída -> zip).
+"""
+
+TOKEN = "token-de-testes"
+
+
+@pytest.fixture
+def com_token(app, monkeypatch):
+    monkeypatch.setitem(app.config, "EXPORTACAO_TOKEN", TOKEN)
+    return {"Authorization": f"Bearer {TOKEN}"}
+
+
+def test_sem_token_configurado_a_api_esta_desligada(cliente):
+    assert cliente.post("/exports", json={}, headers={"Authorization": "Bearer "}).status_code == 403
+
+
+@pytest.mark.parametrize("cabecalhos", [{}, {"Authorization": "Bearer errado"}, {"Authorization": TOKEN + "x"}])
+def test_token_em_falta_ou_errado(cliente, com_token, cabecalhos):
+    assert cliente.post("/exports", json={}, headers=cabecalhos).status_code == 401
+    assert cliente.get(f"/exports/{uuid.uuid4().hex}", headers=cabecalhos).status_code == 401
+    assert cliente.get(f"/exports/{uuid.uuid4().hex}/download", headers=cabecalhos).status_code == 401
+
+
+@pytest.mark.parametrize("corpo", [
+    {"tabelas": 5},
+    {"tabelas": [1, 2]},
+    {"tabelas": {"clientes": True}},
+    {"tabelas": ["clientes", "senhas"]},
+    {"formato": "pdf"},
+    {"formato": ["csv"]},
+    ["clientes"],
+    "clientes",
+])
+def test_pedido_invalido(cliente, com_token, corpo):
+    resposta = cliente.post("/exports", json=corpo, headers=com_token)
+    assert resposta.status_code == 400
+    assert "erro" in resposta.get_json()
+
+
+def test_json_malformado(cliente, com_token):
+    resposta = cliente.post("/exports", data="{", content_type="application/json", headers=com_token)
+    assert resposta.status_code == 400
+
+
+def test_tarefa_desconhecida_ou_por_acabar(cliente, com_token):
+    assert cliente.get(f"/exports/{uuid.uuid4().hex}", headers=com_token).status_code == 404
+    assert cliente.get("/exports/../estado.json", headers=com_token).status_code == 404
+
+    #uma tarefa ainda na fila não tem download
+    tarefa_id = uuid.uuid4().hex
+    pasta = os.path.join(project_web.PASTA_TAREFAS_EXPORTACAO, tarefa_id)
+    os.makedirs(pasta)
+    estado = {"id": tarefa_id, "estado": "em_fila", "formato": "csv", "tabelas": ["clientes"], "linhas": {"clientes": 0}}
+    project_web.tarefas_exportacao._gravar_estado(pasta, estado)
+    resposta = cliente.get(f"/exports/{tarefa_id}/download", headers=com_token)
+    assert resposta.status_code == 409
+    assert "url_download" not in resposta.get_json()
+
+
+def test_ciclo_de_vida_e_download(cliente, com_token, conn):
+    resposta = cliente.post("/exports", json={"formato": "csv", "tabelas": ["clientes", "veiculos"]}, headers=com_token)
+    assert resposta.status_code == 202
+    estado = resposta.get_json()
+    assert estado["estado"] == "em_fila"
+    assert estado["linhas"] == {"clientes": 0, "veiculos": 0}
+
+    #a exportação corre num processo à parte: espera que acabe
+    limite = time.monotonic() + 60
+    while estado["estado"] in ("em_fila", "a_correr") and time.monotonic() < limite:
+        time.sleep(0.1)
+        estado = cliente.get(estado["url_estado"], headers=com_token).get_json()
+    assert estado["estado"] == "concluida", estado
+
+    resposta = cliente.get(estado["url_download"], headers=com_token)
+    assert resposta.status_code == 200
+    assert resposta.mimetype == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(resposta.data)) as arquivo_zip:
+        assert sorted(arquivo_zip.namelist()) == ["clientes.csv", "veiculos.csv"]
+        for tabela in ("clientes", "veiculos"):
+            linhas = list(csv.reader(io.TextIOWrapper(arquivo_zip.open(f"{tabela}.csv"), encoding="utf-8")))
+            total = conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+            assert len(linhas) - 1 == estado["linhas"][tabela] == total
+    resposta.close()
@@ -0,0 +1,68 @@
+import csv
+import os
+
+import agregados
+import arquivo
+import exportacao
+
+"""
+test_arquivo.py
+
+Arquivo por ano com mais anos do que o limite de bases ligadas do SQLite (10 por conexão):
+arquivar, reconstruir os agregados e exportar com o histórico têm de continuar a funcionar.
+"""
+
+ANOS = range(2008, 2022)    #14 anos
+
+
+def preparar_arquivo(base):
+    cliente_id = base.execute("INSERT INTO clientes (nome, usuario, senha) VALUES ('Arquivo', 'arquivo', 'x')").lastrowid
+    for ano in ANOS:
+        reserva_id = base.execute('''
+            INSERT INTO reservas (cliente_id, veiculo_id, data_inicio, data_fim, valor_total, status)
+            VALUES (?, 1, ?, ?, 100.0, 'Concluída')
+        ''', (cliente_id, f"{ano}-03-01", f"{ano}-03-02")).lastrowid
+        base.execute('''
+            INSERT INTO pagamentos (reserva_id, numero_cartao, nome_cartao, validade, codigo_seg)
+            VALUES (?, '4000000000000000', 'Arquivo', '2030-01', 123)
+        ''', (reserva_id,))
+    base.commit()
+    return cliente_id
+
+
+def test_mais_anos_do_que_bases_ligadas(base, pasta_temporaria):
+    cliente_id = preparar_arquivo(base)
+    ativas = base.execute("SELECT COUNT(*) FROM reservas").fetchone()[0] - len(ANOS)
+    total_cliente = base.execute("SELECT total FROM faturacao_clientes WHERE cliente_id = ?", (cliente_id,)).fetchone()[0]
+
+    assert arquivo.arquivar(base, "2022-01-01", ("Concluída",), 5) == len(ANOS)
+    assert arquivo.anos_arquivados(arquivo.pasta_arquivo(base)) == list(ANOS)
+    assert base.execute("SELECT COUNT(*) FROM reservas").fetchone()[0] == ativas
+    #nenhum ano fica ligado depois de percorrer o arquivo
+    assert len(list(arquivo.fontes(base, "reservas"))) == len(ANOS) + 1
+    assert [linha[1] for linha in base.execute("PRAGMA database_list")] == ["main"]
+
+    agregados.reconstruir(base)
+    assert base.execute("SELECT total FROM faturacao_clientes WHERE cliente_id = ?", (cliente_id,)).fetchone()[0] == total_cliente
+    assert base.execute("SELECT reservas FROM reservas_mensal WHERE mes = '2008-03'").fetchone()[0] == 1
+
+    caminho = os.path.join(pasta_temporaria, "pagamentos.csv")
+    linhas = exportacao.exportar_tabela(base, "pagamentos", caminho, "csv", com_historico=True)
+    with open(caminho, newline="", encoding="utf-8-sig") as ficheiro:
+        exportadas = list(csv.DictReader(ficheiro))
+    assert linhas == len(exportadas) == base.execute("SELECT COUNT(*) FROM pagamentos").fetchone()[0] + len(ANOS)
+
+
+def test_exportacao_incremental_inclui_o_arquivo(base, pasta_temporaria):
+    preparar_arquivo(base)
+    arquivo.arquivar(base, "2022-01-01", ("Concluída",), 5)
+    total = base.execute("SELECT COUNT(*) FROM reservas").fetchone()[0] + len(ANOS)
+    pasta = os.path.join(pasta_temporaria, "exports")
+    caminho = os.path.join(pasta, "reservas.csv")
+
+    #sem estado: a primeira execução reescreve o ficheiro com o histórico
+    assert exportacao.exportar_incremental(base, pasta, formatos=("csv",), tabelas=["reservas"])[caminho] == total
+    with open(caminho, newline="", encoding="utf-8") as ficheiro:
+        assert len(list(csv.DictReader(ficheiro))) == total
+    #e a seguinte não volta a juntar as linhas arquivadas
+    assert exportacao.exportar_incremental(base, pasta, formatos=("csv",), tabelas=["reservas"])[caminho] == 0
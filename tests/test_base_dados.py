@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from base_dados import PoolConexoes, nova_conexao, transacao_imediata
+
+"""
+test_base_dados.py
+
+Pool de conexões (reutilização LIFO, limite de conexões emprestadas, recomeço depois de um fork)
+e transacao_imediata.
+"""
+
+
+@pytest.fixture
+def caminho(pasta_temporaria):
+    caminho = os.path.join(pasta_temporaria, "pool.db")
+    conn = nova_conexao(caminho)
+    conn.execute("CREATE TABLE valores (valor INTEGER)")
+    conn.commit()
+    conn.close()
+    return caminho
+
+
+@pytest.fixture
+def pool(caminho):
+    pool = PoolConexoes(caminho, tamanho_max=2, espera=0.05)
+    yield pool
+    pool.fechar()
+
+
+def test_reutilizacao_lifo(pool):
+    primeira, segunda = pool.obter(), pool.obter()
+    assert primeira is not segunda
+    pool.devolver(primeira)
+    pool.devolver(segunda)
+    #a última devolvida é a primeira a ser reutilizada (cache de páginas ainda quente)
+    assert pool.obter() is segunda
+    assert pool.obter() is primeira
+
+
+def test_limite_de_conexoes_emprestadas(pool):
+    emprestadas = [pool.obter(), pool.obter()]
+    with pytest.raises(sqlite3.OperationalError, match="esgotado"):
+        pool.obter()
+
+    #quem está à espera recebe a conexão assim que uma é devolvida
+    pool.espera = 5
+    recebida = []
+    espera = threading.Thread(target=lambda: recebida.append(pool.obter()))
+    espera.start()
+    pool.devolver(emprestadas[0])
+    espera.join(timeout=5)
+    assert recebida == [emprestadas[0]]
+
+
+def test_devolver_desfaz_transacao_aberta(pool):
+    conn = pool.obter()
+    conn.execute("INSERT INTO valores VALUES (1)")
+    assert conn.in_transaction
+    pool.devolver(conn)
+    conn = pool.obter()
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM valores").fetchone()[0] == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="precisa de os.fork")
+def test_pool_recomeca_depois_de_fork(pool):
+    livre = pool.obter()
+    pool.devolver(livre)
+    emprestadas = [pool.obter(), pool.obter()]      #o pool do pai fica esgotado
+
+    leitura, escrita = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        #filho: nada herdado do pai (nem a conexão livre, nem as vagas ocupadas)
+        try:
+            conn = pool.obter()
+            ok = conn not in emprestadas and conn is not livre and pool._pid == os.getpid()
+            ok = ok and conn.execute("SELECT COUNT(*) FROM valores").fetchone()[0] == 0
+            pool.devolver(conn)
+            os.write(escrita, b"1" if ok else b"0")
+        finally:
+            os._exit(0)
+    os.close(escrita)
+    with os.fdopen(leitura, "rb") as resultado:
+        assert resultado.read() == b"1"
+    os.waitpid(pid, 0)
+    #o pai continua com o seu pool
+    with pytest.raises(sqlite3.OperationalError):
+        pool.obter()
+    for conn in emprestadas:
+        pool.devolver(conn)
+
+
+def test_transacao_imediata(caminho):
+    conn = nova_conexao(caminho)
+    with transacao_imediata(conn):
+        conn.execute("INSERT INTO valores VALUES (1)")
+    assert not conn.in_transaction
+
+    with pytest.raises(ZeroDivisionError):
+        with transacao_imediata(conn):
+            conn.execute("INSERT INTO valores VALUES (2)")
+            1 / 0
+    assert [linha[0] for linha in conn.execute("SELECT valor FROM valores")] == [1]
+    conn.close()
+
+
+def test_transacao_imediata_com_trabalho_por_gravar(caminho):
+    conn = nova_conexao(caminho)
+    conn.execute("INSERT INTO valores VALUES (3)")      #transação implícita, ainda sem commit
+    with pytest.raises(sqlite3.ProgrammingError):
+        with transacao_imediata(conn):
+            pass
+    #o trabalho pendente não foi gravado às escondidas: o chamador decide
+    conn.rollback()
+    outra = nova_conexao(caminho)
+    assert outra.execute("SELECT COUNT(*) FROM valores").fetchone()[0] == 0
+    outra.close()
+    conn.close()
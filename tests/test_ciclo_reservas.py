@@ -0,0 +1,129 @@
+import time
+from datetime import date
+
+import pytest
+
+import arquivo
+import ciclo_reservas
+import reservas
+
+"""
+test_ciclo_reservas.py
+
+Ciclo de vida das reservas com uma data fixa: reservas ativas já terminadas passam a 'Concluída'
+(em lotes) e as concluídas/canceladas com mais de dias_arquivo dias vão para o arquivo por ano,
+com os pagamentos; o mesmo pela thread CicloReservas.
+"""
+
+HOJE = date(2030, 6, 15)        #com 730 dias o limite do arquivo é 2028-06-16
+
+RESERVAS = {
+    #nome: (data_inicio, data_fim, status)
+    "terminada_1": ("2030-06-01", "2030-06-10", "Ativa"),
+    "terminada_2": ("2030-06-02", "2030-06-11", "Ativa"),
+    "terminada_3": ("2030-06-03", "2030-06-12", "Ativa"),
+    "termina_hoje": ("2030-06-10", "2030-06-15", "Ativa"),
+    "futura": ("2030-06-20", "2030-07-01", "Ativa"),
+    "antiga_concluida": ("2028-01-05", "2028-01-10", "Concluída"),
+    "antiga_cancelada": ("2027-05-01", "2027-05-02", "Cancelada"),
+    "no_limite": ("2028-06-10", "2028-06-16", "Concluída"),
+    "antiga_ativa": ("2026-12-30", "2027-01-01", "Ativa"),
+}
+
+
+class _Data(date):
+    @classmethod
+    def today(cls):
+        return HOJE
+
+
+@pytest.fixture
+def reservas_fixas(base):
+    #só as reservas do teste, em veículos diferentes para não se sobreporem
+    base.execute("DELETE FROM pagamentos")
+    base.execute("DELETE FROM reservas")
+    cliente_id = base.execute("INSERT INTO clientes (nome, usuario, senha) VALUES ('Ciclo', 'ciclo', 'x')").lastrowid
+    ids = {}
+    for numero, (nome, (inicio, fim, status)) in enumerate(RESERVAS.items()):
+        ids[nome] = base.execute('''
+            INSERT INTO reservas (cliente_id, veiculo_id, data_inicio, data_fim, valor_total, status)
+            VALUES (?, ?, ?, ?, 50.0, ?)
+        ''', (cliente_id, numero % 7 + 1, inicio, fim, status)).lastrowid
+    base.execute('''
+        INSERT INTO pagamentos (reserva_id, numero_cartao, nome_cartao, validade, codigo_seg)
+        VALUES (?, '4000000000000000', 'Ciclo', '2030-01', 123)
+    ''', (ids["antiga_concluida"],))
+    base.commit()
+    return ids
+
+
+def estados(conn, ids):
+    linhas = dict(conn.execute("SELECT id, status FROM reservas").fetchall())
+    return {nome: linhas.get(reserva_id, "arquivada") for nome, reserva_id in ids.items()}
+
+
+ESPERADO = {
+    "terminada_1": "Concluída",
+    "terminada_2": "Concluída",
+    "terminada_3": "Concluída",
+    "termina_hoje": "Ativa",
+    "futura": "Ativa",
+    "antiga_concluida": "arquivada",
+    "antiga_cancelada": "arquivada",
+    "no_limite": "Concluída",
+    "antiga_ativa": "arquivada",     #concluída e arquivada na mesma execução
+}
+
+
+def arquivadas(conn, tabela):
+    #cada ano só está ligado enquanto o gerador não avança: ler dentro do ciclo
+    ids = []
+    for fonte in arquivo.fontes(conn, tabela):
+        if not fonte.startswith("main."):
+            ids.extend(linha[0] for linha in conn.execute(f"SELECT id FROM {fonte}"))
+    return sorted(ids)
+
+
+def test_concluir_em_lotes(base, reservas_fixas):
+    #4 ativas terminadas com lotes de 3: dois lotes
+    assert reservas.concluir_terminadas(base, HOJE.isoformat(), tamanho_lote=3) == 4
+    assert reservas.concluir_terminadas(base, HOJE.isoformat(), tamanho_lote=3) == 0
+    assert estados(base, reservas_fixas)["termina_hoje"] == "Ativa"
+
+
+def test_executar(base, reservas_fixas):
+    resultado = ciclo_reservas.executar(base, HOJE, dias_arquivo=730, tamanho_lote=2)
+    assert resultado == {"concluidas": 4, "arquivadas": 3}
+    assert estados(base, reservas_fixas) == ESPERADO
+
+    assert arquivo.anos_arquivados(arquivo.pasta_arquivo(base)) == [2026, 2027, 2028]
+    assert arquivadas(base, "reservas") == sorted(reservas_fixas[nome] for nome, estado in ESPERADO.items() if estado == "arquivada")
+    assert base.execute("SELECT COUNT(*) FROM pagamentos").fetchone()[0] == 0
+    assert len(arquivadas(base, "pagamentos")) == 1
+
+    #nada de novo na execução seguinte
+    assert ciclo_reservas.executar(base, HOJE, dias_arquivo=730, tamanho_lote=2) == {"concluidas": 0, "arquivadas": 0}
+
+
+def test_dias_arquivo(base, reservas_fixas):
+    #com um ano, as concluídas até 2029-06-15 também vão para o arquivo
+    ciclo_reservas.executar(base, HOJE, dias_arquivo=365)
+    assert estados(base, reservas_fixas)["no_limite"] == "arquivada"
+    assert estados(base, reservas_fixas)["terminada_1"] == "Concluída"
+
+
+def test_thread(base, reservas_fixas, monkeypatch):
+    monkeypatch.setattr(ciclo_reservas, "date", _Data)
+    caminho = base.execute("PRAGMA database_list").fetchone()[2]
+    ciclo = ciclo_reservas.CicloReservas(caminho, intervalo=3600, dias_arquivo=730)
+    ciclo.start()
+    try:
+        limite = time.monotonic() + 10
+        while ciclo.ultimo_resultado is None and time.monotonic() < limite:
+            time.sleep(0.02)
+    finally:
+        ciclo.parar()
+        ciclo.join(timeout=10)
+    assert not ciclo.is_alive()
+    assert ciclo.ultimo_resultado == {"concluidas": 4, "arquivadas": 3}
+    assert estados(base, reservas_fixas) == ESPERADO
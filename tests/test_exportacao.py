@@ -0,0 +1,89 @@
+import csv
+import os
+
+import pytest
+from openpyxl import load_workbook
+
+import exportacao
+
+"""
+test_exportacao.py
+
+Exportação incremental: linhas novas no fim do CSV ou numa parte à parte (XLSX, Parquet), sem reescrever
+o ficheiro principal, ou reescrita completa quando as colunas da tabela mudaram desde a exportação anterior.
+"""
+
+
+def ler(caminho, formato):
+    if formato == "csv":
+        with open(caminho, newline="", encoding="utf-8") as ficheiro:
+            linhas = list(csv.reader(ficheiro))
+        return linhas[0], linhas[1:]
+    if formato == "xlsx":
+        livro = load_workbook(caminho, read_only=True)
+        linhas = [list(linha) for linha in livro.worksheets[0].iter_rows(values_only=True)]
+        livro.close()
+        #o modo write-only não grava as células vazias no fim da linha
+        return linhas[0], [linha + [None] * (len(linhas[0]) - len(linha)) for linha in linhas[1:]]
+    tabela = pytest.importorskip("pyarrow.parquet").read_table(caminho)
+    return tabela.column_names, [list(linha.values()) for linha in tabela.to_pylist()]
+
+
+@pytest.mark.parametrize("formato", ["csv", "xlsx", "parquet"])
+def test_linhas_novas_nao_reescrevem_o_ficheiro(base, pasta_temporaria, formato):
+    if formato == "parquet":
+        pytest.importorskip("pyarrow")
+    pasta = os.path.join(pasta_temporaria, "exports")
+    caminho = os.path.join(pasta, f"clientes.{formato}")
+    exportado = exportacao.exportar_incremental(base, pasta, formatos=(formato,), tabelas=["clientes"])[caminho]
+    antes = os.stat(caminho)
+
+    for numero in range(2):
+        base.execute("INSERT INTO clientes (nome, usuario, senha) VALUES ('Novo', ?, 'x')", (f"novo_parte{numero}",))
+        base.commit()
+        assert exportacao.exportar_incremental(base, pasta, formatos=(formato,), tabelas=["clientes"])[caminho] == 1
+    assert exportacao.exportar_incremental(base, pasta, formatos=(formato,), tabelas=["clientes"])[caminho] == 0
+
+    partes = exportacao.partes(pasta, "clientes", formato)
+    if formato == "csv":
+        #anexado no próprio ficheiro
+        assert partes == []
+        assert len(ler(caminho, formato)[1]) == exportado + 2
+        #linhas de uma execução interrompida antes de gravar o estado não ficam duplicadas
+        with open(caminho, "a", encoding="utf-8") as ficheiro:
+            ficheiro.write("999,a meio\r\n")
+        base.execute("INSERT INTO clientes (nome, usuario, senha) VALUES ('Novo', 'novo_parte2', 'x')")
+        base.commit()
+        assert exportacao.exportar_incremental(base, pasta, formatos=(formato,), tabelas=["clientes"])[caminho] == 1
+        assert [linha[2] for linha in ler(caminho, formato)[1][-3:]] == ["novo_parte0", "novo_parte1", "novo_parte2"]
+    else:
+        #o ficheiro principal fica como estava e cada execução com linhas novas escreve uma parte
+        assert (os.stat(caminho).st_mtime_ns, os.stat(caminho).st_size) == (antes.st_mtime_ns, antes.st_size)
+        assert [os.path.basename(parte) for parte in partes] == [f"clientes.parte-0001.{formato}", f"clientes.parte-0002.{formato}"]
+        assert [ler(parte, formato)[1][0][2] for parte in partes] == ["novo_parte0", "novo_parte1"]
+
+
+@pytest.mark.parametrize("formato", ["csv", "xlsx", "parquet"])
+def test_coluna_nova_reescreve_o_ficheiro(base, pasta_temporaria, formato):
+    if formato == "parquet":
+        pytest.importorskip("pyarrow")
+    pasta = os.path.join(pasta_temporaria, "exports")
+    caminho = os.path.join(pasta, f"clientes.{formato}")
+
+    exportacao.exportar_incremental(base, pasta, formatos=(formato,), tabelas=["clientes"])
+    base.execute("INSERT INTO clientes (nome, usuario, senha) VALUES ('Novo', 'novo_exportacao', 'x')")
+    base.commit()
+    assert exportacao.exportar_incremental(base, pasta, formatos=(formato,), tabelas=["clientes"])[caminho] == 1
+
+    base.execute("ALTER TABLE clientes ADD COLUMN telefone TEXT")
+    base.execute("INSERT INTO clientes (nome, usuario, senha, telefone) VALUES ('Outro', 'outro_exportacao', 'x', '910000000')")
+    base.commit()
+    total = base.execute("SELECT COUNT(*) FROM clientes").fetchone()[0]
+    assert exportacao.exportar_incremental(base, pasta, formatos=(formato,), tabelas=["clientes"])[caminho] == total
+
+    cabecalho, linhas = ler(caminho, formato)
+    assert exportacao.partes(pasta, "clientes", formato) == []
+    assert cabecalho == exportacao.colunas_tabela(base, "clientes")
+    assert len(linhas) == total
+    assert all(len(linha) == len(cabecalho) for linha in linhas)
+    assert linhas[-1][cabecalho.index("telefone")] == "910000000"
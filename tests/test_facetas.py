@@ -0,0 +1,52 @@
+from datetime import date
+
+import disponibilidade
+import facetas
+import frota
+import reservas
+
+"""
+test_facetas.py
+
+Contagens das facetas: os triggers marcam a tabela como desatualizada e o recálculo
+tem de dar o mesmo que um GROUP BY direto sobre os veículos disponíveis.
+"""
+
+
+def contagens_diretas(conn, hoje):
+    return {
+        faceta: [tuple(linha) for linha in conn.execute(f'''
+            SELECT v.{faceta}, COUNT(*) FROM veiculos v
+            WHERE {disponibilidade.SQL_SEM_RESERVA_ATIVA}
+            GROUP BY v.{faceta} ORDER BY v.{faceta}
+        ''', (hoje,))]
+        for faceta in facetas.FACETAS
+    }
+
+
+def sujo(conn):
+    return conn.execute("SELECT sujo FROM facetas_estado").fetchone()[0]
+
+
+def test_triggers_e_recalculo(base):
+    hoje = date.today().isoformat()
+    assert facetas.obter_contagens(base, hoje) == contagens_diretas(base, hoje)
+    assert sujo(base) == 0
+
+    #reservar um carro tira-o das contagens de hoje
+    cliente_id = base.execute("INSERT INTO clientes (nome, usuario, senha) VALUES ('F', 'facetas', 'x')").lastrowid
+    base.commit()
+    reservas.criar(base, cliente_id, 1, hoje, hoje, 30.0)
+    assert sujo(base) == 1
+    assert facetas.obter_contagens(base, hoje) == contagens_diretas(base, hoje)
+
+    #mudar a categoria de um veículo move-o de faceta
+    frota.atualizar(base, 2, categoria="Carro Pequeno")
+    assert sujo(base) == 1
+    contagens = facetas.obter_contagens(base, hoje)
+    assert contagens == contagens_diretas(base, hoje)
+    assert "Carro Médio" not in dict(contagens["categoria"])
+
+    #alterações a colunas que não são facetas não obrigam a recalcular
+    frota.atualizar(base, 3, valor_diaria=99.0)
+    assert sujo(base) == 0
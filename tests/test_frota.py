@@ -0,0 +1,51 @@
+import cache
+import frota
+
+"""
+test_frota.py
+
+Cache de veículos por processo: um acerto não vai ao SQLite, e a invalidação passa pela geração
+partilhada "frota" da cache, por isso chega aos outros workers (ao fim de frota.VERIFICAR_SEGUNDOS).
+"""
+
+
+def test_acerto_nao_vai_ao_sqlite(app, conn, monkeypatch):
+    frota.obter(conn, 1)
+    instrucoes = []
+    leituras = []
+    contador = cache.contador
+    monkeypatch.setattr(cache, "contador", lambda espaco: leituras.append(espaco) or contador(espaco))
+    conn.set_trace_callback(instrucoes.append)
+    try:
+        for _ in range(100):
+            assert frota.obter(conn, 1).id == 1
+    finally:
+        conn.set_trace_callback(None)
+    assert instrucoes == []
+    assert leituras == []
+
+
+def test_invalidacao_noutro_worker(app, conn, monkeypatch):
+    original = frota.obter(conn, 1).valor_diaria
+    try:
+        #outro worker grava o preço novo e invalida: aqui só muda a base de dados e a geração partilhada
+        conn.execute("UPDATE veiculos SET valor_diaria = ? WHERE id = 1", (original + 10,))
+        conn.commit()
+        cache.invalidar("frota")
+        assert frota.obter(conn, 1).valor_diaria == original    #ainda dentro de VERIFICAR_SEGUNDOS
+        monkeypatch.setattr(frota, "VERIFICAR_SEGUNDOS", 0)
+        assert frota.obter(conn, 1).valor_diaria == original + 10
+    finally:
+        frota.atualizar(conn, 1, valor_diaria=original)
+    assert frota.obter(conn, 1).valor_diaria == original
+
+
+def test_atualizar_invalida(app, conn):
+    original = frota.obter(conn, 2).valor_diaria
+    geracao = cache.contador("frota")
+    frota.atualizar(conn, 2, valor_diaria=original + 1)
+    try:
+        assert cache.contador("frota") == geracao + 1
+        assert frota.obter(conn, 2).valor_diaria == original + 1
+    finally:
+        frota.atualizar(conn, 2, valor_diaria=original)
@@ -0,0 +1,60 @@
+import csv
+import os
+
+import exportacao
+import importacao
+
+"""
+test_importacao.py
+
+Importação da frota: exportar -> editar -> importar, com os carros padrão ainda sem matrícula.
+"""
+
+
+def ler_csv(caminho):
+    with open(caminho, newline="", encoding="utf-8-sig") as ficheiro:
+        return list(csv.DictReader(ficheiro))
+
+
+def escrever_csv(caminho, linhas):
+    with open(caminho, "w", newline="", encoding="utf-8") as ficheiro:
+        escritor = csv.DictWriter(ficheiro, fieldnames=list(linhas[0]))
+        escritor.writeheader()
+        escritor.writerows(linhas)
+
+
+def test_ida_e_volta_da_exportacao(base, pasta_temporaria):
+    caminho = os.path.join(pasta_temporaria, "veiculos.csv")
+    exportacao.exportar_tabela(base, "veiculos", caminho, "csv")
+    linhas = ler_csv(caminho)
+    assert all(not linha["matricula"] for linha in linhas)
+
+    for linha in linhas:
+        if linha["modelo"] == "Civic":
+            linha["valor_diaria"] = "47.5"
+        if linha["modelo"] == "500":
+            linha["matricula"] = "aa-01-bb"
+    escrever_csv(caminho, linhas)
+
+    relatorio = importacao.importar(base, caminho)
+    assert relatorio["invalidas"] == 0, relatorio["erros"]
+    assert (relatorio["inseridas"], relatorio["atualizadas"], relatorio["inalteradas"]) == (0, 2, len(linhas) - 2)
+    assert base.execute("SELECT valor_diaria FROM veiculos WHERE modelo = 'Civic'").fetchone()[0] == 47.5
+    assert base.execute("SELECT matricula FROM veiculos WHERE modelo = '500'").fetchone()[0] == "AA-01-BB"
+    assert base.execute("SELECT COUNT(*) FROM veiculos").fetchone()[0] == len(linhas)
+
+    #importar de novo o mesmo ficheiro não muda nada
+    relatorio = importacao.importar(base, caminho)
+    assert (relatorio["inseridas"], relatorio["atualizadas"], relatorio["inalteradas"]) == (0, 0, len(linhas))
+
+
+def test_linha_sem_matricula_nem_veiculo(base, pasta_temporaria):
+    caminho = os.path.join(pasta_temporaria, "veiculos.csv")
+    exportacao.exportar_tabela(base, "veiculos", caminho, "csv")
+    linhas = ler_csv(caminho)
+    escrever_csv(caminho, [dict(linhas[0], id="999"), dict(linhas[0], id="")])
+
+    relatorio = importacao.importar(base, caminho)
+    assert relatorio["invalidas"] == 2
+    assert sorted(erro["linha"] for erro in relatorio["erros"]) == [2, 3]
+    assert relatorio["inseridas"] == relatorio["atualizadas"] == 0
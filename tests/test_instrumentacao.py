@@ -0,0 +1,82 @@
+import os
+import pstats
+import re
+
+import pytest
+
+"""
+test_instrumentacao.py
+
+Server-Timing em cada resposta, acesso a /metrics (local, token, remoto) e perfil cProfile só quando ligado.
+"""
+
+REMOTO = {"REMOTE_ADDR": "203.0.113.7"}
+
+
+def test_server_timing(cliente, autenticado):
+    resposta = cliente.get("/carros")
+    assert resposta.status_code == 200
+    partes = {parte.split(";")[0]: parte for parte in resposta.headers["Server-Timing"].split(", ")}
+    assert re.fullmatch(r"total;dur=\d+\.\d", partes["total"])
+    consultas = re.fullmatch(r'sql;dur=\d+\.\d;desc="(\d+) consultas"', partes["sql"])
+    assert consultas and int(consultas.group(1)) > 0
+    assert any('desc="render_template:carros.html"' in parte for nome, parte in partes.items() if nome.startswith("span"))
+
+
+def test_server_timing_sem_sql(cliente):
+    #a página de login não usa a base de dados
+    resposta = cliente.get("/")
+    assert 'sql;dur=0.0;desc="0 consultas"' in resposta.headers["Server-Timing"]
+
+
+def test_metrics_local_sem_token(cliente, autenticado):
+    cliente.get("/carros")
+    for endereco in ("127.0.0.1", "::1"):
+        resposta = cliente.get("/metrics", environ_base={"REMOTE_ADDR": endereco})
+        assert resposta.status_code == 200
+        assert resposta.mimetype == "text/plain"
+    texto = resposta.get_data(as_text=True)
+    assert "# TYPE pedidos_http_segundos histogram" in texto
+    assert 'pedidos_http_segundos_count{endpoint="listar_carros",metodo="GET",estado="200"}' in texto
+    assert 'sql_linhas_total{operacao="SELECT",tabela="veiculos"}' in texto
+
+
+def test_metrics_remoto_sem_token(cliente):
+    assert cliente.get("/metrics", environ_base=REMOTO).status_code == 403
+
+
+@pytest.mark.parametrize("cabecalhos, remoto, estado", [
+    ({"Authorization": "Bearer metricas"}, True, 200),
+    ({"Authorization": "Bearer metricas"}, False, 200),
+    ({"Authorization": "Bearer outro"}, True, 403),
+    ({}, False, 403),     #com token configurado, ser local já não chega
+    ({}, True, 403),
+])
+def test_metrics_com_token(app, cliente, monkeypatch, cabecalhos, remoto, estado):
+    monkeypatch.setitem(app.config, "METRICAS_TOKEN", "metricas")
+    resposta = cliente.get("/metrics", headers=cabecalhos, environ_base=REMOTO if remoto else {})
+    assert resposta.status_code == estado
+
+
+def test_perfil_desligado_por_omissao(app, cliente, pasta_temporaria, monkeypatch):
+    monkeypatch.setitem(app.config, "PERFIL_PASTA", os.path.join(pasta_temporaria, "perfis"))
+    resposta = cliente.get("/", query_string={"_perfil": "1"}, headers={"X-Perfil": "1"})
+    assert "X-Perfil-Ficheiro" not in resposta.headers
+    assert not os.path.exists(app.config["PERFIL_PASTA"])
+
+
+def test_perfil_a_pedido(app, cliente, pasta_temporaria, monkeypatch):
+    pasta = os.path.join(pasta_temporaria, "perfis")
+    monkeypatch.setitem(app.config, "PERFIL_PEDIDOS", True)
+    monkeypatch.setitem(app.config, "PERFIL_PASTA", pasta)
+
+    #ligado, mas só para os pedidos que o pedem
+    assert "X-Perfil-Ficheiro" not in cliente.get("/").headers
+
+    for pedido in ({"query_string": {"_perfil": "1"}}, {"headers": {"X-Perfil": "1"}}):
+        nome = cliente.get("/", **pedido).headers["X-Perfil-Ficheiro"]
+        assert re.search(rf"-home-{os.getpid()}-\d+\.prof$", nome)
+        estatisticas = pstats.Stats(os.path.join(pasta, nome))
+        assert any(funcao[2] == "home" for funcao in estatisticas.stats)
+    #pedidos no mesmo segundo não se sobrepõem
+    assert len(os.listdir(pasta)) == 2
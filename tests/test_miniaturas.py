@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+import miniaturas
+
+"""
+test_miniaturas.py
+
+Miniaturas: uma imagem ilegível fica sem miniaturas (o catálogo mostra o original) sem travar as outras,
+e o manifesto não perde entradas quando vários processos o atualizam ao mesmo tempo.
+"""
+
+ORIGINAL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "civic.jpg")
+
+
+def test_imagem_corrompida_fica_com_o_original(pasta_temporaria):
+    shutil.copyfile(ORIGINAL, os.path.join(pasta_temporaria, "civic.jpg"))
+    with open(os.path.join(pasta_temporaria, "corrompida.jpg"), "wb") as ficheiro:
+        ficheiro.write(b"isto nao e uma imagem")
+
+    assert miniaturas.gerar(pasta_temporaria, ["corrompida.jpg", "civic.jpg", "em_falta.jpg"]) == 1
+    assert miniaturas.variantes(pasta_temporaria, "civic.jpg")
+    assert miniaturas.variantes(pasta_temporaria, "corrompida.jpg") == {}
+
+
+def test_imagem_demasiado_grande(pasta_temporaria, monkeypatch):
+    shutil.copyfile(ORIGINAL, os.path.join(pasta_temporaria, "civic.jpg"))
+    assert miniaturas.gerar(pasta_temporaria, ["civic.jpg"]) == 1
+    antigas = os.listdir(os.path.join(pasta_temporaria, miniaturas.PASTA_RELATIVA))
+
+    #acima do dobro de MAX_IMAGE_PIXELS o Pillow recusa abrir (DecompressionBombError)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+    assert miniaturas.gerar(pasta_temporaria, ["civic.jpg"]) == 0
+    assert miniaturas.variantes(pasta_temporaria, "civic.jpg") == {}
+    #as miniaturas que deixaram de estar no manifesto são apagadas
+    assert antigas and os.listdir(os.path.join(pasta_temporaria, miniaturas.PASTA_RELATIVA)) == []
+
+
+def test_garantir_nao_falha_com_imagem_corrompida(base, pasta_temporaria):
+    with open(os.path.join(pasta_temporaria, "corrompida.jpg"), "wb") as ficheiro:
+        ficheiro.write(b"\xff\xd8\xff\xe0 truncada")
+    base.execute("UPDATE veiculos SET imagem = 'corrompida.jpg' WHERE id = 1")
+    base.commit()
+    for imagem in {linha[0] for linha in base.execute("SELECT imagem FROM veiculos")} - {"corrompida.jpg"}:
+        shutil.copyfile(ORIGINAL, os.path.join(pasta_temporaria, imagem))
+
+    gerados = miniaturas.garantir(pasta_temporaria, base)
+    assert gerados == base.execute("SELECT COUNT(DISTINCT imagem) FROM veiculos").fetchone()[0] - 1
+
+
+def test_manifesto_partilhado_entre_processos(pasta_temporaria):
+    imagens = []
+    for numero in range(8):
+        nome = f"imagem{numero}.png"
+        Image.new("RGB", (200, 100), (numero * 30, 0, 0)).save(os.path.join(pasta_temporaria, nome))
+        imagens.append(nome)
+
+    #um processo por imagem, cada um a ler, alterar e gravar o manifesto
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=4, mp_context=contexto) as executor:
+        assert sum(executor.map(miniaturas.gerar, [pasta_temporaria] * len(imagens), [[imagem] for imagem in imagens])) == 8
+    assert sorted(miniaturas._ler_manifesto(pasta_temporaria)) == imagens
@@ -0,0 +1,120 @@
+import base64
+import json
+from contextlib import contextmanager
+
+import pytest
+from flask import template_rendered
+
+import paginacao
+
+"""
+test_paginacao.py
+
+Paginação por keyset em /carros e /minhas_reservas: seguir os cursores para a frente e para trás
+percorre todas as linhas uma só vez e pela mesma ordem, mesmo com valores de ordenação repetidos,
+e um cursor adulterado dá 400.
+"""
+
+
+@contextmanager
+def paginas_renderizadas(app, nome):
+    capturadas = []
+
+    def guardar(remetente, template, context, **extra):
+        if template.name == nome:
+            capturadas.append(context["pagina"])
+
+    template_rendered.connect(guardar, app)
+    try:
+        yield capturadas
+    finally:
+        template_rendered.disconnect(guardar, app)
+
+
+def pedir_pagina(app, cliente, rota, template, **parametros):
+    with paginas_renderizadas(app, template) as capturadas:
+        resposta = cliente.get(rota, query_string=parametros)
+    assert resposta.status_code == 200
+    return capturadas[0]
+
+
+def percorrer(app, cliente, rota, template, por_pagina):
+    """Segue os cursores até ao fim e depois volta ao início; devolve os ids de cada página nos dois sentidos."""
+    pagina = pedir_pagina(app, cliente, rota, template, por_pagina=por_pagina)
+    assert pagina.cursor_anterior is None
+    para_a_frente = [[linha[0] for linha in pagina.linhas]]
+    while pagina.cursor_seguinte:
+        pagina = pedir_pagina(app, cliente, rota, template, por_pagina=por_pagina, apos=pagina.cursor_seguinte)
+        para_a_frente.append([linha[0] for linha in pagina.linhas])
+    para_tras = [[linha[0] for linha in pagina.linhas]]
+    while pagina.cursor_anterior:
+        pagina = pedir_pagina(app, cliente, rota, template, por_pagina=por_pagina, antes=pagina.cursor_anterior)
+        para_tras.append([linha[0] for linha in pagina.linhas])
+    return para_a_frente, para_tras[::-1]
+
+
+def test_catalogo_para_a_frente_e_para_tras(app, cliente, autenticado):
+    todos = [linha[0] for linha in pedir_pagina(app, cliente, "/carros", "carros.html", por_pagina=100).linhas]
+    assert len(todos) > 2
+
+    para_a_frente, para_tras = percorrer(app, cliente, "/carros", "carros.html", 2)
+    assert [carro_id for pagina in para_a_frente for carro_id in pagina] == sorted(todos)
+    assert all(len(pagina) == 2 for pagina in para_a_frente[:-1])
+    assert para_tras == para_a_frente
+
+
+@pytest.fixture
+def reservas_com_datas_repetidas(conn, autenticado):
+    #três reservas no mesmo dia e duas noutro: o id desempata a ordenação
+    datas = ["2031-05-01"] * 3 + ["2031-04-01", "2031-06-01"]
+    for numero, data in enumerate(datas):
+        conn.execute('''
+            INSERT INTO reservas (cliente_id, veiculo_id, data_inicio, data_fim, valor_total, status)
+            VALUES (?, ?, ?, ?, 10.0, 'Concluída')
+        ''', (autenticado, numero % 3 + 1, data, data))
+    conn.commit()
+    return [linha[0] for linha in conn.execute(
+        "SELECT id FROM reservas WHERE cliente_id = ? ORDER BY data_inicio DESC, id DESC", (autenticado,)
+    )]
+
+
+def test_minhas_reservas_com_datas_repetidas(app, cliente, reservas_com_datas_repetidas):
+    esperado = reservas_com_datas_repetidas
+    for por_pagina in (1, 2, 3):
+        para_a_frente, para_tras = percorrer(app, cliente, "/minhas_reservas", "minhas_reservas.html", por_pagina)
+        assert [reserva_id for pagina in para_a_frente for reserva_id in pagina] == esperado
+        assert para_tras == para_a_frente
+
+
+def test_precos_repetidos(base):
+    #metade da frota com a mesma diária: o id desempata, por isso as páginas não saltam nem repetem linhas
+    base.execute("UPDATE veiculos SET valor_diaria = 50.0 WHERE id % 2 = 0")
+    base.commit()
+    esperado = [linha[0] for linha in base.execute("SELECT id FROM veiculos ORDER BY valor_diaria, id")]
+    sql = "SELECT v.id, v.valor_diaria FROM veiculos v WHERE 1 = 1"
+    ordem, chaves = ["v.valor_diaria", "v.id"], ["valor_diaria", "id"]
+
+    pagina = paginacao.paginar(base, sql, (), ordem, chaves, tamanho=2)
+    paginas = [pagina]
+    while pagina.cursor_seguinte:
+        pagina = paginacao.paginar(base, sql, (), ordem, chaves, apos=pagina.cursor_seguinte, tamanho=2)
+        paginas.append(pagina)
+    vistos = [linha["id"] for pagina in paginas for linha in pagina.linhas]
+    assert vistos == esperado
+
+    for anterior, atual in zip(paginas, paginas[1:]):
+        recuada = paginacao.paginar(base, sql, (), ordem, chaves, antes=atual.cursor_anterior, tamanho=2)
+        assert [linha["id"] for linha in recuada.linhas] == [linha["id"] for linha in anterior.linhas]
+
+
+def cursor(valores):
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("rota", ["/carros", "/minhas_reservas"])
+@pytest.mark.parametrize("valor", ["nao-e-um-cursor!", "%%%", cursor({"id": 1}), cursor([1, 2, 3]), cursor("texto"),
+                                   base64.urlsafe_b64encode(b"\xff\xfe").decode()])
+@pytest.mark.parametrize("direcao", ["apos", "antes"])
+def test_cursor_invalido(cliente, autenticado, rota, valor, direcao):
+    resposta = cliente.get(rota, query_string={direcao: valor})
+    assert resposta.status_code == 400
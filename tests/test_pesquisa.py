@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+
+from flask import template_rendered
+
+"""
+test_pesquisa.py
+
+Pesquisa do catálogo (/carros?pesquisa=): texto pelo índice FTS5 e números no nome ou no preço/dia.
+"""
+
+
+@contextmanager
+def carros_renderizados(app):
+    #captura a lista de carros passada ao template carros.html
+    capturados = []
+
+    def guardar(remetente, template, context, **extra):
+        if template.name == "carros.html":
+            capturados.append(context["carros"])
+
+    template_rendered.connect(guardar, app)
+    try:
+        yield capturados
+    finally:
+        template_rendered.disconnect(guardar, app)
+
+
+def pesquisar(app, cliente, termo):
+    with carros_renderizados(app) as capturados:
+        resposta = cliente.get("/carros", query_string={"pesquisa": termo})
+    assert resposta.status_code == 200
+    return {(carro[1], carro[2]) for carro in capturados[0]}
+
+
+def test_numero_no_nome(app, cliente, autenticado):
+    assert ("Fiat", "500") in pesquisar(app, cliente, "500")
+    assert ("Kawasaki", "Ninja 400") in pesquisar(app, cliente, "400")
+
+
+def test_numero_como_preco(app, cliente, autenticado):
+    #Honda Civic: 45.0/dia
+    assert ("Honda", "Civic") in pesquisar(app, cliente, "45")
+
+
+def test_texto_sem_acentos_e_por_prefixo(app, cliente, autenticado):
+    assert pesquisar(app, cliente, "medio") == {("Honda", "Civic")}
+    assert ("Yamaha", "TMAX") in pesquisar(app, cliente, "autom")
+
+
+def test_sem_resultados(app, cliente, autenticado):
+    assert pesquisar(app, cliente, "inexistente") == set()
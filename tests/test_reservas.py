@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+import project_web
+import reservas
+from base_dados import nova_conexao
+
+"""
+test_reservas.py
+
+Proteção contra reservas sobrepostas: 409 na rota /reservar, conflito ao alterar datas
+e uma só reserva quando vários pedidos concorrentes disputam as mesmas datas.
+"""
+
+VEICULO_ID = 4      #Audi A8: os outros testes não o procuram
+
+
+@pytest.fixture
+def sem_reservas(conn):
+    #as reservas criadas no teste ficam canceladas no fim, para não esconderem o veículo do catálogo
+    yield
+    conn.execute("UPDATE reservas SET status = 'Cancelada' WHERE veiculo_id = ? AND status = 'Ativa'", (VEICULO_ID,))
+    conn.commit()
+
+
+def reservar(cliente, data_inicio, data_fim):
+    return cliente.post(f"/reservar/{VEICULO_ID}", data={"data_inicio": data_inicio, "data_fim": data_fim})
+
+
+def test_reserva_sobreposta_devolve_409(cliente, autenticado, sem_reservas):
+    assert reservar(cliente, "2031-05-01", "2031-05-05").status_code == 302
+    assert reservar(cliente, "2031-05-05", "2031-05-08").status_code == 409     #o último dia conta
+    assert reservar(cliente, "2031-04-28", "2031-05-10").status_code == 409
+    assert reservar(cliente, "2031-05-06", "2031-05-08").status_code == 302
+
+
+def test_alterar_datas_para_intervalo_ocupado(conn, autenticado, sem_reservas):
+    primeira, _ = reservas.criar(conn, autenticado, VEICULO_ID, "2031-07-01", "2031-07-03", 10.0)
+    segunda, _ = reservas.criar(conn, autenticado, VEICULO_ID, "2031-07-10", "2031-07-12", 10.0)
+    with pytest.raises(reservas.ConflitoReserva):
+        reservas.alterar_datas(conn, segunda, "2031-07-03", "2031-07-05")
+    #a própria reserva não conta como conflito
+    reservas.alterar_datas(conn, primeira, "2031-07-02", "2031-07-04")
+
+
+def test_pedidos_concorrentes_criam_uma_so_reserva(autenticado, sem_reservas):
+    resultados = []
+    barreira = threading.Barrier(8)
+
+    def pedido():
+        conn = nova_conexao(project_web.DB_PATH)
+        try:
+            barreira.wait()
+            reservas.criar(conn, autenticado, VEICULO_ID, "2032-01-10", "2032-01-15", 10.0)
+            resultados.append("criada")
+        except reservas.ConflitoReserva:
+            resultados.append("conflito")
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=pedido) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(resultados) == ["conflito"] * 7 + ["criada"]
@@ -0,0 +1,115 @@
+import base64
+import itertools
+
+import pytest
+
+import senhas
+
+"""
+test_senhas.py
+
+Senhas com scrypt: formato "scrypt$n$r$p$sal$hash", senha errada recusada, contas antigas em texto simples
+passam a hash no login seguinte, e pool cheio (Ocupado) dá 503 no login e no registo.
+"""
+
+_NUMERO = itertools.count(1)
+
+
+def conta(conn, senha):
+    usuario = f"senhas{next(_NUMERO)}"
+    conn.execute("INSERT INTO clientes (nome, usuario, senha) VALUES (?, ?, ?)", (usuario, usuario, senha))
+    conn.commit()
+    return usuario
+
+
+def senha_guardada(conn, usuario):
+    return conn.execute("SELECT senha FROM clientes WHERE usuario = ?", (usuario,)).fetchone()[0]
+
+
+def test_formato_e_verificacao():
+    guardado = senhas.gerar_hash("segredo")
+    prefixo, n, r, p, sal, valor = guardado.split("$")
+    assert prefixo == senhas.PREFIXO
+    assert (int(n), int(r), int(p)) == (senhas.CUSTO_N, senhas.CUSTO_R, senhas.CUSTO_P)
+    assert len(base64.b64decode(sal)) == senhas.TAMANHO_SAL
+    assert len(base64.b64decode(valor)) == senhas.TAMANHO_HASH
+    assert not senhas.precisa_rehash(guardado)
+
+    assert senhas.verificar("segredo", guardado)
+    assert not senhas.verificar("Segredo", guardado)
+    assert not senhas.verificar("", guardado)
+    #sal aleatório: a mesma senha nunca dá o mesmo valor guardado
+    assert senhas.gerar_hash("segredo") != guardado
+
+
+def test_hash_com_outro_custo_precisa_de_rehash():
+    guardado = senhas.gerar_hash("segredo")
+    _, n, r, p, sal, valor = guardado.split("$")
+    antigo = "$".join([senhas.PREFIXO, str(int(n) // 2), r, p, sal, valor])
+    assert senhas.precisa_rehash(antigo)
+    assert senhas.precisa_rehash("texto simples")
+    assert not senhas.verificar("segredo", "scrypt$estragado")
+
+
+def test_login_com_senha_errada(cliente, conn):
+    usuario = conta(conn, senhas.gerar_hash("certa"))
+    resposta = cliente.post("/", data={"usuario": usuario, "senha": "errada"})
+    assert resposta.status_code == 200
+    assert "Credenciais inválidas".encode() in resposta.data
+    with cliente.session_transaction() as sessao:
+        assert "usuario" not in sessao
+
+
+def test_senha_antiga_em_texto_simples_passa_a_hash(cliente, conn):
+    usuario = conta(conn, "antiga")
+
+    #uma tentativa falhada não mexe na senha guardada
+    cliente.post("/", data={"usuario": usuario, "senha": "outra"})
+    assert senha_guardada(conn, usuario) == "antiga"
+
+    resposta = cliente.post("/", data={"usuario": usuario, "senha": "antiga"})
+    assert resposta.status_code == 302
+    guardado = senha_guardada(conn, usuario)
+    assert senhas.e_hash(guardado)
+    assert senhas.verificar("antiga", guardado)
+
+    #o login seguinte já usa o hash
+    cliente.get("/logout")
+    assert cliente.post("/", data={"usuario": usuario, "senha": "antiga"}).status_code == 302
+    assert senha_guardada(conn, usuario) == guardado
+
+
+def test_registo_guarda_hash(cliente, conn):
+    usuario = f"senhas_registo{next(_NUMERO)}"
+    cliente.post("/", data={"nome": "Registo", "usuario": usuario, "senha": "nova", "senha_confirmacao": "nova"})
+    guardado = senha_guardada(conn, usuario)
+    assert senhas.e_hash(guardado) and senhas.verificar("nova", guardado)
+
+
+@pytest.fixture
+def pool_cheio(monkeypatch):
+    #todas as vagas ocupadas: o próximo hash espera ESPERA_SEGUNDOS e desiste com Ocupado
+    monkeypatch.setattr(senhas, "ESPERA_SEGUNDOS", 0.05)
+    vagas = senhas._vagas
+    for _ in range(senhas.MAX_EM_ESPERA):
+        vagas.acquire()
+    yield
+    for _ in range(senhas.MAX_EM_ESPERA):
+        vagas.release()
+
+
+def test_pool_cheio_da_503_no_login(cliente, conn, pool_cheio):
+    usuario = conta(conn, "antiga")
+    for dados in ({"usuario": usuario, "senha": "antiga"}, {"usuario": "nao_existe", "senha": "x"}):
+        resposta = cliente.post("/", data=dados)
+        assert resposta.status_code == 503
+        assert "Serviço ocupado".encode() in resposta.data
+    with pytest.raises(senhas.Ocupado):
+        senhas.gerar_hash("x")
+
+
+def test_pool_cheio_da_503_no_registo(cliente, conn, pool_cheio):
+    usuario = f"senhas_ocupado{next(_NUMERO)}"
+    resposta = cliente.post("/", data={"nome": "Ocupado", "usuario": usuario, "senha": "x", "senha_confirmacao": "x"})
+    assert resposta.status_code == 503
+    assert conn.execute("SELECT COUNT(*) FROM clientes WHERE usuario = ?", (usuario,)).fetchone()[0] == 0